@@ -1,2 +1,37 @@
+from typing import Dict, Optional, Type
+
+from .interfaces import TTSBackend, BackendCapabilities
 from .edge import EdgeTTSBackend
-from .doubao import DoubaoTTSBackend
\ No newline at end of file
+from .doubao import DoubaoTTSBackend
+from .synthetic import SyntheticTTSBackend
+
+BACKENDS: Dict[str, Type[TTSBackend]] = {
+    "edge_tts": EdgeTTSBackend,
+    "doubao": DoubaoTTSBackend,
+    "synthetic": SyntheticTTSBackend,
+}
+BACKEND_NAMES = list(BACKENDS)
+
+
+def create_backend(backend: str) -> TTSBackend:
+    if backend not in BACKENDS:
+        raise ValueError(f"unsupported backend: {backend}")
+    return BACKENDS[backend]()
+
+
+def get_capabilities(backend: str) -> BackendCapabilities:
+    if backend not in BACKENDS:
+        raise ValueError(f"unsupported backend: {backend}")
+    return BACKENDS[backend].capabilities
+
+
+def working_sample_rate(backend: str, ar: int) -> int:
+    """Rate to synthesize and fit at; output is resampled to `ar` once, at render."""
+    return get_capabilities(backend).native_sample_rate or ar
+
+
+def resolve_jobs(backend: str, jobs: Optional[int]) -> int:
+    """Explicit --jobs wins; otherwise use the backend's recommended concurrency."""
+    if jobs is not None:
+        return max(1, jobs)
+    return get_capabilities(backend).recommended_jobs
@@ -7,12 +7,30 @@ import tempfile
 
 import aiohttp
 
-from .interfaces import TTSBackend
+from flexdub.core.aio import run_blocking
+from flexdub.core.proc import run_media_async
+
+from .interfaces import BackendCapabilities, TTSBackend
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
 
 
 class DoubaoTTSBackend(TTSBackend):
     """TTS backend using external doubao-tts-api HTTP service."""
 
+    # Requests over ~75 characters tend to time out on the service side
+    capabilities = BackendCapabilities(
+        native_sample_rate=24000,
+        output_codec="aac",
+        max_chars=75,
+        recommended_jobs=2,
+        supports_rate=False,
+        supports_word_boundaries=False,
+    )
+
     DEFAULT_SPEAKER = "温柔桃子"
     DEFAULT_TIMEOUT = 180  # Increased for long text segments
 
@@ -55,8 +73,7 @@ class DoubaoTTSBackend(TTSBackend):
                             error_text = await resp.text()
                             raise RuntimeError(f"Doubao TTS failed: {error_text}")
                         data = await resp.read()
-                        with open(tmp_aac, "wb") as f:
-                            f.write(data)
+                        await run_blocking(_write_bytes, tmp_aac, data)
                 except aiohttp.ClientError as e:
                     raise RuntimeError(
                         f"Doubao TTS service connection failed: {self.server_url}"
@@ -68,7 +85,7 @@ class DoubaoTTSBackend(TTSBackend):
         wav = tempfile.mktemp(suffix=".wav")
         if shutil.which("ffmpeg"):
             try:
-                subprocess.run(
+                await run_media_async(
                     [
                         "ffmpeg",
                         "-y",
@@ -80,9 +97,6 @@ class DoubaoTTSBackend(TTSBackend):
                         "1",
                         wav,
                     ],
-                    check=True,
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
                 )
                 if os.path.exists(tmp_aac):
                     os.remove(tmp_aac)
@@ -1,27 +1,89 @@
 import os
 import shutil
-import subprocess
 import tempfile
-from typing import Optional
+from typing import List, Optional, Tuple
 
 try:
     import edge_tts
 except Exception:
     edge_tts = None
 
-from .interfaces import TTSBackend
+from flexdub.core.aio import run_blocking
+from flexdub.core.proc import run_media_async
+
+from .interfaces import BackendCapabilities, TTSBackend, WordBoundary
+
+
+# edge-tts reports offsets and durations in 100-nanosecond ticks
+_TICKS_PER_MS = 10000
+
+
+def _communicate(text: str, voice: str):
+    try:
+        return edge_tts.Communicate(text, voice=voice, boundary="WordBoundary")
+    except TypeError:
+        # edge-tts < 7 has no boundary option and always emits WordBoundary
+        return edge_tts.Communicate(text, voice=voice)
+
+
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _decode_mp3_in_process(mp3_path: str, wav_path: str, ar: int) -> bool:
+    # libsndfile >= 1.1 reads MP3; when no resample is needed this avoids an ffmpeg process
+    try:
+        import soundfile as sf
+        if "MP3" not in sf.available_formats():
+            return False
+        data, sr = sf.read(mp3_path, dtype="float32")
+        if sr != ar:
+            return False
+        if len(data.shape) > 1:
+            data = data.mean(axis=1)
+        sf.write(wav_path, data, sr)
+        return True
+    except Exception:
+        return False
 
 
 class EdgeTTSBackend(TTSBackend):
+    capabilities = BackendCapabilities(
+        native_sample_rate=24000,
+        output_codec="mp3",
+        max_chars=None,
+        recommended_jobs=4,
+        supports_rate=True,
+        supports_word_boundaries=True,
+    )
+
     async def synthesize(self, text: str, voice: str, ar: int) -> str:
+        path, _ = await self.synthesize_with_boundaries(text, voice, ar)
+        return path
+
+    async def synthesize_with_boundaries(self, text: str, voice: str, ar: int) -> Tuple[str, List[WordBoundary]]:
         if edge_tts is None:
             raise RuntimeError("edge-tts not available")
         tmp = tempfile.mktemp(suffix=".mp3")
+        boundaries: List[WordBoundary] = []
         last_err: Optional[Exception] = None
         for _ in range(3):
             try:
-                communicate = edge_tts.Communicate(text, voice=voice)
-                await communicate.save(tmp)
+                boundaries = []
+                audio: List[bytes] = []
+                communicate = _communicate(text, voice)
+                # chunks are buffered in memory: no file I/O on the event loop
+                async for chunk in communicate.stream():
+                    if chunk["type"] == "audio":
+                        audio.append(chunk["data"])
+                    elif chunk["type"] == "WordBoundary":
+                        boundaries.append(WordBoundary(
+                            offset_ms=int(chunk["offset"]) // _TICKS_PER_MS,
+                            duration_ms=int(chunk["duration"]) // _TICKS_PER_MS,
+                            text=chunk["text"],
+                        ))
+                await run_blocking(_write_file, tmp, b"".join(audio))
                 last_err = None
                 break
             except Exception as e:
@@ -31,8 +93,11 @@ class EdgeTTSBackend(TTSBackend):
         if last_err is not None:
             raise last_err
         wav = tempfile.mktemp(suffix=".wav")
+        if await run_blocking(_decode_mp3_in_process, tmp, wav, ar):
+            os.remove(tmp)
+            return wav, boundaries
         if shutil.which("ffmpeg"):
-            subprocess.run([
+            await run_media_async([
                 "ffmpeg",
                 "-y",
                 "-i",
@@ -42,8 +107,8 @@ class EdgeTTSBackend(TTSBackend):
                 "-ac",
                 "1",
                 wav,
-            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            ])
             if os.path.exists(tmp):
                 os.remove(tmp)
-            return wav
-        return tmp
+            return wav, boundaries
+        return tmp, boundaries
@@ -1,3 +1,96 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterable, List, Optional, Tuple
+
+
+@dataclass
+class WordBoundary:
+    """A word-level timing emitted by a TTS backend alongside the audio."""
+    offset_ms: int    # word start, relative to the start of the synthesized audio
+    duration_ms: int  # spoken length of the word
+    text: str         # word text as reported by the backend
+
+
+@dataclass
+class SynthesisRequest:
+    """One unit of work for synthesize_many."""
+    key: Any                         # caller's handle, echoed back on the result
+    text: str
+    voice: str
+    ar: int
+    want_boundaries: bool = False    # ask for word boundaries when the backend has them
+
+
+@dataclass
+class SynthesisResult:
+    """Outcome of a SynthesisRequest; exactly one of path / error is set."""
+    key: Any
+    path: Optional[str] = None
+    boundaries: List[WordBoundary] = field(default_factory=list)
+    error: Optional[Exception] = None
+    elapsed_ms: Optional[float] = None   # wall time of the request, for latency models
+
+
+@dataclass(frozen=True)
+class BackendCapabilities:
+    """What a backend produces and tolerates, so pipelines can plan around it."""
+    native_sample_rate: Optional[int] = None  # rate the service renders at; None if unknown
+    output_codec: str = "wav"                 # codec of the raw response ("mp3", "aac", "pcm", ...)
+    max_chars: Optional[int] = None           # longest text one request handles reliably
+    recommended_jobs: int = 4                 # concurrent requests the service sustains
+    supports_rate: bool = False               # accepts a speaking-rate control
+    supports_word_boundaries: bool = False    # synthesize_with_boundaries returns real timings
+
+
 class TTSBackend:
+    capabilities = BackendCapabilities()
+
     async def synthesize(self, text: str, voice: str, ar: int) -> str:
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    async def synthesize_with_boundaries(self, text: str, voice: str, ar: int) -> Tuple[str, List[WordBoundary]]:
+        """Synthesize and return word boundaries; backends without timing metadata return an empty list."""
+        path = await self.synthesize(text, voice, ar)
+        return path, []
+
+    async def synthesize_many(self, requests: Iterable[SynthesisRequest], jobs: int = 4) -> AsyncIterator[SynthesisResult]:
+        """
+        Synthesize a whole work list, yielding results as they complete (not in request order).
+
+        The default fans out to `jobs` workers calling synthesize / synthesize_with_boundaries.
+        Backends that can pipeline or batch requests override this. Failures are reported on
+        the result instead of raised, so callers can retry individual requests.
+        Finished results wait in a queue of at most `jobs` entries, so a slow
+        consumer holds the workers back instead of piling up results.
+        """
+        pending = iter(requests)
+        results: "asyncio.Queue[Optional[SynthesisResult]]" = asyncio.Queue(maxsize=max(1, jobs))
+
+        async def worker() -> None:
+            for req in pending:
+                t0 = time.monotonic()
+                try:
+                    if req.want_boundaries:
+                        path, boundaries = await self.synthesize_with_boundaries(req.text, req.voice, req.ar)
+                    else:
+                        path, boundaries = await self.synthesize(req.text, req.voice, req.ar), []
+                    elapsed = (time.monotonic() - t0) * 1000.0
+                    await results.put(SynthesisResult(req.key, path=path, boundaries=boundaries, elapsed_ms=elapsed))
+                except Exception as e:
+                    await results.put(SynthesisResult(req.key, error=e))
+            await results.put(None)
+
+        n = max(1, jobs)
+        workers = [asyncio.create_task(worker()) for _ in range(n)]
+        try:
+            finished = 0
+            while finished < n:
+                res = await results.get()
+                if res is None:
+                    finished += 1
+                    continue
+                yield res
+        finally:
+            for w in workers:
+                w.cancel()
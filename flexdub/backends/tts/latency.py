@@ -0,0 +1,89 @@
+"""Per-backend TTS latency model.
+
+Request latency is modelled as ``base_ms + per_char_ms * chars`` and fitted by
+least squares to timings observed in earlier runs. Observations are kept as
+decayed running sums in a small JSON file (--latency-model, FLEXDUB_LATENCY_MODEL
+or ``~/.cache/flexdub/tts_latency.json``), so the model follows a backend that
+gets faster or slower over time. Until enough timings exist the prior is used.
+Only runs that plan clusters with the model read and update it.
+"""
+
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+# prior used until a backend has enough observations
+DEFAULT_BASE_MS = 800.0
+DEFAULT_PER_CHAR_MS = 10.0
+MIN_OBSERVATIONS = 5
+DECAY = 0.98
+
+
+def default_model_path() -> str:
+    path = os.environ.get("FLEXDUB_LATENCY_MODEL")
+    if path:
+        return path
+    return os.path.join(os.path.expanduser("~"), ".cache", "flexdub", "tts_latency.json")
+
+
+class LatencyModel:
+    """Least-squares latency-per-character model for one backend."""
+
+    def __init__(self, backend: str, path: Optional[str] = None):
+        self.backend = backend
+        self.path = path or default_model_path()
+        self.sums: Dict[str, float] = {"n": 0.0, "x": 0.0, "y": 0.0, "xx": 0.0, "xy": 0.0}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f).get(backend) or {}
+            for k in self.sums:
+                self.sums[k] = float(stored.get(k, 0.0))
+        except Exception:
+            pass
+
+    def observe(self, chars: int, elapsed_ms: Optional[float]) -> None:
+        if elapsed_ms is None:
+            return
+        s = self.sums
+        for k in s:
+            s[k] *= DECAY
+        x = float(chars)
+        s["n"] += 1.0
+        s["x"] += x
+        s["y"] += elapsed_ms
+        s["xx"] += x * x
+        s["xy"] += x * elapsed_ms
+
+    def coefficients(self) -> Tuple[float, float]:
+        """(base_ms, per_char_ms), falling back to the prior while data is thin or degenerate."""
+        s = self.sums
+        n = s["n"]
+        if n < MIN_OBSERVATIONS:
+            return DEFAULT_BASE_MS, DEFAULT_PER_CHAR_MS
+        var = n * s["xx"] - s["x"] ** 2
+        if var <= 1e-6 * max(1.0, n * s["xx"]):
+            # all requests had the same length: keep the prior slope, fit the intercept
+            per_char = DEFAULT_PER_CHAR_MS
+            return max(0.0, (s["y"] - per_char * s["x"]) / n), per_char
+        per_char = max(0.0, (n * s["xy"] - s["x"] * s["y"]) / var)
+        base = max(0.0, (s["y"] - per_char * s["x"]) / n)
+        return base, per_char
+
+    def predict_ms(self, chars: int) -> float:
+        base, per_char = self.coefficients()
+        return base + per_char * chars
+
+    def save(self) -> None:
+        try:
+            data = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            data[self.backend] = self.sums
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"[LATENCY] could not save model: {e}")
@@ -0,0 +1,172 @@
+"""Synthetic TTS backend for offline benchmarking.
+
+Generates deterministic speech-like audio without any network access, so the
+rest of the pipeline (fit, render, mux, Mode B encode) can be profiled on an
+isolated machine. Configuration comes from constructor arguments or
+FLEXDUB_SYNTH_* environment variables:
+
+- FLEXDUB_SYNTH_CPM: speaking rate in characters per minute (default 240)
+- FLEXDUB_SYNTH_LATENCY: latency distribution, "fixed:MS", "uniform:LO,HI"
+  or "lognormal:MEDIAN_MS,SIGMA" (default "fixed:0")
+- FLEXDUB_SYNTH_LATENCY_PER_CHAR_MS: extra latency per character (default 0)
+- FLEXDUB_SYNTH_FAILURE_RATE: probability of an injected failure (default 0)
+- FLEXDUB_SYNTH_SEED: seed for latency and failure draws (default 0)
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import re
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from flexdub.core.aio import run_blocking
+
+from .interfaces import BackendCapabilities, TTSBackend, WordBoundary
+
+
+_TOKEN_RE = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]|[^\s\u3400-\u9fff\uf900-\ufaff]+")
+_VOICED_RE = re.compile(r"\w")
+
+def parse_latency_spec(spec: str) -> Callable[[np.random.Generator], float]:
+    """Parse a latency distribution spec into a sampler returning milliseconds."""
+    kind, _, params = spec.strip().partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] if params else []
+    kind = kind.lower()
+    if kind == "fixed":
+        ms = values[0] if values else 0.0
+        return lambda rng: ms
+    if kind == "uniform":
+        if len(values) != 2:
+            raise ValueError(f"uniform latency needs LO,HI: {spec}")
+        lo, hi = values
+        return lambda rng: float(rng.uniform(lo, hi))
+    if kind == "lognormal":
+        if len(values) != 2:
+            raise ValueError(f"lognormal latency needs MEDIAN_MS,SIGMA: {spec}")
+        median, sigma = values
+        mu = math.log(max(median, 1e-3))
+        return lambda rng: float(rng.lognormal(mu, sigma))
+    raise ValueError(f"unsupported latency distribution: {spec}")
+
+
+def synthetic_duration_ms(text: str, cpm: float) -> int:
+    """Duration of synthetic speech for text under a chars-per-minute model."""
+    chars = len("".join(text.split()))
+    return max(200, int(round(chars / max(1.0, cpm) * 60000.0)))
+
+
+def render_speech_like(text: str, voice: str, ar: int, cpm: float) -> Tuple[np.ndarray, List[WordBoundary]]:
+    """Render deterministic voiced bursts (one per word / CJK character) separated by short pauses.
+
+    Punctuation-only tokens (e.g. "..." or "……") render as silence, as pause markers do in real TTS.
+    """
+    total_ms = synthetic_duration_ms(text, cpm)
+    tokens = _TOKEN_RE.findall(text) or [text.strip() or " "]
+    digest = hashlib.md5(f"{voice}|{text}".encode("utf-8")).digest()
+    f0 = 100.0 + (int.from_bytes(digest[:2], "little") % 120)
+    weights = [max(1, len(t)) for t in tokens]
+    unit_ms = total_ms / float(sum(weights))
+    total_samples = int(round(total_ms / 1000.0 * ar))
+    data = np.zeros(total_samples, dtype=np.float32)
+    boundaries: List[WordBoundary] = []
+    pos_ms = 0.0
+    for i, (tok, w) in enumerate(zip(tokens, weights)):
+        slot_ms = unit_ms * w
+        # leave ~15% of each slot silent so splitters find real pauses
+        voiced_ms = slot_ms * 0.85
+        start = int(round(pos_ms / 1000.0 * ar))
+        n = max(1, int(round(voiced_ms / 1000.0 * ar)))
+        n = min(n, total_samples - start)
+        if not _VOICED_RE.search(tok):
+            pos_ms += slot_ms
+            continue
+        if n > 0:
+            t = np.arange(n, dtype=np.float32) / float(ar)
+            pitch = f0 * (1.0 + 0.05 * ((digest[i % len(digest)] / 255.0) - 0.5))
+            tone = sum((0.3 / k) * np.sin(2 * np.pi * pitch * k * t) for k in (1, 2, 3))
+            data[start:start + n] = (tone * np.hanning(n)).astype(np.float32)
+        boundaries.append(WordBoundary(offset_ms=int(round(pos_ms)), duration_ms=int(round(voiced_ms)), text=tok))
+        pos_ms += slot_ms
+    return data, boundaries
+
+
+class SyntheticTTSBackend(TTSBackend):
+    """Offline TTS backend producing deterministic speech-like audio."""
+
+    capabilities = BackendCapabilities(
+        native_sample_rate=24000,
+        output_codec="pcm",
+        max_chars=None,
+        recommended_jobs=8,
+        supports_rate=False,
+        supports_word_boundaries=True,
+    )
+    DEFAULT_CPM = 240.0
+
+    def __init__(
+        self,
+        cpm: Optional[float] = None,
+        latency: Optional[str] = None,
+        latency_per_char_ms: Optional[float] = None,
+        failure_rate: Optional[float] = None,
+        seed: Optional[int] = None,
+        latency_fn: Optional[Callable[[str, np.random.Generator], float]] = None,
+    ):
+        """
+        Initialize SyntheticTTSBackend.
+
+        Args:
+            cpm: Speaking rate in characters per minute
+            latency: Latency distribution spec (see module docstring)
+            latency_per_char_ms: Extra latency per input character
+            failure_rate: Probability in [0, 1] that a request fails
+            seed: Seed for latency and failure draws
+            latency_fn: Custom sampler (text, rng) -> latency in ms, overrides latency specs
+        """
+        env = os.environ
+        self.cpm = float(cpm if cpm is not None else env.get("FLEXDUB_SYNTH_CPM", self.DEFAULT_CPM))
+        self.latency = latency if latency is not None else env.get("FLEXDUB_SYNTH_LATENCY", "fixed:0")
+        self.latency_per_char_ms = float(latency_per_char_ms if latency_per_char_ms is not None else env.get("FLEXDUB_SYNTH_LATENCY_PER_CHAR_MS", 0))
+        self.failure_rate = float(failure_rate if failure_rate is not None else env.get("FLEXDUB_SYNTH_FAILURE_RATE", 0))
+        self.seed = int(seed if seed is not None else env.get("FLEXDUB_SYNTH_SEED", 0))
+        self._sample_latency = parse_latency_spec(self.latency)
+        self.latency_fn = latency_fn
+        self._attempts: Dict[Tuple[str, str], int] = {}
+
+    def _request_rng(self, text: str, voice: str) -> np.random.Generator:
+        """
+        Draws of one request, derived from (seed, text, voice) and the attempt
+        number: a run is reproducible whatever order concurrent requests run in,
+        and a retry draws again.
+        """
+        attempt = self._attempts.get((text, voice), 0)
+        self._attempts[(text, voice)] = attempt + 1
+        digest = hashlib.md5(f"{voice}|{text}".encode("utf-8")).digest()
+        return np.random.default_rng([self.seed, int.from_bytes(digest[:8], "little"), attempt])
+
+    def _latency_ms(self, text: str, rng: np.random.Generator) -> float:
+        if self.latency_fn is not None:
+            return max(0.0, self.latency_fn(text, rng))
+        return max(0.0, self._sample_latency(rng) + self.latency_per_char_ms * len(text))
+
+    async def synthesize(self, text: str, voice: str, ar: int) -> str:
+        path, _ = await self.synthesize_with_boundaries(text, voice, ar)
+        return path
+
+    async def synthesize_with_boundaries(self, text: str, voice: str, ar: int) -> Tuple[str, List[WordBoundary]]:
+        rng = self._request_rng(text, voice)
+        latency_ms = self._latency_ms(text, rng)
+        failed = rng.random() < self.failure_rate
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000.0)
+        if failed:
+            raise RuntimeError("Synthetic TTS injected failure")
+        data, boundaries = await run_blocking(render_speech_like, text, voice, ar, self.cpm)
+        wav = tempfile.mktemp(suffix=".wav")
+        await run_blocking(sf.write, wav, data, ar)
+        return wav, boundaries
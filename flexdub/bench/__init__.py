@@ -0,0 +1 @@
+"""Benchmarking helpers: doubao-tts-api stand-in server and TTS load harness."""
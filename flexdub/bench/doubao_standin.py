@@ -0,0 +1,139 @@
+"""
+doubao-tts-api stand-in server
+
+实现 DoubaoTTSBackend 使用的 HTTP 协议，用于离线压测和容量评估：
+- POST /tts {"text", "speaker"} -> 音频字节（有 ffmpeg 时为 AAC，否则为 WAV）
+- GET /status, GET /speakers
+
+可配置：延迟 = 基础延迟 + 每字符延迟（带抖动）、并发上限（超出排队）、
+服务端超时（返回 504）、错误注入（返回 500）。
+"""
+
+import asyncio
+import io
+import random
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import soundfile as sf
+from aiohttp import web
+
+from flexdub.backends.tts.synthetic import render_speech_like
+from flexdub.core.proc import run_media_async
+
+
+STANDIN_SPEAKERS = {
+    "female": ["温柔桃子", "甜美小源"],
+    "male": ["磁性俊宇", "沉稳明仔"],
+}
+
+
+@dataclass
+class StandinConfig:
+    """Stand-in server behaviour."""
+    base_latency_ms: float = 300.0       # fixed cost per request
+    latency_per_char_ms: float = 20.0    # synthesis cost per character
+    jitter: float = 0.1                  # relative uniform jitter on latency
+    max_concurrency: int = 4             # requests synthesized at once, the rest queue
+    timeout_s: float = 180.0             # queue + synthesis budget before a 504
+    error_rate: float = 0.0              # probability of a 500 response
+    cpm: float = 240.0                   # speaking rate of the returned audio
+    sample_rate: int = 24000
+    seed: int = 0
+
+
+async def _encode(data, sr: int) -> Tuple[bytes, str]:
+    buf = io.BytesIO()
+    sf.write(buf, data, sr, format="WAV")
+    wav = buf.getvalue()
+    if not shutil.which("ffmpeg"):
+        return wav, "audio/wav"
+    # same process limits and trace as the client's own decode
+    result = await run_media_async(
+        ["ffmpeg", "-y", "-f", "wav", "-i", "pipe:0", "-c:a", "aac", "-f", "adts", "pipe:1"],
+        check=False,
+        input=wav,
+    )
+    if result.returncode != 0 or not result.stdout:
+        return wav, "audio/wav"
+    return result.stdout, "audio/aac"
+
+
+def create_app(config: Optional[StandinConfig] = None) -> web.Application:
+    cfg = config or StandinConfig()
+    rng = random.Random(cfg.seed)
+    state: dict = {"sem": None}
+    stats = {"active": 0, "queued": 0, "served": 0, "errors": 0, "timeouts": 0}
+
+    async def tts(request: web.Request) -> web.Response:
+        try:
+            payload = await request.json()
+        except Exception:
+            return web.Response(status=400, text="invalid json")
+        text = (payload.get("text") or "").strip()
+        speaker = payload.get("speaker") or "温柔桃子"
+        if not text:
+            return web.Response(status=400, text="text is required")
+        if state["sem"] is None:
+            # created lazily so the semaphore binds to the serving loop
+            state["sem"] = asyncio.Semaphore(max(1, cfg.max_concurrency))
+        sem = state["sem"]
+        arrived = time.monotonic()
+        stats["queued"] += 1
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=cfg.timeout_s)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            return web.Response(status=504, text="queue timeout")
+        finally:
+            stats["queued"] -= 1
+        stats["active"] += 1
+        try:
+            latency = cfg.base_latency_ms + cfg.latency_per_char_ms * len(text)
+            latency *= 1.0 + rng.uniform(-cfg.jitter, cfg.jitter)
+            remaining = cfg.timeout_s - (time.monotonic() - arrived)
+            if latency / 1000.0 > remaining:
+                await asyncio.sleep(max(0.0, remaining))
+                stats["timeouts"] += 1
+                return web.Response(status=504, text="synthesis timeout")
+            await asyncio.sleep(latency / 1000.0)
+            if rng.random() < cfg.error_rate:
+                stats["errors"] += 1
+                return web.Response(status=500, text="injected error")
+            data, _ = render_speech_like(text, speaker, cfg.sample_rate, cfg.cpm)
+            body, content_type = await _encode(data, cfg.sample_rate)
+            stats["served"] += 1
+            return web.Response(body=body, content_type=content_type)
+        finally:
+            stats["active"] -= 1
+            sem.release()
+
+    async def status(request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "standin": True, **stats})
+
+    async def speakers(request: web.Request) -> web.Response:
+        all_speakers = [s for group in STANDIN_SPEAKERS.values() for s in group]
+        return web.json_response({"speakers": all_speakers, "byCategory": STANDIN_SPEAKERS})
+
+    app = web.Application()
+    app.router.add_post("/tts", tts)
+    app.router.add_get("/status", status)
+    app.router.add_get("/speakers", speakers)
+    return app
+
+
+async def start_standin(config: Optional[StandinConfig] = None, host: str = "127.0.0.1", port: int = 0) -> Tuple[web.AppRunner, str]:
+    """Start the stand-in on the running loop; port 0 picks a free port. Returns (runner, base_url)."""
+    runner = web.AppRunner(create_app(config))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+def run_standin(config: Optional[StandinConfig] = None, host: str = "127.0.0.1", port: int = 3456) -> None:
+    """Serve the stand-in until interrupted."""
+    web.run_app(create_app(config), host=host, port=port, print=None)
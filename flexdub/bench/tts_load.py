@@ -0,0 +1,157 @@
+"""
+TTS load-test harness
+
+用真实 SRT 工作负载压测 doubao-tts-api（或本地 stand-in），
+按 --jobs 设置分别统计吞吐量、p50/p95/p99 延迟与重试次数。
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from flexdub.core.subtitle import read_srt, extract_speaker, remove_bracket_content
+
+
+@dataclass
+class LoadResult:
+    """Result of one load run at a given concurrency."""
+    jobs: int
+    requests: int
+    succeeded: int
+    failed: int
+    retries: int
+    wall_s: float
+    throughput_rps: float
+    chars_per_s: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    def to_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile, q in [0, 100]."""
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * (q / 100.0)
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    if lo == hi:
+        return float(xs[int(k)])
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def load_srt_workload(paths: List[str]) -> List[str]:
+    """Texts that would be sent to TTS: speaker tags and bracket content removed, blanks dropped."""
+    texts: List[str] = []
+    for path in paths:
+        for it in read_srt(path):
+            speaker, clean_text = extract_speaker(it.text)
+            text = remove_bracket_content(clean_text if speaker else it.text).strip()
+            if text:
+                texts.append(text)
+    return texts
+
+
+async def run_tts_load(
+    texts: List[str],
+    server_url: str,
+    jobs: int,
+    speaker: str = "温柔桃子",
+    retries: int = 3,
+    retry_delay: float = 2.0,
+    timeout_s: float = 180.0,
+) -> LoadResult:
+    """
+    Send every text to {server_url}/tts with at most `jobs` requests in flight.
+
+    Latency is measured per request from its first attempt to its final
+    response, so retries (and their delays) count against it, as they do
+    in the pipelines. `retries` is the total attempt budget per request.
+    """
+    url = f"{server_url.rstrip('/')}/tts"
+    sem = asyncio.Semaphore(max(1, jobs))
+    latencies: List[float] = []
+    counters = {"ok": 0, "failed": 0, "retries": 0, "chars": 0}
+
+    async def one(session: aiohttp.ClientSession, text: str) -> None:
+        async with sem:
+            t0 = time.monotonic()
+            for attempt in range(max(1, retries)):
+                if attempt > 0:
+                    counters["retries"] += 1
+                    await asyncio.sleep(retry_delay)
+                try:
+                    async with session.post(url, json={"text": text, "speaker": speaker}) as resp:
+                        await resp.read()
+                        if resp.status == 200:
+                            latencies.append((time.monotonic() - t0) * 1000.0)
+                            counters["ok"] += 1
+                            counters["chars"] += len(text)
+                            return
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    pass
+            counters["failed"] += 1
+
+    timeout = aiohttp.ClientTimeout(total=timeout_s)
+    connector = aiohttp.TCPConnector(limit=max(1, jobs))
+    start = time.monotonic()
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        await asyncio.gather(*(one(session, t) for t in texts))
+    wall = max(1e-9, time.monotonic() - start)
+    return LoadResult(
+        jobs=jobs,
+        requests=len(texts),
+        succeeded=counters["ok"],
+        failed=counters["failed"],
+        retries=counters["retries"],
+        wall_s=wall,
+        throughput_rps=counters["ok"] / wall,
+        chars_per_s=counters["chars"] / wall,
+        p50_ms=percentile(latencies, 50),
+        p95_ms=percentile(latencies, 95),
+        p99_ms=percentile(latencies, 99),
+    )
+
+
+async def run_tts_load_sweep(
+    texts: List[str],
+    jobs_list: List[int],
+    server_url: Optional[str] = None,
+    standin_config=None,
+    progress: bool = True,
+    **kwargs,
+) -> List[LoadResult]:
+    """Run the workload once per --jobs setting; start an in-process stand-in when no server_url is given."""
+    runner = None
+    if server_url is None:
+        from flexdub.bench.doubao_standin import start_standin
+        runner, server_url = await start_standin(standin_config)
+        if progress:
+            print(f"[BENCH] stand-in server: {server_url}")
+    results: List[LoadResult] = []
+    try:
+        for jobs in jobs_list:
+            res = await run_tts_load(texts, server_url, jobs, **kwargs)
+            results.append(res)
+            if progress:
+                print(format_result(res))
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+    return results
+
+
+def format_result(res: LoadResult) -> str:
+    return (
+        f"[BENCH] jobs={res.jobs} ok={res.succeeded}/{res.requests} failed={res.failed} "
+        f"retries={res.retries} wall={res.wall_s:.2f}s rps={res.throughput_rps:.2f} "
+        f"chars/s={res.chars_per_s:.1f} p50={res.p50_ms:.0f}ms p95={res.p95_ms:.0f}ms p99={res.p99_ms:.0f}ms"
+    )
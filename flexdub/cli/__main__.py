@@ -1,15 +1,34 @@
 import argparse
 import asyncio
 import os
+import shlex
 import tempfile
-from typing import Optional
+from typing import Optional, Tuple
 
 from flexdub.core.subtitle import read_srt, write_srt, apply_text_options, to_segments, from_segments, SRTItem
 from flexdub.core.rebalance import rebalance_intervals
-from flexdub.core.audio import concat_wavs, mux_audio_video, make_silence, media_duration_ms, detect_negative_ts
+from flexdub.core.audio import detect_negative_ts
+from flexdub.core.aio import watched
+from flexdub.core.proc import format_stats as format_proc_stats
+from flexdub.core.governor import VIDEO_MODES, configure as configure_governor
+from flexdub.core.timeline_plan import AUDIO_STRETCH_RANGE, SYNC_TOLERANCE_MS
+from flexdub.core.video import INTERMEDIATE_PROFILES
+from flexdub.pipelines.engine import StageFailed
+from flexdub.pipelines.merge import MergeConfig, run_merge
 from flexdub.core.audio import extract_audio_track, write_sync_audit
 from flexdub.pipelines.dubbing import build_audio_from_srt
 from flexdub.core.lang import detect_language, recommended_voice
+from flexdub.backends.tts import BACKEND_NAMES, working_sample_rate
+
+
+def _tempo_range(value: str) -> Tuple[float, float]:
+    try:
+        lo, hi = (float(v) for v in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected lo,hi (e.g. 0.9,1.15)")
+    if not 0 < lo <= 1.0 <= hi:
+        raise argparse.ArgumentTypeError("range must satisfy 0 < lo <= 1 <= hi")
+    return lo, hi
 
 
 def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
@@ -19,7 +38,7 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     m.add_argument("srt_path")
     m.add_argument("video_path")
     m.add_argument("-o", "--output", default=None)
-    m.add_argument("--backend", choices=["edge_tts", "doubao"], required=True)
+    m.add_argument("--backend", choices=BACKEND_NAMES, required=True)
     m.add_argument("--voice", default="zh-CN-YunjianNeural")
     m.add_argument("--ar", type=int, default=48000)
     m.add_argument("--keep-brackets", action="store_true")
@@ -29,7 +48,7 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     m.add_argument("--panic-cpm", type=int, default=300)
     m.add_argument("--max-shift", type=int, default=1000)
     m.add_argument("--no-rebalance", action="store_true")
-    m.add_argument("--jobs", type=int, default=4)
+    m.add_argument("--jobs", type=int, default=None, help="TTS concurrency (default: backend's recommended value)")
     m.add_argument("--no-progress", action="store_true")
     m.add_argument("--subtitle-path", default=None)
     m.add_argument("--subtitle-lang", default="zh")
@@ -37,12 +56,32 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     m.add_argument("--robust-ts", action="store_true")
     m.add_argument("--clustered", action="store_true")
     m.add_argument("--smart-split", action="store_true")
+    m.add_argument("--cluster-min-chars", type=int, default=None, help="聚类请求最小字符数（默认 20）")
+    m.add_argument("--cluster-max-chars", type=int, default=None, help="聚类请求最大字符数（默认取后端上限，否则 300）")
+    m.add_argument("--no-cluster-plan", action="store_true", help="保留原始语义聚类，不按延迟模型重新切分/合并")
+    m.add_argument("--latency-model", default=None, help="聚类规划用的 TTS 延迟模型文件（默认 FLEXDUB_LATENCY_MODEL 或 ~/.cache/flexdub/tts_latency.json）")
+    m.add_argument("--loop-watchdog-ms", type=float, default=None, help="调试：事件循环阻塞超过该毫秒数时打印阻塞调用栈（也可用 FLEXDUB_LOOP_WATCHDOG_MS）")
+    m.add_argument("--cpus", type=int, default=None, help="CPU 预算：拟合/编码等 CPU 密集阶段共享的核数（默认全部核；TTS 并发仍由 --jobs 控制）")
+    m.add_argument("--incremental", action="store_true", help="Mode A：在输出旁保存运行清单（<输出名>.flexdub/），再次运行时只重做改动过的字幕")
+    m.add_argument("--no-cache", action="store_true", help="忽略阶段缓存（<输出名>.flexdub/stages/），全部阶段重新执行")
+    m.add_argument("--coalesce", action="store_true", help="Mode A 非聚类：相邻同说话人的短字幕合并为一次 TTS 请求，按停顿切回各自时间槽")
     m.add_argument("--auto-dual-srt", action="store_true")
     m.add_argument("--llm-dual-srt", action="store_true")
     m.add_argument("--no-fallback", action="store_true")
     m.add_argument("--voice-map", default=None)
-    m.add_argument("--mode", choices=["elastic-audio", "elastic-video"], default="elastic-video", help="Pipeline mode: elastic-audio (compress audio to fit video) or elastic-video (stretch video to fit audio, default)")
-    m.add_argument("--skip-length-check", action="store_true", help="Skip character length validation for TTS (default threshold: 75 chars)")
+    m.add_argument("--mode", choices=["elastic-audio", "elastic-video", "elastic-hybrid"], default="elastic-video", help="Pipeline mode: elastic-audio (compress audio to fit video), elastic-video (stretch video to fit audio, default) or elastic-hybrid (stretch audio within --audio-stretch-range, video only beyond it)")
+    m.add_argument("--skip-length-check", action="store_true", help="Skip character length validation for TTS (threshold: backend max_chars, 75 for doubao)")
+    m.add_argument("--intermediate-codec", choices=sorted(INTERMEDIATE_PROFILES), default=None, help="Mode B：分块先以帧内/无损中间编码渲染，拼接后整条时间轴只做一次最终编码（默认分块直接最终编码）")
+    m.add_argument("--sync-tolerance-ms", type=int, default=SYNC_TOLERANCE_MS, help=f"Mode B：语音可晚于画面/超出画面的毫秒数，容差内不变速视频（默认 {SYNC_TOLERANCE_MS}；0 = 逐条按 TTS 时长变速）")
+    m.add_argument("--no-stream-copy", action="store_true", help="Mode B：未拉伸区间也重新编码（默认按关键帧索引整 GOP 流复制）")
+    m.add_argument("--audio-stretch-range", type=_tempo_range, default=AUDIO_STRETCH_RANGE, help=f"elastic-hybrid：可用音频变速吸收的语速范围 lo,hi（TTS 时长/目标时长，默认 {AUDIO_STRETCH_RANGE[0]},{AUDIO_STRETCH_RANGE[1]}）")
+    m.add_argument("--video-cache-gb", type=float, default=20.0, help="Mode B：渲染片段缓存上限（GB，视频旁 video_cache/，按最近使用淘汰；0 = 不缓存）")
+    m.add_argument("--final-chunk-clips", type=int, default=None, help="Mode B + --intermediate-codec：最终编码按片段边界分块并行编码、流复制拼接，每块片段数（默认 200）")
+    m.add_argument("--final-workers", type=int, default=None, help="Mode B 最终分块编码的并行进程数（默认按 --cpus 分配的视频编码槽位）")
+    m.add_argument("--plan-only", action="store_true", help="Mode B 试运行：生成/复用 TTS，输出新时间轴、变速比例分布与编码量估计（.mode_b_plan.json）和 .mode_b.srt，不处理视频")
+    m.add_argument("--plan-first", action="store_true", help="Mode B：先等全部 TTS 完成、输出完整规划与编码量估计，再开始编码（默认分块规划完即编码，与 TTS 重叠）")
+    m.add_argument("--proxy", action="store_true", help="审阅代理：缩小到 360p、ultrafast 编码，写入 <output>.proxy.mp4；与正式渲染共用 TTS/规划/阶段缓存")
+    m.add_argument("--video-encoder-args", default=None, help="Mode B 最终视频编码参数（默认 \"-c:v libx264 -preset fast -crf 18\"）")
 
     r = sub.add_parser("rebalance")
     r.add_argument("srt_path")
@@ -68,7 +107,7 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     jm.add_argument("video_path")
     jm.add_argument("-o", "--output", default=None)
     jm.add_argument("--source", choices=["auto", "whisperx", "gemini"], default="auto")
-    jm.add_argument("--backend", choices=["edge_tts", "doubao"], required=True)
+    jm.add_argument("--backend", choices=BACKEND_NAMES, required=True)
     jm.add_argument("--voice", default="zh-CN-YunjianNeural")
     jm.add_argument("--ar", type=int, default=48000)
     jm.add_argument("--keep-brackets", action="store_true")
@@ -78,7 +117,7 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     jm.add_argument("--panic-cpm", type=int, default=300)
     jm.add_argument("--max-shift", type=int, default=1000)
     jm.add_argument("--no-rebalance", action="store_true")
-    jm.add_argument("--jobs", type=int, default=4)
+    jm.add_argument("--jobs", type=int, default=None, help="TTS concurrency (default: backend's recommended value)")
     jm.add_argument("--no-progress", action="store_true")
     jm.add_argument("--subtitle-path", default=None)
     jm.add_argument("--subtitle-lang", default="zh")
@@ -86,6 +125,15 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     jm.add_argument("--robust-ts", action="store_true")
     jm.add_argument("--clustered", action="store_true")
     jm.add_argument("--smart-split", action="store_true")
+    jm.add_argument("--cluster-min-chars", type=int, default=None, help="聚类请求最小字符数（默认 20）")
+    jm.add_argument("--cluster-max-chars", type=int, default=None, help="聚类请求最大字符数（默认取后端上限，否则 300）")
+    jm.add_argument("--no-cluster-plan", action="store_true", help="保留原始语义聚类，不按延迟模型重新切分/合并")
+    jm.add_argument("--latency-model", default=None, help="聚类规划用的 TTS 延迟模型文件（默认 FLEXDUB_LATENCY_MODEL 或 ~/.cache/flexdub/tts_latency.json）")
+    jm.add_argument("--loop-watchdog-ms", type=float, default=None, help="调试：事件循环阻塞超过该毫秒数时打印阻塞调用栈（也可用 FLEXDUB_LOOP_WATCHDOG_MS）")
+    jm.add_argument("--cpus", type=int, default=None, help="CPU 预算：拟合/编码等 CPU 密集阶段共享的核数（默认全部核；TTS 并发仍由 --jobs 控制）")
+    jm.add_argument("--incremental", action="store_true", help="Mode A：在输出旁保存运行清单（<输出名>.flexdub/），再次运行时只重做改动过的字幕")
+    jm.add_argument("--no-cache", action="store_true", help="忽略阶段缓存（<输出名>.flexdub/stages/），全部阶段重新执行")
+    jm.add_argument("--coalesce", action="store_true", help="Mode A 非聚类：相邻同说话人的短字幕合并为一次 TTS 请求，按停顿切回各自时间槽")
     jm.add_argument("--no-fallback", action="store_true")
     jm.add_argument("--voice-map", default=None)
 
@@ -100,7 +148,7 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     pm = sub.add_parser("project_merge")
     pm.add_argument("project_dir")
     pm.add_argument("-o", "--output_dir", default=None)
-    pm.add_argument("--backend", choices=["edge_tts", "doubao"], required=True)
+    pm.add_argument("--backend", choices=BACKEND_NAMES, required=True)
     pm.add_argument("--voice", default=None)
     pm.add_argument("--ar", type=int, default=48000)
     pm.add_argument("--keep-brackets", action="store_true")
@@ -110,7 +158,7 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     pm.add_argument("--panic-cpm", type=int, default=300)
     pm.add_argument("--max-shift", type=int, default=1000)
     pm.add_argument("--no-rebalance", action="store_true")
-    pm.add_argument("--jobs", type=int, default=4)
+    pm.add_argument("--jobs", type=int, default=None, help="TTS concurrency (default: backend's recommended value)")
     pm.add_argument("--no-progress", action="store_true")
     pm.add_argument("--embed-subtitle", choices=["none", "original", "rebalance", "display"], default="rebalance")
     pm.add_argument("--subtitle-lang", default="en")
@@ -120,6 +168,15 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     pm.add_argument("--robust-ts", action="store_true")
     pm.add_argument("--clustered", action="store_true")
     pm.add_argument("--smart-split", action="store_true")
+    pm.add_argument("--cluster-min-chars", type=int, default=None, help="聚类请求最小字符数（默认 20）")
+    pm.add_argument("--cluster-max-chars", type=int, default=None, help="聚类请求最大字符数（默认取后端上限，否则 300）")
+    pm.add_argument("--no-cluster-plan", action="store_true", help="保留原始语义聚类，不按延迟模型重新切分/合并")
+    pm.add_argument("--latency-model", default=None, help="聚类规划用的 TTS 延迟模型文件（默认 FLEXDUB_LATENCY_MODEL 或 ~/.cache/flexdub/tts_latency.json）")
+    pm.add_argument("--loop-watchdog-ms", type=float, default=None, help="调试：事件循环阻塞超过该毫秒数时打印阻塞调用栈（也可用 FLEXDUB_LOOP_WATCHDOG_MS）")
+    pm.add_argument("--cpus", type=int, default=None, help="CPU 预算：拟合/编码等 CPU 密集阶段共享的核数（默认全部核；TTS 并发仍由 --jobs 控制）")
+    pm.add_argument("--incremental", action="store_true", help="Mode A：在输出旁保存运行清单（<输出名>.flexdub/），再次运行时只重做改动过的字幕")
+    pm.add_argument("--no-cache", action="store_true", help="忽略阶段缓存（<输出名>.flexdub/stages/），全部阶段重新执行")
+    pm.add_argument("--coalesce", action="store_true", help="Mode A 非聚类：相邻同说话人的短字幕合并为一次 TTS 请求，按停顿切回各自时间槽")
     pm.add_argument("--auto-dual-srt", action="store_true")
     pm.add_argument("--llm-dual-srt", action="store_true")
     pm.add_argument("--no-fallback", action="store_true")
@@ -150,7 +207,7 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     qa.add_argument("--max-chars", type=int, default=250)
     qa.add_argument("--max-duration-ms", type=int, default=15000)
     qa.add_argument("--tts-char-threshold", type=int, default=75, help="Character threshold for TTS stability (default: 75)")
-    qa.add_argument("--backend", choices=["edge_tts", "doubao"], default="doubao", help="TTS backend for threshold check")
+    qa.add_argument("--backend", choices=BACKEND_NAMES, default="doubao", help="TTS backend for threshold check")
     qa.add_argument("-o", "--output", default=None, help="Output QA report to file")
     
     # gs_align command: align gs.md with SRT timeline
@@ -177,310 +234,153 @@ def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     sr.add_argument("--base-url", default=None, help="LLM API base URL (or set FLEXDUB_LLM_BASE_URL env)")
     sr.add_argument("--model", default=None, help="LLM model name (or set FLEXDUB_LLM_MODEL env)")
     
+    # bench command: TTS load testing against doubao-tts-api or the bundled stand-in
+    bn = sub.add_parser("bench", help="Benchmarking tools")
+    bsub = bn.add_subparsers(dest="bench_cmd", required=True)
+    tl = bsub.add_parser("tts-load", help="Load-test the doubao TTS protocol with SRT workloads")
+    tl.add_argument("srt_paths", nargs="+", help="SRT files providing the request texts")
+    tl.add_argument("--server-url", default=None, help="doubao-tts-api URL (default: start a local stand-in)")
+    tl.add_argument("--jobs", default="1,2,4,8", help="Comma-separated concurrency settings to sweep")
+    tl.add_argument("--speaker", default="温柔桃子")
+    tl.add_argument("--retries", type=int, default=3, help="Attempts per request (default: 3)")
+    tl.add_argument("--retry-delay", type=float, default=2.0)
+    tl.add_argument("--timeout", type=float, default=180.0, help="Client timeout per request in seconds")
+    tl.add_argument("--limit", type=int, default=None, help="Use only the first N texts")
+    tl.add_argument("-o", "--output", default=None, help="Write results as JSON")
+    _add_standin_args(tl)
+    ds = bsub.add_parser("doubao-server", help="Run the doubao-tts-api stand-in server")
+    ds.add_argument("--host", default="127.0.0.1")
+    ds.add_argument("--port", type=int, default=3456)
+    _add_standin_args(ds)
+
     return p.parse_args(argv)
 
 
+def _add_standin_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--latency-ms", type=float, default=300.0, help="Stand-in base latency per request")
+    p.add_argument("--latency-per-char-ms", type=float, default=20.0, help="Stand-in latency per character")
+    p.add_argument("--max-concurrency", type=int, default=4, help="Stand-in concurrent syntheses (rest queue)")
+    p.add_argument("--server-timeout", type=float, default=180.0, help="Stand-in queue + synthesis budget before 504")
+    p.add_argument("--error-rate", type=float, default=0.0, help="Stand-in probability of a 500 response")
+    p.add_argument("--seed", type=int, default=0)
+
+
+def _standin_config(args: argparse.Namespace):
+    from flexdub.bench.doubao_standin import StandinConfig
+    return StandinConfig(
+        base_latency_ms=args.latency_ms,
+        latency_per_char_ms=args.latency_per_char_ms,
+        max_concurrency=args.max_concurrency,
+        timeout_s=args.server_timeout,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+
+def _load_voice_map(path: Optional[str]) -> Optional[dict]:
+    if not path:
+        return None
+    try:
+        import json as _json
+        with open(path, "r", encoding="utf-8") as vf:
+            return _json.load(vf)
+    except Exception:
+        return None
+
+
 def main(argv: Optional[list] = None) -> int:
     args = _parse_args(argv)
     if args.cmd == "merge":
-        items = read_srt(args.srt_path)
-        orig_texts = [i.text for i in items]
-        items = [SRTItem(i.start_ms, i.end_ms, i.text) for i in items]
-        if not args.no_rebalance and not args.clustered:
-            segs = to_segments(items)
-            segs = rebalance_intervals(segs, target_cpm=args.target_cpm, max_shift_ms=args.max_shift, panic_cpm=args.panic_cpm)
-            items = from_segments(segs)
-            after_texts = [i.text for i in items]
-            if after_texts != orig_texts:
-                raise RuntimeError("text mutated in script stage")
-        display_srt = None
-        audio_srt = None
-        if args.auto_dual_srt:
-            base, _ = os.path.splitext(os.path.basename(args.video_path))
-            out_dir = os.path.dirname(args.video_path)
-            os.makedirs(out_dir, exist_ok=True)
-            display_srt = os.path.join(out_dir, base + ".display.srt")
-            audio_srt = os.path.join(out_dir, base + ".audio.srt")
-            if args.llm_dual_srt:
-                from flexdub.core.subtitle import llm_generate_dual_srt as _llm_dual
-                d_items, a_items = _llm_dual(items)
-                write_srt(display_srt, d_items)
-                write_srt(audio_srt, a_items)
-            else:
-                from flexdub.core.subtitle import semantic_restructure as _semantic_restructure
-                write_srt(display_srt, items)
-                write_srt(audio_srt, _semantic_restructure(items))
-        backend = args.backend
-        voice = args.voice
-        ar = args.ar
-        jobs = args.jobs
-        if args.no_fallback:
-            jobs = 1
-        
-        # Mode selection: elastic-audio (A) or elastic-video (B)
+        governor = configure_governor(args.cpus, args.mode)
+        for line in governor.describe():
+            print(line)
         mode = getattr(args, 'mode', 'elastic-audio')
-        video_segments = []  # Initialize for mode B
-        
-        if mode == "elastic-video":
-            # Mode B: Elastic Video Pipeline
-            from flexdub.pipelines.elastic_video import build_elastic_video_from_srt
-            vmap = None
-            if args.voice_map:
-                try:
-                    import json as _json
-                    with open(args.voice_map, "r", encoding="utf-8") as vf:
-                        vmap = _json.load(vf)
-                except Exception:
-                    vmap = None
-            
-            try:
-                wavs, new_items, video_segments, sync_diagnostics = asyncio.run(
-                    build_elastic_video_from_srt(
-                        items, args.video_path, voice, backend, ar,
-                        jobs=jobs, progress=not args.no_progress, voice_map=vmap,
-                        debug_sync=args.debug_sync,
-                        skip_length_check=args.skip_length_check
-                    )
-                )
-                # Update items with new timeline
-                items = new_items
-            except Exception as e:
-                print(f"[ERROR] elastic-video mode failed: {e}")
-                if args.no_fallback:
-                    return 1
-                raise
-        else:
-            # Mode A: Elastic Audio Pipeline (original)
-            use_clustered = args.clustered or args.auto_dual_srt
-            if use_clustered:
-                from flexdub.pipelines.dubbing import build_audio_from_srt_clustered as _build
-            else:
-                from flexdub.pipelines.dubbing import build_audio_from_srt as _build
-            try:
-                if use_clustered:
-                    vmap = None
-                    if args.voice_map:
-                        try:
-                            import json as _json
-                            with open(args.voice_map, "r", encoding="utf-8") as vf:
-                                vmap = _json.load(vf)
-                        except Exception:
-                            vmap = None
-                    wavs = asyncio.run(_build(items, voice, backend, ar, jobs=jobs, progress=not args.no_progress, smart_split=args.smart_split, voice_map=vmap))
-                else:
-                    wavs = asyncio.run(_build(items, voice, backend, ar, jobs=jobs, progress=not args.no_progress))
-            except Exception as e:
-                print(f"[ERROR] TTS synthesis failed: {e}")
-                return 1
+        if args.plan_only and mode not in VIDEO_MODES:
+            print("[ERROR] --plan-only plans the Mode B timeline: use --mode elastic-video or elastic-hybrid")
+            return 1
         out = args.output
         if out is None:
             base, _ = os.path.splitext(os.path.basename(args.video_path))
             out = os.path.join(os.path.dirname(args.video_path), base + ".dub.mp4")
-        
-        if mode == "elastic-video":
-            # Mode B: Concatenate video segments and merge with audio
-            from flexdub.pipelines.elastic_video import concatenate_video_segments, generate_mode_b_subtitle
-            from flexdub.core.subtitle import detect_gaps
-            
-            tmp_video = tempfile.mktemp(suffix=".mp4")
-            concatenate_video_segments(video_segments, tmp_video)
-            
-            # Concatenate audio segments
-            tmp_mix = tempfile.mktemp(suffix=".wav")
-            concat_wavs(wavs, tmp_mix)
-            
-            # Generate Mode B subtitle file (*.mode_b.srt)
-            base_name = os.path.splitext(os.path.basename(args.srt_path))[0]
-            mode_b_srt_path = os.path.join(os.path.dirname(out), base_name + ".mode_b.srt")
-            
-            # Get TTS durations from the new items (items already has new timeline)
-            tts_durations_for_srt = [it.end_ms - it.start_ms for it in items]
-            
-            # Detect gaps from original items for subtitle generation
-            orig_items = read_srt(args.srt_path)
-            gaps_for_srt = detect_gaps(orig_items, min_gap_ms=100)
-            
-            generate_mode_b_subtitle(
-                orig_items, tts_durations_for_srt, gaps_for_srt, mode_b_srt_path,
-                keep_speaker_tags=True
-            )
-            print(f"[MODE_B] Generated subtitle: {mode_b_srt_path}")
-            
-            # Write updated subtitle with new timeline
-            if args.auto_dual_srt and display_srt:
-                write_srt(display_srt, items)
-            
-            # Write sync diagnostics if enabled
-            if args.debug_sync and sync_diagnostics:
-                diag_path = os.path.join(os.path.dirname(out), os.path.splitext(os.path.basename(out))[0] + ".sync_diag.log")
-                with open(diag_path, "w", encoding="utf-8") as df:
-                    df.write(f"[MODE_B_SYNC_DIAGNOSTICS]\n")
-                    df.write(f"total_original_ms={sync_diagnostics.total_original_ms}\n")
-                    df.write(f"total_new_ms={sync_diagnostics.total_new_ms}\n")
-                    df.write(f"overall_ratio={sync_diagnostics.overall_ratio:.4f}\n")
-                    df.write(f"\n[SEGMENTS]\n")
-                    for seg in sync_diagnostics.segments:
-                        seg_type = "GAP" if seg.is_gap else ("BLANK" if seg.is_blank else "NORMAL")
-                        df.write(f"idx={seg.index} type={seg_type} orig={seg.original_duration_ms}ms tts={seg.tts_duration_ms}ms ratio={seg.stretch_ratio:.3f} new_start={seg.new_start_ms}ms new_end={seg.new_end_ms}ms text={seg.text}\n")
-                    if sync_diagnostics.warnings:
-                        df.write(f"\n[WARNINGS]\n")
-                        for w in sync_diagnostics.warnings:
-                            df.write(f"{w}\n")
-                print(f"[MODE_B] Sync diagnostics written to: {diag_path}")
-            
-            # Verify total duration consistency
-            expected_duration_ms = sum(it.end_ms - it.start_ms for it in items)
-            # Add gap durations
-            for g in gaps_for_srt:
-                expected_duration_ms += g.duration_ms
-            
-            # Get actual audio duration
-            actual_audio_duration_ms = media_duration_ms(tmp_mix)
-            duration_diff_ms = abs(expected_duration_ms - actual_audio_duration_ms)
-            
-            print(f"[MODE_B] Duration verification:")
-            print(f"[MODE_B]   Expected (TTS + gaps): {expected_duration_ms}ms")
-            print(f"[MODE_B]   Actual audio: {actual_audio_duration_ms}ms")
-            print(f"[MODE_B]   Difference: {duration_diff_ms}ms")
-            
-            if duration_diff_ms > 100:  # More than 100ms difference
-                print(f"[MODE_B] WARNING: Duration mismatch exceeds 100ms!")
-            
-            # Merge stretched video with natural-speed audio
-            auto_robust = detect_negative_ts(tmp_video)
-            sub_path = args.subtitle_path
+        out_stem = os.path.join(os.path.dirname(out), os.path.splitext(os.path.basename(out))[0])
+        video_stem = os.path.join(os.path.dirname(args.video_path), os.path.splitext(os.path.basename(args.video_path))[0])
+        if mode in VIDEO_MODES:
             # For Mode B, default to using the generated mode_b.srt
-            if sub_path is None:
-                sub_path = mode_b_srt_path
-            elif args.auto_dual_srt and display_srt is not None:
-                sub_path = display_srt
-            mux_audio_video(tmp_video, tmp_mix, out, subtitle_path=sub_path, subtitle_lang=args.subtitle_lang, robust_ts=(args.robust_ts or auto_robust))
+            subtitle_source = "mode_b" if args.subtitle_path is None else ("display" if args.auto_dual_srt else None)
         else:
-            # Mode A: Original elastic-audio pipeline
-            ordered: list[str] = []
-            dbg_lines: list[str] = []
-            if items:
-                v_ms = media_duration_ms(args.video_path)
-                pre_ms = max(0, items[0].start_ms)
-                if pre_ms > 0:
-                    pre = tempfile.mktemp(suffix=".wav")
-                    make_silence(pre, pre_ms, sr=ar)
-                    ordered.append(pre)
-                dbg_lines.append(f"[VIDEO] duration_ms={v_ms}")
-                dbg_lines.append(f"[PRE] ms={pre_ms}")
-                sample_idx = list(range(0, min(len(items), 20)))
-                for si in sample_idx:
-                    dbg_lines.append(f"[QA] idx={si} same_text={orig_texts[si] == items[si].text}")
-                for i, w in enumerate(wavs):
-                    ordered.append(w)
-                    if i + 1 < len(items):
-                        gap = items[i + 1].start_ms - items[i].end_ms
-                        if gap > 0:
-                            g = tempfile.mktemp(suffix=".wav")
-                            make_silence(g, gap, sr=ar)
-                            ordered.append(g)
-                        dbg_lines.append(f"[SEG] idx={i} start={items[i].start_ms} end={items[i].end_ms} gap_to_next={gap}")
-                last_end = items[-1].end_ms
-                tail = max(0, v_ms - last_end)
-                if tail > 0:
-                    t = tempfile.mktemp(suffix=".wav")
-                    make_silence(t, tail, sr=ar)
-                    ordered.append(t)
-                dbg_lines.append(f"[TAIL] ms={tail}")
-            tmp_mix = tempfile.mktemp(suffix=".wav")
-            concat_wavs(ordered or wavs, tmp_mix)
-            if args.debug_sync:
-                dbg_path = os.path.join(os.path.dirname(out), os.path.splitext(os.path.basename(out))[0] + ".sync_debug.log")
-                with open(dbg_path, "w", encoding="utf-8") as f:
-                    f.write("\n".join(dbg_lines))
-                print(dbg_path)
-            sub_path = args.subtitle_path
-            if sub_path is None and args.auto_dual_srt and display_srt is not None:
-                sub_path = display_srt
-            auto_robust = detect_negative_ts(args.video_path)
-            mux_audio_video(args.video_path, tmp_mix, out, subtitle_path=sub_path, subtitle_lang=args.subtitle_lang, robust_ts=(args.robust_ts or auto_robust))
+            subtitle_source = "display" if args.subtitle_path is None and args.auto_dual_srt else None
+        cfg = MergeConfig(
+            source_path=args.srt_path, video_path=args.video_path, output_path=out,
+            backend=args.backend, voice=args.voice, ar=working_sample_rate(args.backend, args.ar), out_ar=args.ar,
+            mode=mode, jobs=1 if args.no_fallback else args.jobs, progress=not args.no_progress,
+            rebalance=not args.no_rebalance and not args.clustered,
+            target_cpm=args.target_cpm, max_shift=args.max_shift, panic_cpm=args.panic_cpm,
+            dual_srt=("llm" if args.llm_dual_srt else "semantic") if args.auto_dual_srt else None,
+            display_srt=video_stem + ".display.srt", audio_srt=video_stem + ".audio.srt",
+            clustered=args.clustered or args.auto_dual_srt, smart_split=args.smart_split,
+            voice_map=_load_voice_map(args.voice_map), cluster_min_chars=args.cluster_min_chars,
+            cluster_max_chars=args.cluster_max_chars, coalesce=args.coalesce, incremental=args.incremental,
+            cluster_plan=not args.no_cluster_plan, latency_model=args.latency_model,
+            skip_length_check=args.skip_length_check,
+            intermediate_codec=args.intermediate_codec, stream_copy=not args.no_stream_copy,
+            sync_tolerance_ms=args.sync_tolerance_ms, video_cache_bytes=int(args.video_cache_gb * 1024 ** 3),
+            audio_stretch_range=args.audio_stretch_range,
+            final_chunk_clips=args.final_chunk_clips, final_workers=args.final_workers, plan_only=args.plan_only,
+            plan_first=args.plan_first, proxy=args.proxy,
+            video_encoder_args=shlex.split(args.video_encoder_args) if args.video_encoder_args else None,
+            subtitle_path=args.subtitle_path, subtitle_source=subtitle_source, subtitle_lang=args.subtitle_lang,
+            mode_b_srt=os.path.join(os.path.dirname(out), os.path.splitext(os.path.basename(args.srt_path))[0] + ".mode_b.srt"),
+            mode_b_plan=os.path.join(os.path.dirname(out), os.path.splitext(os.path.basename(args.srt_path))[0] + ".mode_b_plan.json"),
+            robust_ts=args.robust_ts, debug_sync=args.debug_sync,
+            debug_log_path=out_stem + ".sync_debug.log", diag_log_path=out_stem + ".sync_diag.log",
+            use_cache=not args.no_cache,
+        )
+        try:
+            asyncio.run(watched(run_merge(cfg), args.loop_watchdog_ms))
+        except StageFailed as e:
+            if e.stage == "dub":
+                print(f"[ERROR] TTS synthesis failed: {e.error}")
+                return 1
+            if e.stage == "elastic":
+                print(f"[ERROR] {mode} mode failed: {e.error}")
+                if args.no_fallback:
+                    return 1
+            raise e.error
+        print(format_proc_stats())
         return 0
     if args.cmd == "json_merge":
-        from flexdub.core.io import read_segments_json
-        segs = read_segments_json(args.segments_json, source=args.source)
-        items = from_segments(segs)
-        orig_texts = [i.text for i in items]
-        items = [SRTItem(i.start_ms, i.end_ms, i.text) for i in items]
-        if not args.no_rebalance and not args.clustered:
-            segs2 = rebalance_intervals([type("S", (), {"start_ms": i.start_ms, "end_ms": i.end_ms, "text": i.text}) for i in items], target_cpm=args.target_cpm, max_shift_ms=args.max_shift, panic_cpm=args.panic_cpm)
-            items = from_segments(segs2)
-            after_texts = [i.text for i in items]
-            if after_texts != orig_texts:
-                raise RuntimeError("text mutated in script stage")
-        backend = args.backend
-        voice = args.voice
-        ar = args.ar
-        jobs = args.jobs
-        if args.no_fallback:
-            jobs = 1
-        if args.clustered:
-            from flexdub.pipelines.dubbing import build_audio_from_srt_clustered as _build2
-        else:
-            from flexdub.pipelines.dubbing import build_audio_from_srt as _build2
-        try:
-            if args.clustered:
-                vmap2 = None
-                if args.voice_map:
-                    try:
-                        import json as _json
-                        with open(args.voice_map, "r", encoding="utf-8") as vf2:
-                            vmap2 = _json.load(vf2)
-                    except Exception:
-                        vmap2 = None
-                wavs = asyncio.run(_build2(items, voice, backend, ar, jobs=jobs, progress=not args.no_progress, smart_split=args.smart_split, voice_map=vmap2))
-            else:
-                wavs = asyncio.run(_build2(items, voice, backend, ar, jobs=jobs, progress=not args.no_progress))
-        except Exception as e:
-            print(f"[ERROR] TTS synthesis failed: {e}")
-            return 1
-        ordered2: list[str] = []
-        dbg_lines2: list[str] = []
-        if items:
-            v_ms2 = media_duration_ms(args.video_path)
-            pre_ms2 = max(0, items[0].start_ms)
-            if pre_ms2 > 0:
-                pre2 = tempfile.mktemp(suffix=".wav")
-                make_silence(pre2, pre_ms2, sr=ar)
-                ordered2.append(pre2)
-            dbg_lines2.append(f"[VIDEO] duration_ms={v_ms2}")
-            dbg_lines2.append(f"[PRE] ms={pre_ms2}")
-            sample_idx2 = list(range(0, min(len(items), 20)))
-            for si in sample_idx2:
-                dbg_lines2.append(f"[QA] idx={si} same_text={orig_texts[si] == items[si].text}")
-            for i, w in enumerate(wavs):
-                ordered2.append(w)
-                if i + 1 < len(items):
-                    gap2 = items[i + 1].start_ms - items[i].end_ms
-                    if gap2 > 0:
-                        g2 = tempfile.mktemp(suffix=".wav")
-                        make_silence(g2, gap2, sr=ar)
-                        ordered2.append(g2)
-                    dbg_lines2.append(f"[SEG] idx={i} start={items[i].start_ms} end={items[i].end_ms} gap_to_next={gap2}")
-            last_end2 = items[-1].end_ms
-            tail2 = max(0, v_ms2 - last_end2)
-            if tail2 > 0:
-                t2 = tempfile.mktemp(suffix=".wav")
-                make_silence(t2, tail2, sr=ar)
-                ordered2.append(t2)
-            dbg_lines2.append(f"[TAIL] ms={tail2}")
-        tmp_mix = tempfile.mktemp(suffix=".wav")
-        concat_wavs(ordered2 or wavs, tmp_mix)
+        governor = configure_governor(args.cpus, "elastic-audio")
+        for line in governor.describe():
+            print(line)
         out = args.output
         if out is None:
             base, _ = os.path.splitext(os.path.basename(args.video_path))
             out = os.path.join(os.path.dirname(args.video_path), base + ".dub.mp4")
-        if args.debug_sync:
-            dbg_path2 = os.path.join(os.path.dirname(out), os.path.splitext(os.path.basename(out))[0] + ".sync_debug.log")
-            with open(dbg_path2, "w", encoding="utf-8") as f:
-                f.write("\n".join(dbg_lines2))
-            print(dbg_path2)
-        auto_robust2 = detect_negative_ts(args.video_path)
-        mux_audio_video(args.video_path, tmp_mix, out, subtitle_path=args.subtitle_path, subtitle_lang=args.subtitle_lang, robust_ts=(args.robust_ts or auto_robust2))
+        cfg = MergeConfig(
+            source_path=args.segments_json, source_kind="json", json_source=args.source,
+            video_path=args.video_path, output_path=out,
+            backend=args.backend, voice=args.voice, ar=working_sample_rate(args.backend, args.ar), out_ar=args.ar,
+            jobs=1 if args.no_fallback else args.jobs, progress=not args.no_progress,
+            rebalance=not args.no_rebalance and not args.clustered,
+            target_cpm=args.target_cpm, max_shift=args.max_shift, panic_cpm=args.panic_cpm,
+            clustered=args.clustered, smart_split=args.smart_split,
+            voice_map=_load_voice_map(args.voice_map) if args.clustered else None,
+            cluster_min_chars=args.cluster_min_chars, cluster_max_chars=args.cluster_max_chars,
+            cluster_plan=not args.no_cluster_plan, latency_model=args.latency_model,
+            coalesce=args.coalesce, incremental=args.incremental,
+            subtitle_path=args.subtitle_path, subtitle_lang=args.subtitle_lang,
+            robust_ts=args.robust_ts, debug_sync=args.debug_sync,
+            debug_log_path=os.path.join(os.path.dirname(out), os.path.splitext(os.path.basename(out))[0] + ".sync_debug.log"),
+            use_cache=not args.no_cache,
+        )
+        try:
+            asyncio.run(watched(run_merge(cfg), args.loop_watchdog_ms))
+        except StageFailed as e:
+            if e.stage == "dub":
+                print(f"[ERROR] TTS synthesis failed: {e.error}")
+                return 1
+            raise e.error
+        print(format_proc_stats())
         return 0
     if args.cmd == "rebalance":
         items = read_srt(args.srt_path)
@@ -624,125 +524,43 @@ def main(argv: Optional[list] = None) -> int:
             audio_srt = os.path.join(out_dir, os.path.splitext(os.path.basename(srt_path))[0] + ".audio.srt")
             with open(log_path, "w", encoding="utf-8") as log:
                 log.write("[START] project_merge\n")
-                items = read_srt(srt_path)
-                orig_texts = [i.text for i in items]
-                items = [SRTItem(i.start_ms, i.end_ms, i.text) for i in items]
-                if args.auto_dual_srt:
-                    if args.llm_dual_srt:
-                        from flexdub.core.subtitle import llm_generate_dual_srt as _llm_dual
-                        d_items, a_items = _llm_dual(items)
-                        write_srt(display_srt, d_items)
-                        write_srt(audio_srt, a_items)
-                    else:
-                        from flexdub.core.subtitle import semantic_restructure as _semantic_restructure
-                        write_srt(display_srt, items)
-                        write_srt(audio_srt, _semantic_restructure(items))
-                    log.write("[DUAL] display.srt & audio.srt written\n")
-                rows = []
-                for idx, it in enumerate(items, start=1):
-                    dur = max(1, it.end_ms - it.start_ms)
-                    chars = len(it.text.strip())
-                    cpm = chars / (dur / 60000.0)
-                    rows.append((idx, cpm, dur, chars, it.start_ms, it.end_ms))
-                with open(cpm_csv, "w", newline="", encoding="utf-8") as f:
-                    import csv
-                    w = csv.writer(f)
-                    w.writerow(["index", "cpm", "duration_ms", "chars", "start_ms", "end_ms"])
-                    for r in rows:
-                        w.writerow(list(r))
-                log.write("[AUDIT] cpm.csv written\n")
-                if not args.no_rebalance and not args.clustered:
-                    segs = [type("S", (), {"start_ms": i.start_ms, "end_ms": i.end_ms, "text": i.text}) for i in items]
-                    segs2 = rebalance_intervals(segs, target_cpm=args.target_cpm, max_shift_ms=args.max_shift, panic_cpm=args.panic_cpm)
-                    items = [SRTItem(i.start_ms, i.end_ms, i.text) for i in segs2]
-                    after_texts = [i.text for i in items]
-                    if after_texts != orig_texts:
-                        raise RuntimeError("text mutated in script stage")
-                    write_srt(rebalance_srt, items)
-                    log.write("[REBALANCE] rebalance.srt written\n")
-                tl = args.target_lang
-                if tl is None:
-                    tl = detect_language([i.text for i in items])
-                backend = args.backend
-                voice = args.voice if args.voice is not None else (recommended_voice(tl) if args.auto_voice else None)
-                if voice is None:
-                    voice = recommended_voice(tl)
-                log.write(f"[LANG] {tl}\n")
-                log.write(f"[VOICE] {voice}\n")
-                ar = args.ar
-                jobs = args.jobs
-                if args.no_fallback:
-                    jobs = 1
-                try:
-                    use_clustered = args.clustered or args.auto_dual_srt
-                    if use_clustered:
-                        from flexdub.pipelines.dubbing import build_audio_from_srt_clustered as _build3
-                        vmap3 = None
-                        vmap_path = args.voice_map or os.path.join(pdir, "voice_map.json")
-                        if os.path.exists(vmap_path):
-                            try:
-                                with open(vmap_path, "r", encoding="utf-8") as vf3:
-                                    vmap3 = json.load(vf3)
-                            except Exception:
-                                vmap3 = None
-                        wavs = asyncio.run(_build3(items, voice, backend, ar, jobs=jobs, progress=not args.no_progress, smart_split=args.smart_split, voice_map=vmap3))
-                    else:
-                        from flexdub.pipelines.dubbing import build_audio_from_srt as _build3
-                        wavs = asyncio.run(_build3(items, voice, backend, ar, jobs=jobs, progress=not args.no_progress))
-                except Exception as e:
-                    log.write(f"[ERROR] synth failed: {e}\n")
-                    raise e
-                ordered: list[str] = []
-                dbg_lines3: list[str] = []
-                if items:
-                    v_ms = media_duration_ms(video_path)
-                    pre_ms = max(0, items[0].start_ms)
-                    if pre_ms > 0:
-                        pre = tempfile.mktemp(suffix=".wav")
-                        make_silence(pre, pre_ms, sr=ar)
-                        ordered.append(pre)
-                    dbg_lines3.append(f"[VIDEO] duration_ms={v_ms}")
-                    dbg_lines3.append(f"[PRE] ms={pre_ms}")
-                    sample_idx3 = list(range(0, min(len(items), 20)))
-                    for si in sample_idx3:
-                        dbg_lines3.append(f"[QA] idx={si} same_text={orig_texts[si] == items[si].text}")
-                    for i, w in enumerate(wavs):
-                        ordered.append(w)
-                        if i + 1 < len(items):
-                            gap = items[i + 1].start_ms - items[i].end_ms
-                            if gap > 0:
-                                g = tempfile.mktemp(suffix=".wav")
-                                make_silence(g, gap, sr=ar)
-                                ordered.append(g)
-                            dbg_lines3.append(f"[SEG] idx={i} start={items[i].start_ms} end={items[i].end_ms} gap_to_next={gap}")
-                    last_end = items[-1].end_ms
-                    tail = max(0, v_ms - last_end)
-                    if tail > 0:
-                        t = tempfile.mktemp(suffix=".wav")
-                        make_silence(t, tail, sr=ar)
-                        ordered.append(t)
-                    dbg_lines3.append(f"[TAIL] ms={tail}")
-                tmp_mix = tempfile.mktemp(suffix=".wav")
-                concat_wavs(ordered or wavs, tmp_mix)
+                governor = configure_governor(args.cpus, "elastic-audio")
+                for line in governor.describe():
+                    log.write(line + "\n")
                 out_mp4 = os.path.join(out_dir, base + ".dub.mp4")
-                subtitle_path = None
                 embed_choice = args.embed_subtitle
                 if args.auto_dual_srt and embed_choice == "rebalance":
                     embed_choice = "display"
-                if embed_choice == "original":
-                    subtitle_path = srt_path
-                elif embed_choice == "rebalance" and not args.no_rebalance:
-                    subtitle_path = rebalance_srt
-                elif embed_choice == "display" and args.auto_dual_srt:
-                    subtitle_path = display_srt
-                if args.debug_sync:
-                    dbg_path3 = os.path.join(out_dir, base + ".sync_debug.log")
-                    with open(dbg_path3, "w", encoding="utf-8") as f:
-                        f.write("\n".join(dbg_lines3))
-                    print(dbg_path3)
-                auto_robust3 = detect_negative_ts(video_path)
-                mux_audio_video(video_path, tmp_mix, out_mp4, subtitle_path=subtitle_path, subtitle_lang=args.subtitle_lang, robust_ts=(args.robust_ts or auto_robust3))
-                log.write("[MERGE] output mp4 written\n")
+                vmap_path = args.voice_map or os.path.join(pdir, "voice_map.json")
+                cfg = MergeConfig(
+                    source_path=srt_path, video_path=video_path, output_path=out_mp4,
+                    backend=args.backend, voice=args.voice, ar=working_sample_rate(args.backend, args.ar), out_ar=args.ar,
+                    jobs=1 if args.no_fallback else args.jobs, progress=not args.no_progress,
+                    rebalance=not args.no_rebalance and not args.clustered,
+                    target_cpm=args.target_cpm, max_shift=args.max_shift, panic_cpm=args.panic_cpm,
+                    rebalance_srt=rebalance_srt, cpm_csv=cpm_csv,
+                    dual_srt=("llm" if args.llm_dual_srt else "semantic") if args.auto_dual_srt else None,
+                    dual_from="parse", display_srt=display_srt, audio_srt=audio_srt,
+                    detect_voice=True, target_lang=args.target_lang,
+                    clustered=args.clustered or args.auto_dual_srt, smart_split=args.smart_split,
+                    voice_map=_load_voice_map(vmap_path) if os.path.exists(vmap_path) else None,
+                    cluster_min_chars=args.cluster_min_chars, cluster_max_chars=args.cluster_max_chars,
+                    cluster_plan=not args.no_cluster_plan, latency_model=args.latency_model,
+                    coalesce=args.coalesce, incremental=args.incremental,
+                    subtitle_path=srt_path if embed_choice == "original" else None,
+                    subtitle_source={"rebalance": "rebalance", "display": "display"}.get(embed_choice),
+                    subtitle_lang=args.subtitle_lang,
+                    robust_ts=args.robust_ts, debug_sync=args.debug_sync,
+                    debug_log_path=os.path.join(out_dir, base + ".sync_debug.log"),
+                    use_cache=not args.no_cache,
+                )
+                try:
+                    asyncio.run(watched(run_merge(cfg, log=lambda line: log.write(line + "\n")), args.loop_watchdog_ms))
+                except StageFailed as e:
+                    if e.stage == "dub":
+                        log.write(f"[ERROR] synth failed: {e.error}\n")
+                    raise e.error
+                log.write(format_proc_stats() + "\n")
                 report = {
                     "project": base,
                     "input_video": video_path,
@@ -1025,6 +843,38 @@ def main(argv: Optional[list] = None) -> int:
             print(f"[ERROR] 处理失败: {e}")
             return 1
     
+    if args.cmd == "bench":
+        if args.bench_cmd == "doubao-server":
+            from flexdub.bench.doubao_standin import run_standin
+            print(f"[BENCH] doubao stand-in listening on http://{args.host}:{args.port}")
+            run_standin(_standin_config(args), host=args.host, port=args.port)
+            return 0
+        if args.bench_cmd == "tts-load":
+            from flexdub.bench.tts_load import load_srt_workload, run_tts_load_sweep
+            texts = load_srt_workload(args.srt_paths)
+            if args.limit is not None:
+                texts = texts[:args.limit]
+            if not texts:
+                print("[ERROR] no TTS texts found in the given SRT files")
+                return 1
+            jobs_list = [int(j) for j in args.jobs.split(",") if j.strip()]
+            print(f"[BENCH] {len(texts)} requests, {sum(len(t) for t in texts)} chars, jobs={jobs_list}")
+            results = asyncio.run(run_tts_load_sweep(
+                texts, jobs_list,
+                server_url=args.server_url,
+                standin_config=_standin_config(args),
+                speaker=args.speaker,
+                retries=args.retries,
+                retry_delay=args.retry_delay,
+                timeout_s=args.timeout,
+            ))
+            if args.output:
+                import json as _json
+                with open(args.output, "w", encoding="utf-8") as f:
+                    _json.dump([r.to_dict() for r in results], f, ensure_ascii=False, indent=2)
+                print(f"[BENCH] Report written to: {args.output}")
+            return 0 if all(r.failed == 0 for r in results) else 1
+    
     return 1
 
 
@@ -0,0 +1,132 @@
+"""
+Event-loop helpers
+
+- run_blocking: 把阻塞调用（ffmpeg、soundfile 读写、文件复制）放到线程池执行，
+  避免在 async worker 中卡住事件循环。
+- aclosing: 消费异步生成器时使用（如 synthesize_many），提前退出或出错时
+  立即关闭生成器，而不是等到垃圾回收，其中的 worker 随之取消。
+- LoopWatchdog: 调试用看门狗。测量事件循环延迟，任何回调阻塞超过阈值时
+  记录其调用栈。通过 FLEXDUB_LOOP_WATCHDOG_MS 或 CLI --loop-watchdog-ms 启用。
+"""
+
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Awaitable, Callable, List, Optional
+
+try:
+    from contextlib import aclosing
+except ImportError:  # Python 3.9
+    from contextlib import asynccontextmanager
+
+    @asynccontextmanager
+    async def aclosing(thing):  # type: ignore[no-redef]
+        try:
+            yield thing
+        finally:
+            await thing.aclose()
+
+WATCHDOG_ENV = "FLEXDUB_LOOP_WATCHDOG_MS"
+
+
+async def run_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking callable in the loop's default thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+
+class LoopWatchdog:
+    """
+    Detects event-loop stalls.
+
+    A heartbeat task on the loop records when it last ran; a monitor thread
+    checks the heartbeat and, once it is older than threshold_ms, captures the
+    loop thread's current stack (the blocking callback) and logs it. Lag of
+    every heartbeat is also tracked, so max/mean lag can be reported at the end.
+    """
+
+    def __init__(self, threshold_ms: float, interval_ms: float = 20.0, log: Callable[[str], None] = print):
+        self.threshold_ms = float(threshold_ms)
+        self.interval_ms = float(interval_ms)
+        self.log = log
+        self.stalls: List[str] = []
+        self.max_lag_ms = 0.0
+        self._lag_sum = 0.0
+        self._beats = 0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional["asyncio.Task"] = None
+
+    async def _heartbeat(self) -> None:
+        interval = self.interval_ms / 1000.0
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            lag_ms = max(0.0, (now - expected) * 1000.0)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            self._lag_sum += lag_ms
+            self._beats += 1
+            self._last_beat = now
+
+    def _monitor(self) -> None:
+        reported_beat = None
+        while not self._stop.wait(self.interval_ms / 1000.0):
+            beat = self._last_beat
+            stalled_ms = (time.monotonic() - beat) * 1000.0 - self.interval_ms
+            if stalled_ms < self.threshold_ms or beat == reported_beat:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<no frame>"
+            msg = f"[LOOP_WATCHDOG] event loop blocked for >{stalled_ms:.0f}ms (threshold {self.threshold_ms:.0f}ms) at:\n{stack}"
+            self.stalls.append(msg)
+            self.log(msg)
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._monitor, name="flexdub-loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        mean = self._lag_sum / self._beats if self._beats else 0.0
+        self.log(f"[LOOP_WATCHDOG] lag mean={mean:.1f}ms max={self.max_lag_ms:.1f}ms stalls={len(self.stalls)}")
+
+    async def __aenter__(self) -> "LoopWatchdog":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def watchdog_from_env() -> Optional[LoopWatchdog]:
+    """A LoopWatchdog when FLEXDUB_LOOP_WATCHDOG_MS is set to a positive number, else None."""
+    raw = os.environ.get(WATCHDOG_ENV)
+    try:
+        ms = float(raw) if raw else 0.0
+    except ValueError:
+        return None
+    return LoopWatchdog(ms) if ms > 0 else None
+
+
+async def watched(coro: Awaitable[Any], threshold_ms: Optional[float] = None) -> Any:
+    """Await coro under a LoopWatchdog when threshold_ms (or FLEXDUB_LOOP_WATCHDOG_MS) is set."""
+    watchdog = LoopWatchdog(threshold_ms) if threshold_ms else watchdog_from_env()
+    if watchdog is None:
+        return await coro
+    async with watchdog:
+        return await coro
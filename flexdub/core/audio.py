@@ -1,12 +1,13 @@
 import os
 import shutil
-import subprocess
 import tempfile
-from typing import List, Optional, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 import soundfile as sf
 
+from flexdub.core.proc import run_media
+
 try:
     import pyrubberband as rubberband
 except Exception:
@@ -27,11 +28,11 @@ def remove_silence(wav_path: str) -> str:
         out,
     ]
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        run_media(cmd)
     except Exception:
         if os.path.exists(out):
             try:
-                probe = subprocess.check_output([
+                probe = run_media([
                     "ffprobe",
                     "-v",
                     "error",
@@ -40,7 +41,7 @@ def remove_silence(wav_path: str) -> str:
                     "-of",
                     "default=noprint_wrappers=1:nokey=1",
                     out,
-                ], stderr=subprocess.DEVNULL)
+                ]).stdout
                 sec = float(probe.decode("utf-8").strip())
                 if sec > 0:
                     return out
@@ -50,9 +51,22 @@ def remove_silence(wav_path: str) -> str:
     return out
 
 
+# Containers whose header gives an exact frame count; others are probed with ffprobe
+HEADER_DURATION_EXTS = (".wav", ".flac")
+
+
 def audio_duration_ms(path: str) -> int:
-    data, sr = sf.read(path)
-    return int(round(len(data) / float(sr) * 1000.0))
+    if path.lower().endswith(HEADER_DURATION_EXTS):
+        # header only: no need to decode the samples
+        try:
+            info = sf.info(path)
+            return int(round(info.frames / float(info.samplerate) * 1000.0))
+        except Exception:
+            pass
+    ms = media_duration_ms(path)
+    if ms <= 0:
+        raise RuntimeError(f"cannot read audio duration: {path}")
+    return ms
 
 
 def pad_silence(src_wav: str, dst_wav: str, target_ms: int) -> None:
@@ -87,19 +101,15 @@ def time_stretch_rubberband(src_wav: str, dst_wav: str, target_ms: int) -> None:
         data, sr = sf.read(src_wav)
         sf.write(dst_wav, data, sr)
         return
-    if rubberband is not None:
-        data, sr = sf.read(src_wav)
+    if rubberband is not None and shutil.which("rubberband"):
+        # the CLI pyrubberband wraps, run on the files directly so it counts against the process limit
         rate = src_ms / float(target_ms)
-        try:
-            stretched = rubberband.time_stretch(data, sr, rate)
-            sf.write(dst_wav, stretched, sr)
+        if run_media(["rubberband", "-q", "--tempo", f"{rate:.6f}", src_wav, dst_wav], check=False).returncode == 0:
             return
-        except Exception:
-            pass
     if shutil.which("ffmpeg"):
         tempo = src_ms / float(target_ms)
         chain = ffmpeg_atempo_chain(tempo)
-        subprocess.run([
+        run_media([
             "ffmpeg",
             "-y",
             "-i",
@@ -107,23 +117,42 @@ def time_stretch_rubberband(src_wav: str, dst_wav: str, target_ms: int) -> None:
             "-filter:a",
             chain,
             dst_wav,
-        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        ])
         return
     data, sr = sf.read(src_wav)
     sf.write(dst_wav, data, sr)
 
 
-def concat_wavs(paths: List[str], dst_wav: str) -> None:
+def can_time_stretch() -> bool:
+    """True if time_stretch_rubberband can change the tempo (otherwise it copies the input)."""
+    return (rubberband is not None and shutil.which("rubberband") is not None) or shutil.which("ffmpeg") is not None
+
+
+def fit_length(src_wav: str, dst_wav: str, target_ms: int) -> None:
+    """Pad with silence or trim to exactly target_ms (stretchers land a few ms off)."""
+    data, sr = sf.read(src_wav)
+    n = int(round(target_ms / 1000.0 * sr))
+    if len(data) < n:
+        pad = np.zeros((n - len(data),) + data.shape[1:], dtype=data.dtype)
+        data = np.concatenate([data, pad], axis=0)
+    sf.write(dst_wav, data[:n], sr)
+
+
+def concat_wavs(paths: List[str], dst_wav: str, ar: Optional[int] = None) -> None:
+    """Concatenate WAVs; `ar` resamples the result (segments may be at the backend's native rate)."""
     inputs = []
     for p in paths:
         inputs.extend(["-i", p])
     n = len(paths)
     filter_complex = "".join([f"[{i}:a]" for i in range(n)]) + f"concat=n={n}:v=0:a=1[out]"
-    cmd = ["ffmpeg", "-y", *inputs, "-filter_complex", filter_complex, "-map", "[out]", dst_wav]
-    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    cmd = ["ffmpeg", "-y", *inputs, "-filter_complex", filter_complex, "-map", "[out]"]
+    if ar:
+        cmd += ["-ar", str(ar)]
+    cmd += [dst_wav]
+    run_media(cmd)
 
 
-def mux_audio_video(video_path: str, audio_path: str, out_path: str, subtitle_path: Optional[str] = None, subtitle_lang: str = "zh", robust_ts: bool = False) -> None:
+def mux_audio_video(video_path: str, audio_path: str, out_path: str, subtitle_path: Optional[str] = None, subtitle_lang: str = "zh", robust_ts: bool = False, video_args: Optional[List[str]] = None) -> None:
     cmd = ["ffmpeg", "-y", "-i", video_path, "-i", audio_path]
     if subtitle_path:
         cmd += ["-i", subtitle_path]
@@ -134,18 +163,18 @@ def mux_audio_video(video_path: str, audio_path: str, out_path: str, subtitle_pa
     if subtitle_path:
         cmd += ["-map", "2:0", "-c:s", "mov_text", f"-metadata:s:s:0", f"language={subtitle_lang}"]
     cmd += [
-        "-c:v", "copy",
+        *(video_args or ["-c:v", "copy"]),
         "-c:a", "aac",
         "-movflags", "+faststart",
     ]
     if robust_ts:
         cmd += ["-fflags", "+genpts", "-avoid_negative_ts", "make_zero", "-muxpreload", "0", "-muxdelay", "0"]
     cmd += [out_path]
-    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    run_media(cmd)
 
 def detect_negative_ts(video_path: str) -> bool:
     try:
-        out = subprocess.check_output([
+        out = run_media([
             "ffprobe",
             "-v",
             "error",
@@ -154,7 +183,7 @@ def detect_negative_ts(video_path: str) -> bool:
             "-of",
             "default=noprint_wrappers=1:nokey=1",
             video_path,
-        ], stderr=subprocess.DEVNULL)
+        ]).stdout
         val = float(out.decode("utf-8").strip())
         return val < 0.0
     except Exception:
@@ -172,7 +201,7 @@ def make_silence(dst_wav: str, ms: int, sr: int = 48000, channels: int = 1) -> N
 
 def media_duration_ms(path: str) -> int:
     try:
-        out = subprocess.check_output([
+        out = run_media([
             "ffprobe",
             "-v",
             "error",
@@ -181,7 +210,7 @@ def media_duration_ms(path: str) -> int:
             "-of",
             "default=noprint_wrappers=1:nokey=1",
             path,
-        ], stderr=subprocess.DEVNULL)
+        ]).stdout
         sec = float(out.decode("utf-8").strip())
         return int(round(sec * 1000.0))
     except Exception:
@@ -202,7 +231,7 @@ def extract_audio_track(video_path: str, dst_wav: str, ar: int = 48000, mono: bo
         str(ar),
         dst_wav,
     ]
-    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    run_media(cmd)
 
 def _read_pcm_envelope(wav_path: str, win_ms: int = 20) -> Tuple[List[float], int]:
     import wave
@@ -300,7 +329,9 @@ def _build_envelope(wav_path: str, win_ms: int = 20) -> Tuple[List[float], int]:
     return env, sr
 
 def _nearest_low_energy_ms(env: List[float], target_ms: int, win_ms: int = 20, search_ms: int = 250) -> int:
-    idx = int(target_ms / win_ms)
+    if not env:
+        return target_ms
+    idx = min(int(target_ms / win_ms), len(env) - 1)
     span = int(search_ms / win_ms)
     lo = max(0, idx - span)
     hi = min(len(env) - 1, idx + span)
@@ -340,3 +371,208 @@ def split_wav_by_durations_smart(src_wav: str, durations_ms: List[int], win_ms:
         out_paths.append(out)
         pos = end
     return out_paths
+
+def _cue_char_starts(texts: List[str]) -> List[int]:
+    # mirrors the " ".join used to build a cluster's synthesis text
+    starts: List[int] = []
+    pos = 0
+    for t in texts:
+        starts.append(pos)
+        if t:
+            pos += len(t) + 1
+    return starts
+
+def _align_boundaries(text: str, boundaries: List["WordBoundary"], window: int = 32) -> List[Tuple[int, int, "WordBoundary"]]:
+    aligned: List[Tuple[int, int, "WordBoundary"]] = []
+    cursor = 0
+    for b in boundaries:
+        w = (b.text or "").strip()
+        if not w:
+            continue
+        i = text.find(w, cursor)
+        if i < 0 or i - cursor > max(window, 4 * len(w)):
+            continue
+        aligned.append((i, i + len(w), b))
+        cursor = i + len(w)
+    return aligned
+
+def boundary_cut_points(texts: List[str], boundaries: List["WordBoundary"], scale: float = 1.0) -> List[Optional[int]]:
+    """Map each cue's character span to an audio offset (ms) using backend word boundaries.
+
+    Entry i is where cue i starts in the synthesized audio: the middle of the pause between
+    the last word of cue i-1 and the first word of cue i. None means the cue could not be mapped.
+    """
+    joined = " ".join(t for t in texts if t)
+    aligned = _align_boundaries(joined, boundaries)
+    cuts: List[Optional[int]] = []
+    for i, c in enumerate(_cue_char_starts(texts)):
+        if i == 0:
+            cuts.append(0)
+            continue
+        prev = None
+        nxt = None
+        for a in aligned:
+            if a[1] <= c:
+                prev = a
+            elif a[0] >= c:
+                nxt = a
+                break
+        if nxt is None:
+            cuts.append(None)
+            continue
+        start_ms = nxt[2].offset_ms
+        if prev is not None:
+            prev_end = prev[2].offset_ms + prev[2].duration_ms
+            start_ms = (min(prev_end, start_ms) + start_ms) / 2.0
+        cuts.append(int(round(start_ms * scale)))
+    return cuts
+
+def split_wav_by_boundaries(src_wav: str, texts: List[str], durations_ms: List[int], boundaries: List["WordBoundary"], scale: float = 1.0, win_ms: int = 20, search_ms: int = 250) -> List[str]:
+    data, sr = sf.read(src_wav)
+    total = len(data)
+    channels = data.shape[1] if len(data.shape) > 1 else 1
+    cuts = boundary_cut_points(texts, boundaries, scale=scale)
+    env: Optional[List[float]] = None
+    pos = 0
+    out_paths: List[str] = []
+    for i, dur in enumerate(durations_ms):
+        if i == len(durations_ms) - 1:
+            end = total
+        else:
+            cut_ms = cuts[i + 1]
+            if cut_ms is None:
+                # unmapped cue: fall back to the energy envelope around the proportional position
+                if env is None:
+                    env, _ = _build_envelope(src_wav, win_ms=win_ms)
+                cur_ms = int(round(pos / float(sr) * 1000.0))
+                cut_ms = _nearest_low_energy_ms(env, cur_ms + max(0, dur), win_ms=win_ms, search_ms=search_ms)
+            end = min(total, max(pos, int(round(cut_ms / 1000.0 * sr))))
+        chunk = data[pos:end]
+        out = tempfile.mktemp(suffix=".wav")
+        if end <= pos or len(chunk) == 0:
+            silence = np.zeros((1, channels), dtype=np.float32)
+            sf.write(out, silence, sr)
+        else:
+            sf.write(out, chunk.reshape(-1, channels) if len(chunk.shape) == 1 else chunk, sr)
+        out_paths.append(out)
+        pos = end
+    return out_paths
+
+def crossfade_concat_wavs(paths: List[str], dst_wav: str, fade_ms: int = 30) -> None:
+    """Join WAVs (same sample rate) into one file with a short linear crossfade at each seam."""
+    out: Optional[np.ndarray] = None
+    sr_out = 0
+    for p in paths:
+        data, sr = sf.read(p, dtype="float32", always_2d=True)
+        if out is None:
+            out, sr_out = data, sr
+            continue
+        if sr != sr_out:
+            raise ValueError(f"sample rate mismatch: {p} is {sr} Hz, expected {sr_out} Hz")
+        channels = min(out.shape[1], data.shape[1])
+        out, data = out[:, :channels], data[:, :channels]
+        n = min(int(round(fade_ms / 1000.0 * sr)), len(out), len(data))
+        if n > 0:
+            ramp = np.linspace(0.0, 1.0, n, dtype=np.float32).reshape(-1, 1)
+            seam = out[-n:] * (1.0 - ramp) + data[:n] * ramp
+            out = np.concatenate([out[:-n], seam, data[n:]], axis=0)
+        else:
+            out = np.concatenate([out, data], axis=0)
+    if out is None:
+        raise ValueError("No WAVs to join")
+    sf.write(dst_wav, out, sr_out)
+
+def detect_pauses(wav_path: str, min_pause_ms: int = 120, win_ms: int = 10, threshold_db: float = -35.0) -> List[Tuple[int, int]]:
+    """Interior silent runs (start_ms, end_ms) at least min_pause_ms long; leading/trailing silence is ignored."""
+    data, sr = sf.read(wav_path, dtype="float32", always_2d=True)
+    mono = data.mean(axis=1)
+    win = max(1, int(sr * win_ms / 1000))
+    n = len(mono) // win
+    if n == 0:
+        return []
+    rms = np.sqrt((mono[:n * win].reshape(n, win) ** 2).mean(axis=1))
+    peak = float(rms.max())
+    if peak <= 0:
+        return []
+    silent = rms < peak * (10.0 ** (threshold_db / 20.0))
+    pauses: List[Tuple[int, int]] = []
+    start: Optional[int] = None
+    for i, s in enumerate(silent):
+        if s and start is None:
+            start = i
+        elif not s and start is not None:
+            if start > 0 and (i - start) * win_ms >= min_pause_ms:
+                pauses.append((start * win_ms, i * win_ms))
+            start = None
+    return pauses
+
+def split_wav_at_pauses(src_wav: str, n_parts: int, min_pause_ms: int = 120, weights: Optional[Sequence[float]] = None) -> Optional[List[str]]:
+    """Split audio rendered from n_parts texts joined by pause markers.
+
+    The n_parts - 1 longest interior pauses are taken as the marker pauses and dropped from
+    the output, so each part holds only its own speech. With `weights` (the parts' character
+    counts), each cut must also land within half the smaller neighbouring part of its
+    proportional offset, so a pause inside a sentence is not taken for a marker. Returns None
+    when fewer pauses than needed are found or a cut is off, leaving the caller to synthesize
+    the parts one by one.
+    """
+    if n_parts <= 1:
+        return [src_wav]
+    pauses = detect_pauses(src_wav, min_pause_ms=min_pause_ms)
+    if len(pauses) < n_parts - 1:
+        return None
+    chosen = sorted(sorted(pauses, key=lambda p: p[1] - p[0], reverse=True)[:n_parts - 1])
+    data, sr = sf.read(src_wav)
+    channels = data.shape[1] if len(data.shape) > 1 else 1
+    edges = [0] + [x for p in chosen for x in p] + [int(round(len(data) / float(sr) * 1000.0))]
+    if weights is not None:
+        speech = [edges[2 * i + 1] - edges[2 * i] for i in range(n_parts)]
+        total_w, total_s = float(sum(weights)) or 1.0, float(sum(speech)) or 1.0
+        cum_w = cum_s = 0.0
+        for k in range(n_parts - 1):
+            cum_w += weights[k]
+            cum_s += speech[k]
+            if abs(cum_s / total_s - cum_w / total_w) > 0.5 * min(weights[k], weights[k + 1]) / total_w:
+                return None
+    out_paths: List[str] = []
+    for i in range(n_parts):
+        lo = int(round(edges[2 * i] / 1000.0 * sr))
+        hi = min(len(data), int(round(edges[2 * i + 1] / 1000.0 * sr)))
+        chunk = data[lo:hi]
+        out = tempfile.mktemp(suffix=".wav")
+        if len(chunk) == 0:
+            sf.write(out, np.zeros((1, channels), dtype=np.float32), sr)
+        else:
+            sf.write(out, chunk.reshape(-1, channels) if len(chunk.shape) == 1 else chunk, sr)
+        out_paths.append(out)
+    return out_paths
+
+class TimelineWavWriter:
+    """Build a mono timeline WAV incrementally from clips and silences, without intermediate files."""
+
+    def __init__(self, dst_wav: str, sr: int):
+        self.path = dst_wav
+        self.sr = sr
+        self.frames = 0
+        self._f = sf.SoundFile(dst_wav, "w", samplerate=sr, channels=1)
+
+    def silence(self, ms: int) -> None:
+        n = int(round(max(0, ms) / 1000.0 * self.sr))
+        chunk = self.sr  # one second at a time keeps long tails flat in memory
+        while n > 0:
+            k = min(n, chunk)
+            self._f.write(np.zeros(k, dtype=np.float32))
+            self.frames += k
+            n -= k
+
+    def append(self, wav_path: str) -> None:
+        data, sr = sf.read(wav_path, dtype="float32", always_2d=True)
+        if sr != self.sr:
+            raise ValueError(f"sample rate mismatch: {wav_path} is {sr} Hz, timeline is {self.sr} Hz")
+        mono = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+        self._f.write(mono)
+        self.frames += len(mono)
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.close()
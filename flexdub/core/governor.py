@@ -0,0 +1,104 @@
+"""
+Resource governor
+
+把总 CPU 预算（--cpus）分配给各个 CPU 密集阶段：每个阶段得到并发槽位数
+（slots）和每个进程的线程数（threads），并据此设置全局媒体进程上限。
+TTS 网络并发（--jobs）不占 CPU 预算，单独控制。
+
+阶段：
+- fit: 音频拟合（静音裁剪、rubberband / atempo 变速、解码）
+- video_encode: Mode B 视频片段提取与拉伸（x264）
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from flexdub.core import proc
+
+# x264 gains little beyond ~4 threads on short segments; more segments in parallel scale better
+MAX_ENCODE_THREADS = 4
+
+# Modes that re-time the video (run the Mode B render stage)
+VIDEO_MODES = ("elastic-video", "elastic-hybrid")
+
+
+@dataclass(frozen=True)
+class StageAllocation:
+    """CPU share of one stage: `slots` concurrent processes with `threads` threads each."""
+    stage: str
+    slots: int
+    threads: int
+
+
+class ResourceGovernor:
+    """Splits a CPU budget across pipeline stages."""
+
+    def __init__(self, cpus: Optional[int] = None, mode: str = "elastic-audio"):
+        self.cpus = max(1, cpus or os.cpu_count() or 1)
+        self.mode = mode
+        self.allocations: Dict[str, StageAllocation] = self._plan()
+
+    def _plan(self) -> Dict[str, StageAllocation]:
+        c = self.cpus
+        if self.mode in VIDEO_MODES:
+            # audio work (decode, stitch) is light next to x264: a quarter of the budget
+            audio = max(1, c // 4)
+            budget = max(1, c - audio)
+            slots = max(1, int(budget / MAX_ENCODE_THREADS + 0.5))
+            return {
+                "fit": StageAllocation("fit", audio, 1),
+                "video_encode": StageAllocation("video_encode", slots, max(1, budget // slots)),
+            }
+        return {
+            "fit": StageAllocation("fit", c, 1),
+            "video_encode": StageAllocation("video_encode", 1, c),
+        }
+
+    def allocation(self, stage: str) -> StageAllocation:
+        return self.allocations[stage]
+
+    def slots(self, stage: str) -> int:
+        return self.allocations[stage].slots
+
+    def threads(self, stage: str) -> int:
+        return self.allocations[stage].threads
+
+    def apply(self) -> None:
+        """
+        Install the plan: each stage is capped at its own slots; the media
+        process cap is the slots of the stages that run together, but never
+        more processes than CPUs.
+        """
+        if self.mode in VIDEO_MODES:
+            limit = self.slots("fit") + self.slots("video_encode")
+        else:
+            limit = self.slots("fit")
+        proc.set_process_limit(min(limit, self.cpus))
+        proc.set_stage_limits({a.stage: a.slots for a in self.allocations.values()})
+        proc.set_default_threads(self.threads("fit"))
+
+    def describe(self) -> List[str]:
+        lines = [f"[GOVERNOR] cpus={self.cpus} mode={self.mode} process_limit={proc.process_limit()}"]
+        for a in self.allocations.values():
+            lines.append(f"[GOVERNOR]   stage={a.stage} slots={a.slots} threads={a.threads}")
+        return lines
+
+
+_current: Optional[ResourceGovernor] = None
+
+
+def configure(cpus: Optional[int] = None, mode: str = "elastic-audio") -> ResourceGovernor:
+    """Create, install and return the process-wide governor."""
+    global _current
+    _current = ResourceGovernor(cpus, mode)
+    _current.apply()
+    return _current
+
+
+def current() -> ResourceGovernor:
+    """The installed governor, or a default one for the whole machine."""
+    global _current
+    if _current is None:
+        _current = ResourceGovernor()
+    return _current
@@ -0,0 +1,222 @@
+"""
+Media subprocess runner
+
+所有 ffmpeg / ffprobe / rubberband 调用都经过这里：
+- 进程级并发上限（FLEXDUB_MAX_PROCS，默认 CPU 核数），突发的 TTS 结果不会把 CPU 超订
+- 按阶段的并发上限（set_stage_limits，由 governor 设置）：音频拟合与视频编码各占各的槽位
+- 每次 ffmpeg 调用分配 -threads，使并发进程分摊 CPU 而不是各自占满所有核
+- 失败时附带 stderr 末尾若干行
+- 每次调用计时，stats() 汇总；FLEXDUB_PROC_TRACE=1 时逐条打印
+"""
+
+import asyncio
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+STDERR_TAIL_LINES = 20
+
+# Stage a process counts against when the caller does not name one
+DEFAULT_STAGE = "fit"
+
+
+class MediaProcessError(subprocess.CalledProcessError):
+    """A media subprocess exited non-zero; str() includes the stderr tail."""
+
+    def __str__(self) -> str:
+        tail = self.stderr.decode("utf-8", "replace") if isinstance(self.stderr, bytes) else (self.stderr or "")
+        base = f"{os.path.basename(str(self.cmd[0]))} exited with status {self.returncode}"
+        return f"{base}\n{tail}" if tail else base
+
+
+@dataclass
+class ProcResult:
+    """Outcome of one media subprocess."""
+    cmd: List[str]
+    returncode: int
+    elapsed_ms: float
+    stdout: bytes
+    stderr_tail: str
+
+
+_lock = threading.Lock()
+_limit: Optional[int] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_default_threads: Optional[int] = None
+_stage_slots: Dict[str, threading.BoundedSemaphore] = {}
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _cpu_count() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+def set_process_limit(n: Optional[int]) -> None:
+    """Set the global cap on concurrent media processes (None: FLEXDUB_MAX_PROCS or CPU count)."""
+    global _limit, _slots
+    with _lock:
+        if n is None:
+            env = os.environ.get("FLEXDUB_MAX_PROCS")
+            n = int(env) if env and env.isdigit() else _cpu_count()
+        _limit = max(1, int(n))
+        _slots = threading.BoundedSemaphore(_limit)
+
+
+def process_limit() -> int:
+    if _limit is None:
+        set_process_limit(None)
+    return _limit  # type: ignore[return-value]
+
+
+def set_stage_limits(limits: Optional[Dict[str, int]]) -> None:
+    """Cap concurrent processes per stage, within the global limit (None: no stage caps)."""
+    global _stage_slots
+    with _lock:
+        _stage_slots = {k: threading.BoundedSemaphore(max(1, int(n))) for k, n in (limits or {}).items()}
+
+
+def set_default_threads(n: Optional[int]) -> None:
+    """Threads for ffmpeg calls that do not pass their own (None: derive from the process limit)."""
+    global _default_threads
+    _default_threads = max(1, int(n)) if n is not None else None
+
+
+def default_threads() -> int:
+    """ffmpeg threads per process so that a full set of processes roughly fills the CPU."""
+    if _default_threads is not None:
+        return _default_threads
+    return max(1, _cpu_count() // process_limit())
+
+
+def _prepare(cmd: List[str], threads: Optional[int], piped_input: bool) -> List[str]:
+    tool = os.path.basename(str(cmd[0]))
+    if tool != "ffmpeg":
+        return list(cmd)
+    head = ["ffmpeg", "-hide_banner"]
+    if not piped_input:
+        head.append("-nostdin")
+    body = list(cmd[1:])
+    t = default_threads() if threads is None else threads
+    # commands without an output (e.g. -version) end with an option and get no -threads
+    if t and "-threads" not in body and body and (body[-1] == "-" or not body[-1].startswith("-")):
+        if len(body) < 3 or body[-2] == "-i":
+            raise ValueError(f"ffmpeg command must end with its output path: {' '.join(cmd)}")
+        # output option: placed right before the output path
+        body = body[:-1] + ["-threads", str(t), body[-1]]
+    return head + body
+
+
+def _tail(stderr: bytes) -> str:
+    lines = stderr.decode("utf-8", "replace").strip().splitlines()
+    return "\n".join(lines[-STDERR_TAIL_LINES:])
+
+
+def _record(cmd: List[str], rc: int, elapsed_ms: float) -> None:
+    tool = os.path.basename(str(cmd[0]))
+    with _lock:
+        s = _stats.setdefault(tool, {"calls": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0})
+        s["calls"] += 1
+        s["failures"] += 1 if rc != 0 else 0
+        s["total_ms"] += elapsed_ms
+        s["max_ms"] = max(s["max_ms"], elapsed_ms)
+    if os.environ.get("FLEXDUB_PROC_TRACE"):
+        print(f"[PROC] {tool} rc={rc} {elapsed_ms:.0f}ms: {' '.join(cmd[1:])[:200]}")
+
+
+def _finish(cmd: List[str], rc: int, out: bytes, err: bytes, elapsed_ms: float, check: bool) -> ProcResult:
+    _record(cmd, rc, elapsed_ms)
+    tail = _tail(err or b"")
+    if check and rc != 0:
+        raise MediaProcessError(rc, cmd, output=out, stderr=tail.encode("utf-8"))
+    return ProcResult(cmd=cmd, returncode=rc, elapsed_ms=elapsed_ms, stdout=out or b"", stderr_tail=tail)
+
+
+def run_media(
+    cmd: List[str],
+    threads: Optional[int] = None,
+    check: bool = True,
+    input: Optional[bytes] = None,
+    timeout: Optional[float] = None,
+    stage: str = DEFAULT_STAGE,
+) -> ProcResult:
+    """Run a media subprocess from synchronous code (e.g. a worker thread), within its stage's and the global limit."""
+    full = _prepare(cmd, threads, input is not None)
+    process_limit()
+    stage_slots = _stage_slots.get(stage)
+    if stage_slots is not None:
+        stage_slots.acquire()
+    _slots.acquire()  # type: ignore[union-attr]
+    try:
+        t0 = time.monotonic()
+        proc = subprocess.run(full, input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+        elapsed = (time.monotonic() - t0) * 1000.0
+    finally:
+        _slots.release()  # type: ignore[union-attr]
+        if stage_slots is not None:
+            stage_slots.release()
+    return _finish(full, proc.returncode, proc.stdout, proc.stderr, elapsed, check)
+
+
+async def run_media_async(
+    cmd: List[str],
+    threads: Optional[int] = None,
+    check: bool = True,
+    input: Optional[bytes] = None,
+    timeout: Optional[float] = None,
+    stage: str = DEFAULT_STAGE,
+) -> ProcResult:
+    """Run a media subprocess with asyncio.create_subprocess_exec, within the same limits."""
+    full = _prepare(cmd, threads, input is not None)
+    process_limit()
+    stage_slots = _stage_slots.get(stage)
+    # the limits are shared with worker threads, so poll instead of parking an executor thread
+    delay = 0.005
+    while True:
+        if stage_slots is None or stage_slots.acquire(blocking=False):
+            if _slots.acquire(blocking=False):  # type: ignore[union-attr]
+                break
+            if stage_slots is not None:
+                stage_slots.release()
+        await asyncio.sleep(delay)
+        delay = min(0.05, delay * 2)
+    try:
+        t0 = time.monotonic()
+        proc = await asyncio.create_subprocess_exec(
+            *full,
+            stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(input), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            proc.kill()
+            await proc.wait()
+            raise
+        elapsed = (time.monotonic() - t0) * 1000.0
+    finally:
+        _slots.release()  # type: ignore[union-attr]
+        if stage_slots is not None:
+            stage_slots.release()
+    return _finish(full, proc.returncode if proc.returncode is not None else -1, out, err, elapsed, check)
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Per-tool call counts, failures and timings since start (or the last reset_stats)."""
+    with _lock:
+        return {k: dict(v) for k, v in _stats.items()}
+
+
+def reset_stats() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def format_stats() -> str:
+    parts = []
+    for tool, s in sorted(stats().items()):
+        parts.append(f"{tool}: calls={int(s['calls'])} failures={int(s['failures'])} total={s['total_ms'] / 1000.0:.1f}s max={s['max_ms']:.0f}ms")
+    return "[PROC] " + ("; ".join(parts) if parts else "no media processes") + f" (limit={process_limit()}, threads/proc={default_threads()})"
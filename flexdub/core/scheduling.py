@@ -0,0 +1,100 @@
+"""
+Longest-processing-time-first (LPT) scheduling helpers.
+
+Work is handed to a fixed number of workers with the most expensive item first,
+so a long request or stretch that happens to sit at the end of the timeline
+cannot become the makespan tail. Callers keep results by their own keys and
+read them back in timeline order.
+"""
+
+import asyncio
+import itertools
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def lpt_order(entries: List[T], cost: Callable[[T], float]) -> List[T]:
+    """Entries sorted by estimated cost, most expensive first (stable for equal costs)."""
+    return sorted(entries, key=cost, reverse=True)
+
+
+class LPTWorkPool:
+    """
+    Bounded pool for blocking jobs (ffmpeg, rubberband, numpy) run in threads.
+
+    Jobs may be submitted while others run. Ready jobs wait in a priority queue
+    and each free worker takes the most expensive one, so at most `workers`
+    jobs are in flight and no coroutine is created per pending job.
+    """
+
+    def __init__(self, workers: int, backlog: Optional[int] = None):
+        self.workers = max(1, workers)
+        # bounded hand-off: submit_wait blocks once `backlog` jobs are queued or running
+        self._slots = asyncio.Semaphore(self.workers + backlog) if backlog is not None else None
+        self._queue: "asyncio.PriorityQueue" = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._closed = False
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job = await self._queue.get()
+            if job is None:
+                return
+            fn, args, fut = job
+            if fut.cancelled():
+                continue
+            try:
+                result = await loop.run_in_executor(self._executor, fn, *args)
+            except Exception as e:
+                if not fut.cancelled():
+                    fut.set_exception(e)
+            else:
+                if not fut.cancelled():
+                    fut.set_result(result)
+
+    def submit(self, cost: float, fn: Callable[..., Any], *args: Any) -> "asyncio.Future":
+        """Queue fn(*args) with an estimated cost; returns a future for its result."""
+        if self._closed:
+            raise RuntimeError("LPTWorkPool is closed")
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((-float(cost), next(self._seq), (fn, args, fut)))
+        return fut
+
+    async def submit_wait(self, cost: float, fn: Callable[..., Any], *args: Any) -> "asyncio.Future":
+        """Like submit, but waits for room when the pool was created with a backlog bound."""
+        if self._slots is None:
+            return self.submit(cost, fn, *args)
+        await self._slots.acquire()
+        fut = self.submit(cost, fn, *args)
+        fut.add_done_callback(lambda _f: self._slots.release())
+        return fut
+
+    async def close(self, cancel: bool = False) -> None:
+        """Wait for queued jobs to finish (or drop them when cancel=True) and stop the workers."""
+        if self._closed:
+            return
+        self._closed = True
+        if cancel:
+            while not self._queue.empty():
+                _, _, job = self._queue.get_nowait()
+                if job is not None:
+                    job[2].cancel()
+        for _ in self._tasks:
+            # sentinels sort after every real job
+            self._queue.put_nowait((math.inf, next(self._seq), None))
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+def fit_cost(src_ms: int, target_ms: int) -> float:
+    """Estimated fit work: target duration times stretch ratio; padding-only fits are near free."""
+    ratio = src_ms / float(max(1, target_ms))
+    return target_ms * ratio if ratio > 1.0 else 0.0
@@ -0,0 +1,200 @@
+"""
+Mode B timeline planner
+
+逐条字幕决定视频是否变速，目标是在同步容差内重新编码的帧数最少：
+- TTS 略长：语音顺延进后面的间隙（或下一条字幕的开头），视频不拉伸
+- TTS 略短：语音后补静音，视频不压缩
+- 超出容差才按比例拉伸/压缩该字幕的视频，并把累计的语音滞后清零
+- 混合模式（tempo_range）：所需语速在范围内时改为变速音频（刚好落到容差边缘），画面不动
+未变速的字幕与间隙在源视频上连续，渲染时可合并为整段流复制。
+
+语音相对画面的滞后（lag）只会由上一条字幕的超时带来，因此规划按时间顺序推进；
+后面接有足够长间隙的字幕与之前的决策无关，可以提前规划。
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from flexdub.core.subtitle import Gap, SRTItem
+
+# Speech may start this much after, or end this much past, its picture
+SYNC_TOLERANCE_MS = 300
+
+# Ratios within 1% of 1.0 always keep the original speed
+STRETCH_TOLERANCE = 0.01
+
+# elastic-hybrid: speech tempo (TTS length / fitted length) absorbed by audio stretch
+AUDIO_STRETCH_RANGE = (0.9, 1.15)
+
+
+@dataclass
+class CuePlan:
+    """Planned rendering of one cue."""
+    index: int
+    source_ms: int           # cue duration in the source video
+    audio_ms: int            # speech duration after any audio stretch (0 for blank cues)
+    ratio: float             # video speed factor; 1.0 = unchanged (copyable)
+    slot_ms: int             # cue duration on the new timeline
+    lag_ms: int              # speech start after the cue's picture starts
+    blank: bool = False
+    tempo: float = 1.0       # audio speed factor (hybrid); > 1 speeds speech up
+    video_ms: Optional[float] = None  # exact length of a frame-snapped clip (slot_ms is rounded to ms)
+
+    @property
+    def advance_ms(self) -> float:
+        """How far the video timeline moves over this cue."""
+        return self.slot_ms if self.video_ms is None else self.video_ms
+
+    @property
+    def overrun_ms(self) -> int:
+        """Speech running past the end of the cue's slot (into the gap or next cue)."""
+        return max(0, self.lag_ms + self.audio_ms - self.slot_ms)
+
+    @property
+    def padding_ms(self) -> int:
+        """Silence between the end of speech and the end of the slot."""
+        return 0 if self.blank else max(0, self.slot_ms - self.lag_ms - self.audio_ms)
+
+
+class TimelinePlanner:
+    """
+    Incremental planner: feed TTS durations in any order with `set_audio`;
+    each call returns the cues that became planned. With `tempo_range`, cues
+    outside the tolerance first try an audio stretch within that range.
+    """
+
+    def __init__(
+        self,
+        items: Sequence[SRTItem],
+        gaps: Sequence[Gap],
+        tolerance_ms: int = SYNC_TOLERANCE_MS,
+        tempo_range: Optional[Tuple[float, float]] = None,
+        fps: Optional[float] = None,
+    ):
+        self.items = list(items)
+        self.gap_after: Dict[int, int] = {g.prev_index: g.duration_ms for g in gaps}
+        self.tolerance_ms = max(0, tolerance_ms)
+        self.tempo_range = tempo_range
+        self.fps = fps
+        self.audio: Dict[int, Optional[int]] = {}
+        self.plans: Dict[int, CuePlan] = {}
+
+    def _allowance(self, idx: int) -> int:
+        source = self.items[idx].end_ms - self.items[idx].start_ms
+        return max(self.tolerance_ms, int(source * STRETCH_TOLERANCE))
+
+    def _overrun_limit(self, idx: int) -> int:
+        # the last cue has nothing to run into: the picture must cover its speech
+        if idx + 1 >= len(self.items):
+            return int((self.items[idx].end_ms - self.items[idx].start_ms) * STRETCH_TOLERANCE)
+        return self._allowance(idx)
+
+    def _snap(self, ms: int) -> Optional[float]:
+        """Length of a stretched slot rounded up to whole frames: the rendered clip is exactly this long."""
+        if not self.fps:
+            return None
+        return max(1, math.ceil(ms * self.fps / 1000.0 - 1e-6)) * 1000.0 / self.fps
+
+    def _lag_known(self, idx: int) -> Optional[int]:
+        """Speech lag at the start of cue idx, or None while it depends on an unplanned cue."""
+        if idx == 0:
+            return 0
+        prev = self.plans.get(idx - 1)
+        if prev is not None:
+            return max(0, prev.overrun_ms - self.gap_after.get(idx - 1, 0))
+        # whatever the previous cue does, its overrun fits in the gap that follows it
+        if self.gap_after.get(idx - 1, 0) >= self._allowance(idx - 1):
+            return 0
+        return None
+
+    def _plan(self, idx: int, lag: int) -> CuePlan:
+        it = self.items[idx]
+        source = max(1, it.end_ms - it.start_ms)
+        audio = self.audio[idx]
+        if audio is None:
+            # blank cue: picture at original speed, speech of earlier cues may continue over it
+            return CuePlan(idx, source, 0, 1.0, source, lag, blank=True)
+        need = lag + audio
+        over = need - source
+        if -self._allowance(idx) <= over <= self._overrun_limit(idx):
+            return CuePlan(idx, source, audio, 1.0, source, lag)
+        if self.tempo_range and audio > 0:
+            # stretch speech just enough to reach the edge of the tolerance window
+            edge = self._overrun_limit(idx) if over > 0 else -self._allowance(idx)
+            fitted = source + edge - lag
+            lo, hi = self.tempo_range
+            if fitted > 0 and lo <= audio / fitted <= hi:
+                return CuePlan(idx, source, fitted, 1.0, source, lag, tempo=audio / fitted)
+        # outside tolerance: the picture follows the speech (to the next whole frame)
+        exact = self._snap(need)
+        slot = need if exact is None else int(round(exact))
+        return CuePlan(idx, source, audio, (exact or need) / source, slot, lag, video_ms=exact)
+
+    def set_audio(self, idx: int, audio_ms: Optional[int]) -> List[CuePlan]:
+        """Record a cue's TTS duration (None = blank cue); returns the cues planned as a result."""
+        self.audio[idx] = audio_ms
+        planned: List[CuePlan] = []
+        i = idx
+        while i < len(self.items) and i not in self.plans and i in self.audio:
+            lag = self._lag_known(i)
+            if lag is None:
+                break
+            self.plans[i] = self._plan(i, lag)
+            planned.append(self.plans[i])
+            i += 1
+        return planned
+
+    @property
+    def done(self) -> bool:
+        return len(self.plans) == len(self.items)
+
+
+@dataclass
+class PlanCost:
+    cues: int
+    stretched: int           # cues whose picture changes speed
+    audio_stretched: int     # cues fitted by an audio stretch instead (hybrid)
+    absorbed: int            # overruns carried into a gap or the next cue
+    padded: int              # undershoots padded with silence
+    stretched_ms: int        # source video that must be re-encoded
+    unchanged_ms: int        # source video played at original speed (copy candidates)
+    total_ms: int            # new timeline length
+
+    def describe(self) -> str:
+        source = max(1, self.stretched_ms + self.unchanged_ms)
+        return (
+            f"[MODE_B_PLAN] cues={self.cues} stretched={self.stretched} audio_stretched={self.audio_stretched} "
+            f"absorbed={self.absorbed} padded={self.padded} "
+            f"stretched_video={self.stretched_ms / 1000:.1f}s ({100.0 * self.stretched_ms / source:.0f}%) "
+            f"unchanged_video={self.unchanged_ms / 1000:.1f}s new_duration={self.total_ms / 1000:.1f}s"
+        )
+
+
+def plan_cost(plans: Sequence[CuePlan], gaps: Sequence[Gap]) -> PlanCost:
+    stretched = [p for p in plans if p.ratio != 1.0]
+    unchanged = [p for p in plans if p.ratio == 1.0]
+    return PlanCost(
+        cues=len(plans),
+        stretched=len(stretched),
+        audio_stretched=sum(1 for p in plans if p.tempo != 1.0),
+        absorbed=sum(1 for p in unchanged if not p.blank and p.tempo == 1.0 and p.overrun_ms > 0),
+        padded=sum(1 for p in unchanged if p.tempo == 1.0 and p.padding_ms > 0),
+        stretched_ms=sum(p.source_ms for p in stretched),
+        unchanged_ms=sum(p.source_ms for p in unchanged) + sum(g.duration_ms for g in gaps),
+        total_ms=sum(p.slot_ms for p in plans) + sum(g.duration_ms for g in gaps),
+    )
+
+
+# Video speed buckets for the plan summary (upper bounds, exclusive)
+RATIO_BUCKETS = [(0.8, "<0.8"), (0.95, "0.8-0.95"), (1.05, "~1"), (1.25, "1.05-1.25"), (1.5, "1.25-1.5"), (float("inf"), ">=1.5")]
+
+
+def ratio_histogram(plans: Sequence[CuePlan]) -> Dict[str, int]:
+    """Number of spoken cues per video speed bucket."""
+    hist = {label: 0 for _, label in RATIO_BUCKETS}
+    for p in plans:
+        if p.blank:
+            continue
+        hist[next(label for bound, label in RATIO_BUCKETS if p.ratio < bound)] += 1
+    return hist
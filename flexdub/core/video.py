@@ -0,0 +1,570 @@
+"""
+Video timeline rendering
+
+把 Mode B 的渲染计划（源视频区间 + 拉伸比例）编译成 ffmpeg filter graph：
+trim 取区间、setpts 改时长、concat 拼接。一个分块只启动一个 ffmpeg，
+每个源帧只解码一次、编码一次，不再先提取再拉伸两次有损编码。
+未拉伸的连续区间按关键帧索引切到 GOP 边界，整 GOP 直接流复制，
+只有两端不完整的 GOP 与真正变速的片段才重新编码。
+渲染结果按内容寻址缓存（ClipCache），重跑只编码计划发生变化的片段。
+"""
+
+import bisect
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from flexdub.core.proc import default_threads, run_media
+
+# Final-quality x264 settings; overridable with --video-encoder-args
+DEFAULT_ENCODER_ARGS = ["-c:v", "libx264", "-preset", "fast", "-crf", "18"]
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """Codec settings and container for throwaway intermediate clips."""
+    name: str
+    args: Tuple[str, ...]
+    suffix: str
+
+
+# Intermediates are cheap to write and cut cleanly at every frame (intra-only)
+# and keep the source pixel format; the concatenated timeline then gets one
+# final-quality encode.
+INTERMEDIATE_PROFILES: Dict[str, EncoderProfile] = {
+    "x264-intra": EncoderProfile("x264-intra", ("-c:v", "libx264", "-preset", "ultrafast", "-crf", "10", "-g", "1"), ".mp4"),
+    "ffv1": EncoderProfile("ffv1", ("-c:v", "ffv1", "-level", "3", "-g", "1"), ".mkv"),
+}
+
+# Review proxies (--proxy): downscaled and fast, for checking sync and voices
+PROXY_HEIGHT = 360
+PROXY_ENCODER_ARGS = ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "28"]
+
+
+def proxy_scale(height: int = PROXY_HEIGHT) -> str:
+    """Downscale filter for proxies (even width, aspect kept, never upscaled)."""
+    return f"scale=-2:min({height}\\,ih)"
+
+
+@lru_cache(maxsize=None)
+def passthrough_args() -> Tuple[str, ...]:
+    """Output option that keeps every input frame as timed (-fps_mode needs ffmpeg >= 5.1)."""
+    try:
+        out = run_media(["ffmpeg", "-version"]).stdout.decode("utf-8", "replace")
+    except Exception:
+        return ("-fps_mode", "passthrough")
+    m = re.search(r"ffmpeg version n?(\d+)\.(\d+)", out)
+    # git builds ("N-112345-g...") are newer than any release that lacks -fps_mode
+    if m and (int(m.group(1)), int(m.group(2))) < (5, 1):
+        return ("-vsync", "passthrough")
+    return ("-fps_mode", "passthrough")
+
+
+# Pieces shorter than this produce no frames and are skipped
+MIN_PIECE_MS = 10
+
+
+@dataclass(frozen=True)
+class VideoPiece:
+    """A source range [start_ms, end_ms) played back `ratio` times as long."""
+    start_ms: int
+    end_ms: int
+    ratio: float = 1.0
+
+    @property
+    def out_ms(self) -> float:
+        return (self.end_ms - self.start_ms) * self.ratio
+
+
+def filter_graph(
+    pieces: Sequence[VideoPiece],
+    offset_ms: int = 0,
+    src: str = "0:v",
+    out: str = "v",
+    concat: bool = True,
+    post: str = "",
+) -> str:
+    """
+    filter_complex for pieces of one input whose timestamps start at `offset_ms`.
+
+    Pieces should be in source order: split feeds every branch, and frames of a
+    later piece wait in concat's queue until the earlier ones are done. With
+    concat=False every piece is its own output, labelled `{out}{i}`. `post` is
+    appended to every piece's chain (e.g. the proxy downscale).
+    """
+    tail = f",{post}" if post else ""
+    n = len(pieces)
+    if not concat:
+        parts = [f"[{src}]split={n}" + "".join(f"[s{i}]" for i in range(n))] if n > 1 else []
+        for i, p in enumerate(pieces):
+            start = (p.start_ms - offset_ms) / 1000.0
+            end = (p.end_ms - offset_ms) / 1000.0
+            pts = "PTS-STARTPTS" if abs(p.ratio - 1.0) < 1e-6 else f"(PTS-STARTPTS)*{p.ratio:.6f}"
+            parts.append(f"[{src if n == 1 else f's{i}'}]trim=start={start:.3f}:end={end:.3f},setpts={pts}{tail}[{out}{i}]")
+        return ";".join(parts)
+    parts: List[str] = []
+    if n > 1:
+        parts.append(f"[{src}]split={n}" + "".join(f"[s{i}]" for i in range(n)))
+    for i, p in enumerate(pieces):
+        start = (p.start_ms - offset_ms) / 1000.0
+        end = (p.end_ms - offset_ms) / 1000.0
+        pts = "PTS-STARTPTS" if abs(p.ratio - 1.0) < 1e-6 else f"(PTS-STARTPTS)*{p.ratio:.6f}"
+        chain = f"trim=start={start:.3f}:end={end:.3f},setpts={pts}{tail}"
+        parts.append(f"[{src if n == 1 else f's{i}'}]{chain}[{out if n == 1 else f'p{i}'}]")
+    if n > 1:
+        parts.append("".join(f"[p{i}]" for i in range(n)) + f"concat=n={n}:v=1:a=0[{out}]")
+    return ";".join(parts)
+
+
+def render_pieces(
+    video_path: str,
+    pieces: Sequence[VideoPiece],
+    output_path: str,
+    encoder_args: Optional[Sequence[str]] = None,
+    threads: Optional[int] = None,
+    post: str = "",
+) -> bool:
+    """
+    Render pieces of one video into a single clip with one ffmpeg process.
+
+    The input is seeked to the first piece and cut after the last, so only the
+    covered range is decoded. Returns True if successful.
+    """
+    if not pieces:
+        return False
+    start_ms = min(p.start_ms for p in pieces)
+    end_ms = max(p.end_ms for p in pieces)
+    cmd = [
+        "ffmpeg", "-y",
+        "-ss", f"{start_ms / 1000.0:.3f}",
+        "-t", f"{(end_ms - start_ms) / 1000.0:.3f}",
+        "-i", video_path,
+        "-filter_complex", filter_graph(pieces, offset_ms=start_ms, post=post),
+        "-map", "[v]",
+        *(encoder_args or DEFAULT_ENCODER_ARGS),
+        "-an",
+        output_path,
+    ]
+    result = run_media(cmd, threads=threads, check=False, stage="video_encode")
+    if result.returncode != 0:
+        print(f"[VIDEO_RENDER] ffmpeg failed ({result.returncode}):\n{result.stderr_tail}")
+    return result.returncode == 0
+
+
+def render_pieces_separately(
+    video_path: str,
+    pieces: Sequence[VideoPiece],
+    output_paths: Sequence[str],
+    encoder_args: Optional[Sequence[str]] = None,
+    threads: Optional[int] = None,
+    fps: Optional[float] = None,
+    post: str = "",
+) -> bool:
+    """
+    Render each piece to its own clip with one ffmpeg process (one decode pass,
+    one encoder per output). Returns True if successful.
+
+    With `fps`, a stretched clip is resampled to the source frame rate (also in
+    variable-rate containers like mkv) and is exactly round(out_ms * fps) frames
+    long: its last frame is cloned once and the output cut at that count, so
+    per-piece clips do not each lose the partial frame at their end.
+    """
+    if not pieces:
+        return False
+    start_ms = min(p.start_ms for p in pieces)
+    end_ms = max(p.end_ms for p in pieces)
+    graph = filter_graph(pieces, offset_ms=start_ms, out="o", concat=False, post=post)
+    outputs: List[List[str]] = []
+    for i, p in enumerate(pieces):
+        if fps and abs(p.ratio - 1.0) >= 1e-6:
+            graph = graph.replace(f"[o{i}]", f"[t{i}]") + f";[t{i}]fps={fps:.6f},tpad=stop_mode=clone:stop=1[o{i}]"
+            outputs.append(["-frames:v", str(piece_frames(p, fps))])
+        else:
+            outputs.append([])
+    cmd = [
+        "ffmpeg", "-y",
+        "-ss", f"{start_ms / 1000.0:.3f}",
+        "-t", f"{(end_ms - start_ms) / 1000.0:.3f}",
+        "-i", video_path,
+        "-filter_complex", graph,
+    ]
+    # -threads is an output option: every encoder gets the worker's budget, not only the last one
+    t = str(threads or default_threads())
+    for i, path in enumerate(output_paths):
+        cmd += ["-map", f"[o{i}]", *(encoder_args or DEFAULT_ENCODER_ARGS), *outputs[i], "-threads", t, "-an", path]
+    result = run_media(cmd, threads=threads, check=False, stage="video_encode")
+    if result.returncode != 0:
+        print(f"[VIDEO_RENDER] ffmpeg failed ({result.returncode}):\n{result.stderr_tail}")
+    return result.returncode == 0
+
+
+def piece_frames(piece: VideoPiece, fps: float) -> int:
+    """Frames a stretched clip is cut to; the planner snaps slots so that this is exact."""
+    return max(1, round(piece.out_ms * fps / 1000.0))
+
+
+def video_identity(video_path: str) -> Optional[str]:
+    """Cheap fingerprint of a source video (path, size, mtime)."""
+    try:
+        st = os.stat(video_path)
+    except OSError:
+        return None
+    return f"{os.path.abspath(video_path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+# ---------------------------------------------------------------------------
+# Persistent clip cache
+# ---------------------------------------------------------------------------
+
+# Default size bound of the rendered clip cache
+CLIP_CACHE_MAX_BYTES = 20 * 1024 ** 3
+
+
+class ClipCache:
+    """
+    Content-addressed store for rendered Mode B clips.
+
+    Keys hash everything a clip depends on (source identity, range, frame-grid
+    ratio, encoder settings), so a rerun re-encodes only pieces whose plan
+    changed. Clips are written to a temporary name and renamed, so a crashed
+    run leaves only complete clips behind. With root=None nothing is kept and
+    every clip goes to a fresh temporary path.
+    """
+
+    def __init__(self, root: Optional[str], max_bytes: int = CLIP_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.used: set = set()
+        self._lock = threading.Lock()
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(*parts: object) -> str:
+        return hashlib.sha1(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+    def path(self, key: str, suffix: str) -> str:
+        if not self.root:
+            return tempfile.mktemp(suffix=suffix)
+        return os.path.join(self.root, key[:2], key + suffix)
+
+    def lookup(self, path: str) -> bool:
+        """True (and the entry marked recently used) if the clip already exists."""
+        found = bool(self.root) and os.path.exists(path)
+        with self._lock:
+            self.used.add(path)
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if found:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return found
+
+    @staticmethod
+    def staging(path: str) -> str:
+        """Temporary name for writing `path` (same extension, so ffmpeg picks the muxer)."""
+        base, ext = os.path.splitext(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return f"{base}.{os.getpid()}.{threading.get_ident()}.tmp{ext}"
+
+    @staticmethod
+    def commit(staged: str, path: str) -> None:
+        os.replace(staged, path)
+
+    def evict(self) -> Tuple[int, int]:
+        """Delete least recently used clips beyond max_bytes, never those used in this run; returns (files, bytes) left."""
+        if not self.root or not os.path.isdir(self.root):
+            return 0, 0
+        entries = []
+        for d, _, files in os.walk(self.root):
+            for name in files:
+                full = os.path.join(d, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                if ".tmp." in name:
+                    # leftovers of a crashed run
+                    if st.st_mtime < time.time() - 3600:
+                        os.remove(full)
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+        total = sum(size for _, size, _ in entries)
+        for _, size, full in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if full in self.used:
+                continue
+            try:
+                os.remove(full)
+                total -= size
+            except OSError:
+                pass
+        return sum(1 for _, _, f in entries if os.path.exists(f)), total
+
+
+# ---------------------------------------------------------------------------
+# Keyframe index and stream copy
+# ---------------------------------------------------------------------------
+
+KEYFRAME_INDEX_VERSION = 4
+
+# Unstretched ranges shorter than this between keyframes are re-encoded
+MIN_COPY_MS = 1000
+
+# Source codec -> encoder whose output can be concatenated with copied packets
+# (the concat demuxer converts H.264 to Annex B, so parameter sets may differ)
+COPY_COMPATIBLE = {"h264": "libx264"}
+
+
+def keyframe_cache_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".cache", "flexdub", "keyframes")
+
+
+@dataclass
+class KeyframeIndex:
+    """Keyframes of a video's first video stream."""
+    codec: str
+    times: List[float]       # keyframe pts in seconds from the container start_time, ascending
+    frames: List[int]        # frames presented before each keyframe (counted by pts)
+    fps: float = 0.0         # average frame rate (0 if unknown)
+    closed_gop: bool = True  # no frame decoded after a keyframe is shown before it; required for stream copy
+    version: int = KEYFRAME_INDEX_VERSION
+
+
+@dataclass(frozen=True)
+class StreamCopy:
+    """Source GOPs [times[i], times[j]) copied without re-encoding."""
+    start_ms: int
+    end_ms: int
+    start_s: float           # exact pts of the first keyframe
+    frames: int              # frames to copy
+
+
+def _probe_keyframes(video_path: str) -> Optional[KeyframeIndex]:
+    try:
+        codec = run_media([
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=codec_name",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            video_path,
+        ]).stdout.decode("utf-8").strip()
+        # -ss and the plan are relative to start_time, packet pts are not
+        start = run_media([
+            "ffprobe", "-v", "error",
+            "-show_entries", "format=start_time",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            video_path,
+        ]).stdout.decode("utf-8").strip()
+        # packet listing reads the container only, nothing is decoded
+        out = run_media([
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            video_path,
+        ]).stdout.decode("utf-8")
+    except Exception:
+        return None
+    try:
+        offset = float(start)
+    except ValueError:
+        offset = 0.0
+    times: List[float] = []
+    all_pts: List[float] = []
+    closed_gop = True
+    # packets are listed in decode order: with B-frames that is not the order they are shown in
+    for line in out.splitlines():
+        pts, _, flags = line.strip().partition(",")
+        if pts in ("", "N/A"):
+            continue
+        t = float(pts) - offset
+        all_pts.append(t)
+        if "K" in flags and (not times or t > times[-1]):
+            times.append(t)
+        elif times and t < times[-1]:
+            # open GOP: a leading frame refers to the previous GOP, so copying from this keyframe breaks it
+            closed_gop = False
+    ordered = sorted(all_pts)
+    frames = [bisect.bisect_left(ordered, t - 1e-6) for t in times]
+    span = ordered[-1] - ordered[0] if len(ordered) > 1 else 0.0
+    fps = (len(ordered) - 1) / span if span > 0 else 0.0
+    return KeyframeIndex(codec=codec, times=times, frames=frames, fps=fps, closed_gop=closed_gop)
+
+
+def _cut_ms(t: float) -> int:
+    """
+    Millisecond cut at a keyframe pts, as the encode cuts see it: trim and -ss
+    keep frames at or after the cut, so it is rounded down (exact when the pts
+    is a whole millisecond) and the keyframe falls on the copied side.
+    """
+    return int(math.floor(t * 1000 + 1e-6))
+
+
+def load_keyframe_index(video_path: str, cache_dir: Optional[str] = None) -> Optional[KeyframeIndex]:
+    """Keyframe index of a video, probed once and cached by path, size and mtime."""
+    ident = video_identity(video_path)
+    if ident is None:
+        return None
+    path = os.path.join(cache_dir or keyframe_cache_dir(), hashlib.sha1(ident.encode("utf-8")).hexdigest() + ".json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        if raw.get("version") == KEYFRAME_INDEX_VERSION:
+            return KeyframeIndex(**raw)
+    except (OSError, ValueError, TypeError):
+        pass
+    index = _probe_keyframes(video_path)
+    if index is None:
+        return None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(asdict(index), f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+    return index
+
+
+def split_stream_copy(
+    pieces: Sequence[VideoPiece],
+    index: KeyframeIndex,
+    min_copy_ms: int = MIN_COPY_MS,
+) -> List[Union[List[VideoPiece], StreamCopy]]:
+    """
+    Split pieces (in source order) into encode groups and stream-copy ranges.
+
+    Each run of contiguous unstretched pieces is cut at the first and last
+    keyframe inside it: the whole GOPs between them are copied, only the
+    partial GOPs at both ends are re-encoded. Stretched pieces always are, and
+    so is everything when the source has open GOPs.
+    """
+    out: List[Union[List[VideoPiece], StreamCopy]] = []
+    group: List[VideoPiece] = []
+
+    def encode(p: VideoPiece) -> None:
+        if p.end_ms - p.start_ms > MIN_PIECE_MS:
+            group.append(p)
+
+    def flush_run(start_ms: int, end_ms: int) -> None:
+        i = bisect.bisect_left(index.times, start_ms / 1000.0 - 1e-6)
+        j = bisect.bisect_right(index.times, end_ms / 1000.0 + 1e-6) - 1
+        if (not index.closed_gop or i >= len(index.times) or j <= i
+                or (index.times[j] - index.times[i]) * 1000 < min_copy_ms):
+            encode(VideoPiece(start_ms, end_ms))
+            return
+        k1, k2 = _cut_ms(index.times[i]), _cut_ms(index.times[j])
+        encode(VideoPiece(start_ms, k1))
+        if group:
+            out.append(list(group))
+            group.clear()
+        out.append(StreamCopy(k1, k2, index.times[i], index.frames[j] - index.frames[i]))
+        encode(VideoPiece(k2, end_ms))
+
+    run: Optional[Tuple[int, int]] = None
+    for p in pieces:
+        if abs(p.ratio - 1.0) < 1e-6:
+            if run is not None and run[1] == p.start_ms:
+                run = (run[0], p.end_ms)
+                continue
+            if run is not None:
+                flush_run(*run)
+            run = (p.start_ms, p.end_ms)
+            continue
+        if run is not None:
+            flush_run(*run)
+            run = None
+        encode(p)
+    if run is not None:
+        flush_run(*run)
+    if group:
+        out.append(group)
+    return out
+
+
+def copy_range(video_path: str, rng: StreamCopy, output_path: str) -> bool:
+    """Copy whole GOPs without re-encoding. Returns True if successful."""
+    cmd = [
+        "ffmpeg", "-y",
+        # exactly the keyframe pts: an earlier target lands on the previous GOP,
+        # whose dropped packets would still count against -frames:v
+        "-ss", f"{rng.start_s:.6f}",
+        "-i", video_path,
+        "-map", "0:v:0",
+        "-c", "copy",
+        "-frames:v", str(rng.frames),
+        "-an",
+        output_path,
+    ]
+    result = run_media(cmd, check=False, stage="video_encode")
+    if result.returncode != 0:
+        print(f"[VIDEO_RENDER] stream copy failed ({result.returncode}):\n{result.stderr_tail}")
+    return result.returncode == 0
+
+
+def count_video_frames(video_path: str) -> Optional[int]:
+    """Number of video packets (= frames) in a file, read from the container without decoding."""
+    try:
+        out = run_media([
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-count_packets", "-show_entries", "stream=nb_read_packets",
+            "-of", "csv=p=0",
+            video_path,
+        ]).stdout.decode("utf-8").strip()
+        return int(out)
+    except Exception:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Encode workload estimates (Mode B dry run)
+# ---------------------------------------------------------------------------
+
+# Rough CPU-seconds per megapixel-frame: x264 by preset, other encoders by name
+ENCODE_CPU_S_PER_MPIXEL = {
+    "ultrafast": 0.015, "superfast": 0.022, "veryfast": 0.032, "faster": 0.045, "fast": 0.065,
+    "medium": 0.1, "slow": 0.19, "slower": 0.4, "veryslow": 0.9, "placebo": 2.5,
+    "ffv1": 0.03, "prores_ks": 0.02,
+}
+
+
+def probe_resolution(video_path: str) -> Optional[Tuple[int, int]]:
+    try:
+        out = run_media([
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height",
+            "-of", "csv=p=0",
+            video_path,
+        ]).stdout.decode("utf-8").strip()
+        w, h = out.split(",")[:2]
+        return int(w), int(h)
+    except Exception:
+        return None
+
+
+def estimate_encode_cpu_s(frames: int, resolution: Optional[Tuple[int, int]], encoder_args: Sequence[str]) -> Optional[float]:
+    """Approximate CPU-seconds to encode `frames` frames with `encoder_args`; None without a resolution."""
+    if resolution is None:
+        return None
+    args = list(encoder_args)
+    codec = args[args.index("-c:v") + 1] if "-c:v" in args[:-1] else "libx264"
+    if codec == "libx264":
+        key = args[args.index("-preset") + 1] if "-preset" in args[:-1] else "medium"
+    else:
+        key = codec
+    per = ENCODE_CPU_S_PER_MPIXEL.get(key, ENCODE_CPU_S_PER_MPIXEL["medium"])
+    return frames * resolution[0] * resolution[1] / 1e6 * per
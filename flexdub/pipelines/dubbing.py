@@ -1,59 +1,164 @@
 import asyncio
+import math
 import tempfile
-from typing import List, Optional, Tuple, Dict
+from typing import Callable, List, Optional, Tuple, Dict
 
 from tqdm import tqdm
 
-from flexdub.core.audio import remove_silence, audio_duration_ms, pad_silence, time_stretch_rubberband, split_wav_by_durations, split_wav_by_durations_smart
+from flexdub.core.audio import remove_silence, audio_duration_ms, pad_silence, time_stretch_rubberband, split_wav_by_durations, split_wav_by_durations_smart, split_wav_by_boundaries, split_wav_at_pauses
 from flexdub.core.subtitle import SRTItem, extract_speaker
-from flexdub.backends.tts.edge import EdgeTTSBackend
-from flexdub.backends.tts.doubao import DoubaoTTSBackend
+from flexdub.backends.tts import create_backend, get_capabilities, resolve_jobs
+from flexdub.backends.tts.interfaces import SynthesisRequest, WordBoundary
+from flexdub.backends.tts.latency import LatencyModel
+from flexdub.core.scheduling import LPTWorkPool, fit_cost, lpt_order
+from flexdub.core.aio import aclosing, run_blocking
+from flexdub.core.governor import current as current_governor
 
 
-async def _synthesize_segment(text: str, voice: str, backend: str, ar: int) -> str:
-    if backend == "edge_tts":
-        b = EdgeTTSBackend()
-    elif backend == "doubao":
-        b = DoubaoTTSBackend()
+def _fit_segment(raw: str, it: SRTItem) -> str:
+    target_ms = max(0, it.end_ms - it.start_ms)
+    chars = len(it.text.strip())
+    cpm = chars / (max(1, target_ms) / 60000.0)
+    use_clean = cpm <= 260 and target_ms >= 1200
+    cleaned = remove_silence(raw) if use_clean else raw
+    src_ms = audio_duration_ms(cleaned)
+    out = tempfile.mktemp(suffix=".wav")
+    if src_ms < target_ms:
+        pad_silence(cleaned, out, target_ms)
+    elif src_ms > target_ms:
+        time_stretch_rubberband(cleaned, out, target_ms)
     else:
-        raise ValueError(f"unsupported backend: {backend}")
-    tmp_wav = await b.synthesize(text, voice, ar)
-    return tmp_wav
+        import soundfile as sf
+        data, sr = sf.read(cleaned)
+        sf.write(out, data, sr)
+    return out
 
 
-async def build_audio_from_srt(items: List[SRTItem], voice: str, backend: str, ar: int, jobs: int = 4, progress: bool = True) -> List[str]:
-    total = len(items)
-    out_paths: List[Optional[str]] = [None] * total
-    sem = asyncio.Semaphore(max(1, jobs))
-
-    async def worker(idx: int, it: SRTItem) -> Tuple[int, str]:
-        async with sem:
-            raw = await _synthesize_segment(it.text, voice, backend, ar)
-        target_ms = max(0, it.end_ms - it.start_ms)
-        chars = len(it.text.strip())
-        cpm = chars / (max(1, target_ms) / 60000.0)
-        use_clean = cpm <= 260 and target_ms >= 1200
-        cleaned = remove_silence(raw) if use_clean else raw
-        src_ms = audio_duration_ms(cleaned)
-        out = tempfile.mktemp(suffix=".wav")
-        if src_ms < target_ms:
-            pad_silence(cleaned, out, target_ms)
-        elif src_ms > target_ms:
-            time_stretch_rubberband(cleaned, out, target_ms)
+# 短字幕合并请求：相邻同一说话人的短 cue 用停顿标记拼成一次请求，合成后按停顿切回
+COALESCE_SHORT_CHARS = 12
+COALESCE_MAX_CHARS = 120
+PAUSE_MARKER_CJK = "\u2026\u2026"
+PAUSE_MARKER_LATIN = " ... "
+
+
+def _pause_marker(texts: List[str]) -> str:
+    joined = "".join(texts)
+    if any("\u3400" <= ch <= "\u9fff" for ch in joined):
+        return PAUSE_MARKER_CJK
+    return PAUSE_MARKER_LATIN
+
+
+def _spoken_text(it: SRTItem) -> str:
+    """What a cue sends to TTS: its text without the speaker tag (the voice carries the speaker)."""
+    return extract_speaker(it.text)[1].strip() or it.text.strip()
+
+
+def _coalesced_texts(items: List[SRTItem], group: List[int]) -> List[str]:
+    return [_spoken_text(items[i]) for i in group]
+
+
+def _coalesce_plan(items: List[SRTItem], max_chars: int, short_chars: int = COALESCE_SHORT_CHARS) -> List[List[int]]:
+    """
+    Group cue indices into TTS requests.
+
+    Adjacent short cues (1..short_chars chars) of the same speaker share one request
+    as long as the joined text, pause markers included, stays within max_chars.
+    Every other cue is its own request.
+    """
+    groups: List[List[int]] = []
+    buf: List[int] = []
+    buf_speaker: Optional[str] = None
+    for idx, it in enumerate(items):
+        sp, ct = extract_speaker(it.text)
+        text = ct.strip()
+        short = 0 < len(text) <= short_chars
+        if short and buf and sp == buf_speaker:
+            texts = _coalesced_texts(items, buf) + [text]
+            if len(_pause_marker(texts).join(texts)) <= max_chars:
+                buf.append(idx)
+                continue
+        if buf:
+            groups.append(buf)
+            buf = []
+        if short:
+            buf = [idx]
+            buf_speaker = sp
         else:
-            import soundfile as sf
-            data, sr = sf.read(cleaned)
-            sf.write(out, data, sr)
-        return idx, out
+            groups.append([idx])
+    if buf:
+        groups.append(buf)
+    return groups
+
 
-    tasks = [asyncio.create_task(worker(i, it)) for i, it in enumerate(items)]
+def _default_fit_jobs() -> int:
+    return current_governor().slots("fit")
+
+
+async def build_audio_from_srt(items: List[SRTItem], voice: str, backend: str, ar: int, jobs: Optional[int] = None, progress: bool = True, coalesce: bool = False, fit_jobs: Optional[int] = None, on_fitted: Optional[Callable[[int, str], None]] = None) -> List[str]:
+    total = len(items)
+    out_paths: List[Optional[str]] = [None] * total
+    b = create_backend(backend)
+    if coalesce:
+        max_chars = get_capabilities(backend).max_chars or COALESCE_MAX_CHARS
+        groups = _coalesce_plan(items, max_chars)
+        print(f"[COALESCE] cues={total} requests={len(groups)} max_chars={max_chars}")
+    else:
+        groups = [[i] for i in range(total)]
+    requests = []
+    group_texts = [_coalesced_texts(items, group) for group in groups]
+    for gi, texts in enumerate(group_texts):
+        requests.append(SynthesisRequest(key=gi, text=_pause_marker(texts).join(texts), voice=voice, ar=ar))
+    n_jobs = resolve_jobs(backend, jobs)
     if progress:
         bar = tqdm(total=total, desc="Processing", unit="seg")
-    for fut in asyncio.as_completed(tasks):
-        idx, path = await fut
-        out_paths[idx] = path
+    # TTS requests go out longest first; fits run on a bounded pool, largest stretch first.
+    # on_fitted lets a caller (the streaming renderer) consume each cue as soon as it is fitted.
+    n_fit = fit_jobs or _default_fit_jobs()
+    pool = LPTWorkPool(n_fit, backlog=2 * n_fit)
+    futures: Dict[int, "asyncio.Future"] = {}
+
+    def fitted(i: int, fut: "asyncio.Future") -> None:
         if progress:
             bar.update(1)
+        if on_fitted is not None and not fut.cancelled() and fut.exception() is None:
+            on_fitted(i, fut.result())
+
+    async def submit_fit(i: int, raw: str) -> None:
+        it = items[i]
+        src_ms = await run_blocking(audio_duration_ms, raw)
+        fut = await pool.submit_wait(fit_cost(src_ms, it.end_ms - it.start_ms), _fit_segment, raw, it)
+        fut.add_done_callback(lambda f, i=i: fitted(i, f))
+        futures[i] = fut
+
+    fallback: List[int] = []
+    try:
+        ordered = lpt_order(requests, lambda r: len(r.text))
+        async with aclosing(b.synthesize_many(ordered, jobs=n_jobs)) as results:
+            async for res in results:
+                if res.error is not None:
+                    raise res.error
+                group = groups[res.key]
+                weights = [len(t) for t in group_texts[res.key]]
+                parts = await run_blocking(split_wav_at_pauses, res.path, len(group), weights=weights) if len(group) > 1 else [res.path]
+                if parts is None:
+                    print(f"[COALESCE] pauses not found or off the text, resynthesizing cues {group[0] + 1}-{group[-1] + 1} one by one")
+                    fallback.extend(group)
+                    continue
+                for i, part in zip(group, parts):
+                    await submit_fit(i, part)
+        if fallback:
+            singles = [SynthesisRequest(key=i, text=_spoken_text(items[i]), voice=voice, ar=ar) for i in fallback]
+            singles = lpt_order(singles, lambda r: len(r.text))
+            async with aclosing(b.synthesize_many(singles, jobs=n_jobs)) as results:
+                async for res in results:
+                    if res.error is not None:
+                        raise res.error
+                    await submit_fit(res.key, res.path)
+        await pool.close()
+    finally:
+        await pool.close(cancel=True)
+    for i, fut in futures.items():
+        out_paths[i] = fut.result()
     if progress:
         bar.close()
     return [p or "" for p in out_paths]
@@ -87,55 +192,207 @@ def _semantic_clusters(items: List[SRTItem]) -> List[List[Tuple[int, SRTItem]]]:
     return clusters
 
 
-async def build_audio_from_srt_clustered(items: List[SRTItem], voice: str, backend: str, ar: int, jobs: int = 4, progress: bool = True, smart_split: bool = False, voice_map: Optional[Dict[str, str]] = None) -> List[str]:
-    total = len(items)
-    out_paths: List[Optional[str]] = [None] * total
-    sem = asyncio.Semaphore(max(1, jobs))
-
-    async def synth_cluster(cluster: List[Tuple[int, SRTItem]]) -> None:
-        first_speaker, _ = extract_speaker(cluster[0][1].text)
-        chosen_voice = voice
-        if voice_map is not None:
-            if first_speaker is not None and first_speaker in voice_map:
-                chosen_voice = voice_map.get(first_speaker, chosen_voice)
-                print(f"[SPEAKER_MAP] speaker={first_speaker} voice={chosen_voice}")
-            else:
-                chosen_voice = voice_map.get("DEFAULT", chosen_voice)
-                if first_speaker is None:
-                    print("[SPEAKER_MAP] speaker=NONE use DEFAULT")
-                else:
-                    print(f"[SPEAKER_MAP] speaker={first_speaker} not_mapped use DEFAULT={chosen_voice}")
-        clean_texts = []
-        for _, it in cluster:
-            sp, ct = extract_speaker(it.text)
-            clean_texts.append(ct.strip())
-        text = " ".join(t for t in clean_texts if t).strip()
-        async with sem:
-            raw = await _synthesize_segment(text, chosen_voice, backend, ar)
-        target_ms = sum(max(0, it.end_ms - it.start_ms) for _, it in cluster)
-        src_ms = audio_duration_ms(raw)
-        stretched = tempfile.mktemp(suffix=".wav")
-        if src_ms < target_ms:
-            pad_silence(raw, stretched, target_ms)
-        elif src_ms > target_ms:
-            time_stretch_rubberband(raw, stretched, target_ms)
+def _cluster_voice(cluster: List[Tuple[int, SRTItem]], voice: str, voice_map: Optional[Dict[str, str]]) -> str:
+    first_speaker, _ = extract_speaker(cluster[0][1].text)
+    chosen_voice = voice
+    if voice_map is not None:
+        if first_speaker is not None and first_speaker in voice_map:
+            chosen_voice = voice_map.get(first_speaker, chosen_voice)
+            print(f"[SPEAKER_MAP] speaker={first_speaker} voice={chosen_voice}")
         else:
-            import soundfile as sf
-            data, sr = sf.read(raw)
-            sf.write(stretched, data, sr)
-        durations = [max(0, it.end_ms - it.start_ms) for _, it in cluster]
-        parts = split_wav_by_durations_smart(stretched, durations) if smart_split else split_wav_by_durations(stretched, durations)
-        for (orig_idx, _), p in zip(cluster, parts):
-            out_paths[orig_idx] = p
+            chosen_voice = voice_map.get("DEFAULT", chosen_voice)
+            if first_speaker is None:
+                print("[SPEAKER_MAP] speaker=NONE use DEFAULT")
+            else:
+                print(f"[SPEAKER_MAP] speaker={first_speaker} not_mapped use DEFAULT={chosen_voice}")
+    return chosen_voice
 
-    clusters = _semantic_clusters(items)
-    tasks = [asyncio.create_task(synth_cluster(c)) for c in clusters]
+
+def _cluster_texts(cluster: List[Tuple[int, SRTItem]]) -> List[str]:
+    clean_texts = []
+    for _, it in cluster:
+        sp, ct = extract_speaker(it.text)
+        clean_texts.append(ct.strip())
+    return clean_texts
+
+
+def _fit_cluster(raw: str, boundaries: List[WordBoundary], cluster: List[Tuple[int, SRTItem]], clean_texts: List[str], smart_split: bool) -> List[str]:
+    target_ms = sum(max(0, it.end_ms - it.start_ms) for _, it in cluster)
+    src_ms = audio_duration_ms(raw)
+    stretched = tempfile.mktemp(suffix=".wav")
+    # padding appends silence, so only a compressing stretch moves word offsets
+    scale = 1.0
+    if src_ms < target_ms:
+        pad_silence(raw, stretched, target_ms)
+    elif src_ms > target_ms:
+        time_stretch_rubberband(raw, stretched, target_ms)
+        scale = target_ms / float(src_ms)
+    else:
+        import soundfile as sf
+        data, sr = sf.read(raw)
+        sf.write(stretched, data, sr)
+    durations = [max(0, it.end_ms - it.start_ms) for _, it in cluster]
+    if smart_split and boundaries:
+        return split_wav_by_boundaries(stretched, clean_texts, durations, boundaries, scale=scale)
+    if smart_split:
+        return split_wav_by_durations_smart(stretched, durations)
+    return split_wav_by_durations(stretched, durations)
+
+
+# 聚类大小规划：在语义聚类基础上按字符上下限拆分/合并，使请求数与 --jobs 匹配
+CLUSTER_MIN_CHARS = 20
+CLUSTER_MAX_CHARS = 300
+_TERMINAL_PUNCT = {".", "?", "!", "\u3002", "\uff1f", "\uff01"}
+_SOFT_PUNCT = {",", ";", ":", "\uff0c", "\uff1b", "\uff1a", "\u3001"}
+
+
+def _cluster_chars(cluster: List[Tuple[int, SRTItem]]) -> int:
+    return len(" ".join(t for t in _cluster_texts(cluster) if t))
+
+
+def _break_score(it: SRTItem) -> int:
+    s = it.text.strip()
+    if not s:
+        return 0
+    if s[-1] in _TERMINAL_PUNCT:
+        return 2
+    return 1 if s[-1] in _SOFT_PUNCT else 0
+
+
+def _target_cluster_chars(total_chars: int, jobs: int, min_chars: int, max_chars: int, model: LatencyModel) -> int:
+    """Request size that minimises the estimated makespan of total_chars spread over `jobs` workers."""
+    if total_chars <= 0:
+        return max_chars
+    best, best_cost = max_chars, math.inf
+    step = max(1, (max_chars - min_chars) // 50)
+    for size in range(min_chars, max_chars + 1, step):
+        waves = math.ceil(math.ceil(total_chars / float(size)) / float(max(1, jobs)))
+        cost = waves * model.predict_ms(size)
+        # on ties prefer the larger size: fewer requests, longer prosodic context
+        if cost <= best_cost:
+            best, best_cost = size, cost
+    return best
+
+
+def _split_cluster(cluster: List[Tuple[int, SRTItem]], target: int, min_chars: int) -> List[List[Tuple[int, SRTItem]]]:
+    out: List[List[Tuple[int, SRTItem]]] = []
+    rest = cluster
+    while len(rest) > 1 and _cluster_chars(rest) > target:
+        best_k, best_key = 1, None
+        for k in range(1, len(rest)):
+            left = _cluster_chars(rest[:k])
+            if left > target:
+                break
+            # prefer sentence ends, then clause ends, then the longest piece within target
+            key = (left >= min_chars, _break_score(rest[k - 1][1]), left)
+            if best_key is None or key > best_key:
+                best_k, best_key = k, key
+        out.append(rest[:best_k])
+        rest = rest[best_k:]
+    out.append(rest)
+    return out
+
+
+def _merge_small_clusters(clusters: List[List[Tuple[int, SRTItem]]], target: int, min_chars: int) -> List[List[Tuple[int, SRTItem]]]:
+    out: List[List[Tuple[int, SRTItem]]] = []
+    for c in clusters:
+        if out:
+            prev = out[-1]
+            same_speaker = extract_speaker(prev[0][1].text)[0] == extract_speaker(c[0][1].text)[0]
+            new_turn = c[0][1].text.strip().startswith(("-", "\u2014"))
+            small = _cluster_chars(prev) < min_chars or _cluster_chars(c) < min_chars
+            if small and same_speaker and not new_turn and _cluster_chars(prev + c) <= target:
+                out[-1] = prev + c
+                continue
+        out.append(c)
+    return out
+
+
+def _plan_clusters(items: List[SRTItem], jobs: int, min_chars: int, max_chars: int, model: LatencyModel) -> List[List[Tuple[int, SRTItem]]]:
+    """
+    Size semantic clusters for throughput.
+
+    Clusters longer than the target are split at the best cue boundary (sentence end,
+    then clause end) and clusters shorter than min_chars are merged with a neighbour of
+    the same speaker. The target is the size in [min_chars, max_chars] that keeps all
+    workers busy under the backend's latency model.
+    """
+    semantic = _semantic_clusters(items)
+    total_chars = sum(_cluster_chars(c) for c in semantic)
+    target = _target_cluster_chars(total_chars, jobs, min_chars, max_chars, model)
+    split: List[List[Tuple[int, SRTItem]]] = []
+    for c in semantic:
+        split.extend(_split_cluster(c, target, min_chars))
+    planned = _merge_small_clusters(split, target, min_chars)
+    base, per_char = model.coefficients()
+    print(
+        f"[CLUSTER_PLAN] semantic={len(semantic)} planned={len(planned)} target_chars={target} "
+        f"bounds={min_chars}-{max_chars} jobs={jobs} model={base:.0f}ms+{per_char:.1f}ms/char"
+    )
+    return planned
+
+
+async def build_audio_from_srt_clustered(items: List[SRTItem], voice: str, backend: str, ar: int, jobs: Optional[int] = None, progress: bool = True, smart_split: bool = False, voice_map: Optional[Dict[str, str]] = None, min_chars: Optional[int] = None, max_chars: Optional[int] = None, fit_jobs: Optional[int] = None, on_fitted: Optional[Callable[[int, str], None]] = None, plan_clusters: bool = True, latency_model: Optional[str] = None) -> List[str]:
+    total = len(items)
+    out_paths: List[Optional[str]] = [None] * total
+    n_jobs = resolve_jobs(backend, jobs)
+    max_chars = max_chars or get_capabilities(backend).max_chars or CLUSTER_MAX_CHARS
+    min_chars = min(min_chars or CLUSTER_MIN_CHARS, max_chars)
+    # the latency model is only read, updated and saved when it sizes the clusters
+    model: Optional[LatencyModel] = None
+    if plan_clusters:
+        model = LatencyModel(backend, path=latency_model)
+        clusters = _plan_clusters(items, n_jobs, min_chars, max_chars, model)
+    else:
+        clusters = _semantic_clusters(items)
+        print(f"[CLUSTER_PLAN] semantic={len(clusters)} (re-planning off)")
+    texts = [_cluster_texts(c) for c in clusters]
+    requests = [
+        SynthesisRequest(
+            key=ci,
+            text=" ".join(t for t in texts[ci] if t).strip(),
+            voice=_cluster_voice(c, voice, voice_map),
+            ar=ar,
+            want_boundaries=smart_split and len(c) > 1,
+        )
+        for ci, c in enumerate(clusters)
+    ]
+    b = create_backend(backend)
     if progress:
-        bar = tqdm(total=len(tasks), desc="Clusters", unit="clu")
-    for fut in asyncio.as_completed(tasks):
-        await fut
+        bar = tqdm(total=len(clusters), desc="Clusters", unit="clu")
+    n_fit = fit_jobs or _default_fit_jobs()
+    pool = LPTWorkPool(n_fit, backlog=2 * n_fit)
+    futures: Dict[int, "asyncio.Future"] = {}
+
+    def fitted(ci: int, fut: "asyncio.Future") -> None:
         if progress:
             bar.update(1)
+        if on_fitted is not None and not fut.cancelled() and fut.exception() is None:
+            for (orig_idx, _), p in zip(clusters[ci], fut.result()):
+                on_fitted(orig_idx, p)
+
+    try:
+        ordered = lpt_order(requests, lambda r: len(r.text))
+        async with aclosing(b.synthesize_many(ordered, jobs=n_jobs)) as results:
+            async for res in results:
+                if res.error is not None:
+                    raise res.error
+                if model is not None:
+                    model.observe(len(requests[res.key].text), res.elapsed_ms)
+                cluster = clusters[res.key]
+                target_ms = sum(max(0, it.end_ms - it.start_ms) for _, it in cluster)
+                src_ms = await run_blocking(audio_duration_ms, res.path)
+                fut = await pool.submit_wait(fit_cost(src_ms, target_ms), _fit_cluster, res.path, res.boundaries, cluster, texts[res.key], smart_split)
+                fut.add_done_callback(lambda f, ci=res.key: fitted(ci, f))
+                futures[res.key] = fut
+        await pool.close()
+    finally:
+        await pool.close(cancel=True)
+    for ci, fut in futures.items():
+        for (orig_idx, _), p in zip(clusters[ci], fut.result()):
+            out_paths[orig_idx] = p
     if progress:
         bar.close()
+    if model is not None:
+        model.save()
     return [p or "" for p in out_paths]
@@ -4,38 +4,72 @@ Elastic Video Pipeline (Mode B)
 核心逻辑：
 1. 为每个字幕生成自然语速的 TTS 音频（不压缩）
 2. 检测字幕之间的间隙（gap > 100ms）
-3. 计算每个字幕对应的视频片段需要拉伸/压缩的比例
-4. 提取并拉伸视频片段，使其时长与 TTS 音频匹配
+3. 规划时间轴：容差内的 TTS 超时顺延进间隙、不足补静音，超出容差才计算
+   视频片段需要拉伸/压缩的比例（core/timeline_plan.py）
+4. 按 trim/setpts/concat filter graph 分块渲染视频（每个源帧只解码、编码一次），
+   片段时长与 TTS 音频匹配
 5. 间隙对应的视频片段保持原始时长不拉伸
-6. 将所有视频片段按顺序拼接（片段 + 间隙 + 片段 + ...）
+6. 将所有分块按顺序拼接（片段 + 间隙 + 片段 + ...）
 7. 将所有音频拼接（TTS + 静音 + TTS + ...）
 8. 合并音视频
 
 关键点：
 - 视频片段按字幕时间戳提取（start_ms 到 end_ms）
-- 视频片段拉伸比例 = TTS时长 / 原始字幕时长
+- 视频片段拉伸比例 =（语音滞后 + TTS时长）/ 原始字幕时长，仅在超出同步容差时使用
 - 间隙片段保持原始时长，生成对应的静音音频
 - TTS 音频会缓存到项目目录，避免重复下载
-- 字符长度阈值：75 字符（超过可能导致 Doubao TTS 超时）
+- 字符长度阈值：后端声明的 max_chars（Doubao 为 75 字符）；超长段落按句/分句拆分，
+  并行合成后以短交叉淡化拼接为一段音频，时间轴不变
 """
 
 # Character length threshold for TTS stability (especially Doubao TTS)
-# Segments exceeding this may timeout or fail
+# Segments exceeding this may timeout or fail. The pipeline itself uses the
+# backend's declared max_chars; this is the default for QA checks.
 TTS_CHAR_THRESHOLD = 75
 
+# Crossfade used when stitching the parts of an auto-split oversized segment
+SPLIT_CROSSFADE_MS = 30
+
+# Chunk render jobs waiting for the video stage
+VIDEO_ENCODE_QUEUE_SIZE = 8
+
+# Segments and gaps compiled into one filter graph (one ffmpeg process)
+RENDER_CHUNK_PIECES = 40
+
+# Clips per chunk of a parallel final encode (intermediate clips only)
+FINAL_CHUNK_CLIPS = 200
+
+
 import asyncio
 import hashlib
+import json
 import os
+import shutil
 import tempfile
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
 from typing import List, Tuple, Optional, Dict
 
 from tqdm import tqdm
 
 from flexdub.core.subtitle import SRTItem, Gap, SegmentInfo, SyncDiagnostics, extract_speaker, detect_gaps, remove_bracket_content
-from flexdub.core.audio import audio_duration_ms, make_silence
-from flexdub.backends.tts.edge import EdgeTTSBackend
-from flexdub.backends.tts.doubao import DoubaoTTSBackend
+from flexdub.core.audio import (
+    audio_duration_ms, can_time_stretch, crossfade_concat_wavs, fit_length, make_silence, time_stretch_rubberband,
+)
+from flexdub.core.scheduling import lpt_order
+from flexdub.core.aio import aclosing, run_blocking
+from flexdub.core.proc import run_media
+from flexdub.core.governor import current as current_governor
+from flexdub.core.timeline_plan import SYNC_TOLERANCE_MS, CuePlan, TimelinePlanner, plan_cost, ratio_histogram
+from flexdub.core.video import (
+    CLIP_CACHE_MAX_BYTES, COPY_COMPATIBLE, DEFAULT_ENCODER_ARGS, INTERMEDIATE_PROFILES, MIN_PIECE_MS, PROXY_ENCODER_ARGS,
+    PROXY_HEIGHT, ClipCache, KeyframeIndex, StreamCopy, VideoPiece, copy_range, count_video_frames,
+    estimate_encode_cpu_s, load_keyframe_index, passthrough_args, probe_resolution, proxy_scale, render_pieces,
+    render_pieces_separately, split_stream_copy, video_identity,
+)
+from flexdub.core.gs_align import split_text_by_sentences
+from flexdub.backends.tts import create_backend, get_capabilities, resolve_jobs
+from flexdub.backends.tts.interfaces import SynthesisRequest
 
 
 def validate_segment_lengths(
@@ -77,78 +111,88 @@ def validate_segment_lengths(
     return oversized
 
 
-def _get_tts_cache_path(cache_dir: str, text: str, voice: str, idx: int) -> str:
+def _get_tts_cache_path(cache_dir: str, text: str, voice: str, idx: int, ar: int) -> str:
     """Generate a cache file path for TTS audio."""
-    # Use hash of text + voice to create unique filename
-    text_hash = hashlib.md5(f"{text}_{voice}".encode()).hexdigest()[:8]
+    # Use hash of text + voice + sample rate to create unique filename
+    text_hash = hashlib.md5(f"{text}_{voice}_{ar}".encode()).hexdigest()[:8]
     return os.path.join(cache_dir, f"tts_{idx:04d}_{text_hash}.wav")
 
 
-async def _synthesize_natural_speed(text: str, voice: str, backend: str, ar: int) -> str:
-    """Generate TTS audio at natural speed without time constraints."""
-    if backend == "edge_tts":
-        b = EdgeTTSBackend()
-    elif backend == "doubao":
-        b = DoubaoTTSBackend()
-    else:
-        raise ValueError(f"unsupported backend: {backend}")
-    
-    tmp_wav = await b.synthesize(text, voice, ar)
-    return tmp_wav
-
-
-def _extract_video_segment(video_path: str, start_ms: int, end_ms: int, output_path: str) -> bool:
+def _render_chunk(
+    video_path: str,
+    pieces: List[Tuple[Tuple[str, int], VideoPiece]],
+    encoder_args: List[str],
+    suffix: str = ".mp4",
+    index: Optional[KeyframeIndex] = None,
+    cache: Optional[ClipCache] = None,
+    fps: Optional[float] = None,
+    post: str = "",
+) -> Dict[Tuple[str, int], Optional[List[str]]]:
     """
-    Extract a video segment from start_ms to end_ms.
-    Returns True if successful, False if segment is too short.
+    Render one chunk of the plan.
+
+    Returns the clips per piece: all clips of the chunk on the first rendered
+    piece, [] on the others (covered by those clips) and None for pieces that
+    produced nothing. With a keyframe index, whole unstretched GOPs are
+    stream-copied between encoded clips. Every clip comes from the clip cache
+    when present; the missing encoded pieces of a run are rendered by one
+    ffmpeg process with one output per piece. If anything fails, each piece
+    is rendered on its own.
     """
-    start_sec = start_ms / 1000.0
-    duration_sec = (end_ms - start_ms) / 1000.0
-    
-    if duration_sec <= 0.01:  # Skip very short segments
-        return False
-    
-    cmd = [
-        "ffmpeg", "-y",
-        "-ss", str(start_sec),
-        "-i", video_path,
-        "-t", str(duration_sec),
-        "-c:v", "libx264",
-        "-preset", "fast",
-        "-crf", "18",
-        "-an",  # Remove audio
-        output_path
-    ]
-    result = subprocess.run(cmd, capture_output=True)
-    return result.returncode == 0
+    threads = current_governor().threads("video_encode")
+    cache = cache or ClipCache(None)
+    source = video_identity(video_path)
+    out: Dict[Tuple[str, int], Optional[List[str]]] = {key: None for key, _ in pieces}
+    keep = [(key, p) for key, p in pieces if p.end_ms - p.start_ms > MIN_PIECE_MS]
+    if not keep:
+        return out
+    
+    def clip_path(p: VideoPiece) -> str:
+        return cache.path(ClipCache.key(source, p.start_ms, p.end_ms, p.ratio, fps, post, encoder_args, suffix), suffix)
+    
+    def render(group: List[VideoPiece]) -> Optional[List[str]]:
+        paths = [clip_path(p) for p in group]
+        missing = [(p, path) for p, path in zip(group, paths) if not cache.lookup(path)]
+        if missing:
+            staged = [ClipCache.staging(path) for _, path in missing]
+            if not render_pieces_separately(video_path, [p for p, _ in missing], staged, encoder_args=encoder_args, threads=threads, fps=fps, post=post):
+                return None
+            for tmp, (_, path) in zip(staged, missing):
+                ClipCache.commit(tmp, path)
+        return paths
+    
+    def copy(rng: StreamCopy) -> Optional[List[str]]:
+        path = cache.path(ClipCache.key(source, "copy", rng.start_s, rng.frames), ".mp4")
+        if not cache.lookup(path):
+            tmp = ClipCache.staging(path)
+            if not copy_range(video_path, rng, tmp):
+                return None
+            ClipCache.commit(tmp, path)
+        return [path]
+    
+    parts = split_stream_copy([p for _, p in keep], index) if index is not None else [[p for _, p in keep]]
+    clips: List[str] = []
+    for part in parts:
+        got = copy(part) if isinstance(part, StreamCopy) else render(part)
+        if got is None:
+            break
+        clips.extend(got)
+    else:
+        for n, (key, _) in enumerate(keep):
+            out[key] = clips if n == 0 else []
+        return out
+    print(f"[ELASTIC_VIDEO] chunk render failed, rendering {len(keep)} pieces one by one")
+    for key, p in keep:
+        single = tempfile.mktemp(suffix=suffix)
+        if render_pieces(video_path, [p], single, encoder_args=encoder_args, threads=threads, post=post):
+            out[key] = [single]
+    return out
 
 
-def _stretch_video_segment(input_path: str, output_path: str, ratio: float) -> bool:
-    """
-    Stretch or compress video segment by ratio.
-    ratio > 1.0: slow down (stretch) - video becomes longer
-    ratio < 1.0: speed up (compress) - video becomes shorter
-    
-    Returns True if successful.
-    """
-    if ratio <= 0:
-        return False
-    
-    # setpts filter: PTS * ratio
-    # ratio > 1: each frame displayed longer → video slows down
-    # ratio < 1: each frame displayed shorter → video speeds up
-    cmd = [
-        "ffmpeg", "-y",
-        "-i", input_path,
-        "-filter:v", f"setpts={ratio}*PTS",
-        "-c:v", "libx264",
-        "-preset", "fast",
-        "-crf", "18",
-        "-an",
-        output_path
-    ]
-    result = subprocess.run(cmd, capture_output=True)
-    return result.returncode == 0
+def _fit_speech(src_wav: str, dst_wav: str, target_ms: int) -> None:
+    """Hybrid cue: stretch the speech to exactly the planned length, so the next cue's lag holds."""
+    time_stretch_rubberband(src_wav, dst_wav, target_ms)
+    fit_length(dst_wav, dst_wav, target_ms)
 
 
 async def build_elastic_video_from_srt(
@@ -157,52 +201,72 @@ async def build_elastic_video_from_srt(
     voice: str,
     backend: str,
     ar: int,
-    jobs: int = 4,
+    jobs: Optional[int] = None,
     progress: bool = True,
     voice_map: Optional[Dict[str, str]] = None,
     cache_dir: Optional[str] = None,
     debug_sync: bool = False,
-    skip_length_check: bool = False
+    skip_length_check: bool = False,
+    intermediate: Optional[str] = None,
+    encoder_args: Optional[List[str]] = None,
+    stream_copy: bool = True,
+    sync_tolerance_ms: int = SYNC_TOLERANCE_MS,
+    clip_cache_dir: Optional[str] = None,
+    clip_cache_max_bytes: int = CLIP_CACHE_MAX_BYTES,
+    audio_stretch_range: Optional[Tuple[float, float]] = None,
+    plan_only: bool = False,
+    plan_path: Optional[str] = None,
+    proxy: bool = False,
+    plan_first: bool = False
 ) -> Tuple[List[str], List[SRTItem], List[str], Optional[SyncDiagnostics]]:
     """
     Build elastic video pipeline.
     
     核心流程：
     1. 为每个字幕生成 TTS 音频（支持缓存）
-    2. 提取对应的视频片段
-    3. 根据 TTS 时长拉伸视频片段
-    4. 返回音频列表、新字幕时间轴、视频片段列表
+    2. TTS 时长确定后，将对应分块（片段 + 间隙）编译为一个 filter graph 渲染
+    3. 返回音频列表、新字幕时间轴、视频分块列表
     
     Args:
         cache_dir: TTS 缓存目录，如果提供则会缓存 TTS 音频避免重复下载
         debug_sync: 是否生成同步诊断信息
-        skip_length_check: 跳过字符长度检查（默认 False）
+        skip_length_check: 不拆分超过后端字符阈值的段落，整段发送（默认 False）
+        intermediate: 中间片段编码档（INTERMEDIATE_PROFILES 之一）；为 None 时分块直接按
+            encoder_args 做最终编码。使用中间档时，由 concatenate_video_segments 对拼接后的
+            整条时间轴做一次最终编码
+        encoder_args: 最终编码参数（默认 libx264 fast crf 18）
+        stream_copy: 未拉伸的整 GOP 直接流复制（需源编码与最终编码器兼容，且未使用中间档）
+        sync_tolerance_ms: 语音可晚于画面开始/超出画面结束的毫秒数；容差内不变速视频，
+            超出部分顺延进间隙或补静音（见 TimelinePlanner）。0 表示逐条按 TTS 时长变速
+        clip_cache_dir: 渲染片段缓存目录（默认视频旁的 video_cache/），重跑只重新编码计划变化的片段
+        clip_cache_max_bytes: 片段缓存上限，超出按最近使用时间淘汰；<= 0 关闭缓存
+        audio_stretch_range: 混合模式（elastic-hybrid）的语速范围 (lo, hi)；超出容差但所需语速
+            在范围内的字幕改为变速音频，画面保持原速，只有范围外的字幕才重新编码视频
+        plan_only: 只规划不渲染：生成/复用 TTS，计算新时间轴、变速比例分布与编码量估计，
+            不编码视频（返回的视频分块列表为空）
+        plan_path: 规划结果写入的 JSON 路径（逐条字幕的新时间、比例与总体估计）
+        proxy: 审阅代理：片段缩小到 PROXY_HEIGHT 并用 ultrafast 编码，不流复制、不用中间档；
+            TTS 与规划与正式渲染相同，之后的正式渲染只需重新编码视频
+        plan_first: 先等完整规划并输出编码量估计再开始渲染（放弃 TTS 与视频编码的重叠）；
+            默认分块一规划完即渲染，估计在规划完成时输出（TTS 全部命中缓存时即在渲染前）
     
     Returns:
         Tuple of (audio_segments, new_subtitle_items, video_segments, diagnostics)
         diagnostics 仅在 debug_sync=True 时返回非 None 值
-        
-    Raises:
-        ValueError: 如果存在超过字符阈值的段落且未跳过检查
     """
     total = len(items)
     
     # ========== Pre-check: Validate segment character lengths ==========
-    if not skip_length_check and backend == "doubao":
-        oversized = validate_segment_lengths(items, TTS_CHAR_THRESHOLD, backend)
-        if oversized:
-            error_lines = [
-                f"[ELASTIC_VIDEO] 检测到 {len(oversized)} 个段落超过字符阈值 ({TTS_CHAR_THRESHOLD} 字符):",
-                f"[ELASTIC_VIDEO] 这些段落可能导致 Doubao TTS 超时失败，建议重新措辞缩短文本：",
-            ]
+    # Oversized segments are split at sentence/clause boundaries, synthesized
+    # in parallel and stitched back into one segment audio (timeline unchanged).
+    caps = get_capabilities(backend)
+    char_limit = caps.max_chars if not skip_length_check else None
+    if char_limit:
+        oversized = validate_segment_lengths(items, char_limit, backend)
+        if oversized and progress:
+            print(f"[ELASTIC_VIDEO] {len(oversized)} 个段落超过字符阈值 ({char_limit} 字符)，将按句拆分并行合成:")
             for seg_idx, char_count, preview in oversized:
-                error_lines.append(f"[ELASTIC_VIDEO]   段落 {seg_idx}: {char_count} 字符 - {preview}")
-            error_lines.append(f"[ELASTIC_VIDEO] 使用 --skip-length-check 可跳过此检查")
-            
-            error_msg = "\n".join(error_lines)
-            if progress:
-                print(error_msg)
-            raise ValueError(f"存在 {len(oversized)} 个段落超过字符阈值 ({TTS_CHAR_THRESHOLD})，请重新措辞或使用 --skip-length-check 跳过检查")
+                print(f"[ELASTIC_VIDEO]   段落 {seg_idx}: {char_count} 字符 - {preview}")
     
     # Setup TTS cache directory
     if cache_dir is None:
@@ -224,8 +288,6 @@ async def build_elastic_video_from_srt(
     segment_infos: List[SegmentInfo] = []
     warnings: List[str] = []
     
-    sem = asyncio.Semaphore(max(1, jobs))
-    
     # Track blank segments (will use original video duration instead of TTS)
     blank_segments: set = set()
     
@@ -233,14 +295,194 @@ async def build_elastic_video_from_srt(
     max_retries = 3
     retry_delay = 2.0  # seconds
     
+    # Gaps do not depend on TTS, so they are known (and encoded) up front
+    gaps = detect_gaps(items, min_gap_ms=100)
+    gap_map: Dict[int, Gap] = {g.prev_index: g for g in gaps}  # Map: prev_index -> gap
+    
+    if progress and gaps:
+        print(f"[ELASTIC_VIDEO] Detected {len(gaps)} gaps (> 100ms)")
+        for g in gaps:
+            print(f"[ELASTIC_VIDEO]   gap after seg {g.prev_index+1}: {g.duration_ms}ms")
+    
+    # ========== Video render stage ==========
+    # The timeline planner decides per segment whether the picture changes
+    # speed; segments are planned in order as TTS durations arrive.
+    # The plan (segment, gap, segment, ... in source order) is cut into chunks;
+    # each chunk is one trim/setpts/concat filter graph, so every source frame
+    # is decoded once and encoded once. A chunk is queued as soon as its TTS
+    # segments are planned, so encoding overlaps synthesis; the encode cost is
+    # reported when the plan completes (before any encoding when the TTS is
+    # cached). With plan_first, chunks are held until that report. The governor's video_encode
+    # slots set the number of render workers and its threads the x264 threads
+    # of each, so workers x threads matches the CPU budget. Results are keyed
+    # by piece and assembled in timeline order, whatever order chunks finish in.
+    workers = current_governor().slots("video_encode")
+    # The keyframe index also gives the frame rate that stretched clips snap to.
+    # Both probes run alongside TTS; cue planning and the renderer wait for them
+    probe_task = asyncio.create_task(run_blocking(load_keyframe_index, video_path))
+    resolution_task = asyncio.create_task(run_blocking(probe_resolution, video_path))
+    post = ""
+    if proxy:
+        # copied GOPs and intermediates would keep the source resolution
+        clip_args, clip_suffix, post = list(PROXY_ENCODER_ARGS), ".mp4", proxy_scale()
+        intermediate, stream_copy = None, False
+    elif intermediate:
+        profile = INTERMEDIATE_PROFILES[intermediate]
+        clip_args, clip_suffix = list(profile.args), profile.suffix
+    else:
+        clip_args, clip_suffix = list(encoder_args or DEFAULT_ENCODER_ARGS), ".mp4"
+    fps: Optional[float] = None
+    resolution: Optional[Tuple[int, int]] = None
+    index: Optional[KeyframeIndex] = None
+    probed = False
+    
+    async def source_ready() -> None:
+        """Wait for the source probes; the first caller applies them."""
+        nonlocal fps, resolution, index, probed
+        probe = await probe_task
+        res = await resolution_task
+        if probed:
+            return
+        probed = True
+        fps = probe.fps if probe is not None else None
+        # stretched slots are whole frames, so clips, speech and subtitles advance by the same length
+        planner.fps = fps
+        resolution = res
+        if proxy and resolution and resolution[1] > PROXY_HEIGHT:
+            resolution = (2 * round(resolution[0] * PROXY_HEIGHT / resolution[1] / 2), PROXY_HEIGHT)
+        # Unstretched GOPs can be copied when encoded clips join the source stream
+        # directly, i.e. no intermediate profile and an encoder matching the source,
+        # and when every GOP decodes on its own (closed GOPs)
+        if stream_copy and not intermediate and probe is not None and probe.closed_gop:
+            encoder = clip_args[clip_args.index("-c:v") + 1] if "-c:v" in clip_args else None
+            if COPY_COMPATIBLE.get(probe.codec) == encoder:
+                index = probe
+        if progress and stream_copy and not intermediate:
+            print(f"[ELASTIC_VIDEO] stream copy: {'on, %d keyframes' % len(index.times) if index else 'off'}")
+    
+    if clip_cache_dir is None:
+        clip_cache_dir = os.path.join(os.path.dirname(os.path.abspath(video_path)), "video_cache")
+    clip_cache = ClipCache(os.path.abspath(clip_cache_dir) if clip_cache_max_bytes > 0 and not plan_only else None, clip_cache_max_bytes)
+    if progress and not plan_only:
+        print(f"[ELASTIC_VIDEO] clip cache: {clip_cache.root or 'off'}")
+    plan: List[Tuple[str, int]] = []
+    for idx in range(total):
+        plan.append(("seg", idx))
+        if idx in gap_map:
+            plan.append(("gap", idx))
+    # short plans are split further so that every worker gets a chunk
+    chunk_size = max(1, min(RENDER_CHUNK_PIECES, -(-len(plan) // workers)))
+    chunks = [plan[i:i + chunk_size] for i in range(0, len(plan), chunk_size)]
+    chunk_of: Dict[int, int] = {idx: c for c, chunk in enumerate(chunks) for kind, idx in chunk if kind == "seg"}
+    unknown: List[int] = [sum(1 for kind, _ in chunk if kind == "seg") for chunk in chunks]
+    encode_queue: "asyncio.Queue[Optional[int]]" = asyncio.Queue(maxsize=VIDEO_ENCODE_QUEUE_SIZE)
+    rendered: Dict[Tuple[str, int], Optional[List[str]]] = {}
+    if progress:
+        bar2 = tqdm(total=len(plan), desc="Video Segments", unit="seg", position=1)
+    
+    if audio_stretch_range and not can_time_stretch():
+        print("[ELASTIC_VIDEO] no audio stretcher (pyrubberband / ffmpeg): hybrid falls back to video stretch")
+        audio_stretch_range = None
+    # fps (frame snapping) is set by source_ready before the first cue is planned
+    planner = TimelinePlanner(items, gaps, tolerance_ms=sync_tolerance_ms, tempo_range=audio_stretch_range)
+    # hybrid: speech fitted by an audio stretch, started as soon as its cue is planned
+    fit_tasks: Dict[int, "asyncio.Task[None]"] = {}
+    fitted_paths: Dict[int, str] = {}
+    
+    def chunk_pieces(c: int) -> List[Tuple[Tuple[str, int], VideoPiece]]:
+        pieces = []
+        for kind, idx in chunks[c]:
+            if kind == "gap":
+                pieces.append(((kind, idx), VideoPiece(gap_map[idx].start_ms, gap_map[idx].end_ms)))
+                continue
+            pieces.append(((kind, idx), VideoPiece(items[idx].start_ms, items[idx].end_ms, planner.plans[idx].ratio)))
+        return pieces
+    
+    async def encoder() -> None:
+        while True:
+            c = await encode_queue.get()
+            if c is None:
+                return
+            if plan_only:
+                rendered.update({key: [] for key, _ in chunk_pieces(c)})
+                continue
+            await source_ready()
+            rendered.update(await run_blocking(_render_chunk, video_path, chunk_pieces(c), clip_args, clip_suffix, index, clip_cache, fps, post))
+            if progress:
+                bar2.update(len(chunks[c]))
+    
+    plan_summary: Dict[str, object] = {}
+    
+    def report_plan() -> None:
+        plans = [planner.plans[i] for i in range(total)]
+        cost = plan_cost(plans, gaps)
+        print(cost.describe())
+        ratios = ratio_histogram(plans)
+        print("[MODE_B_PLAN] ratios: " + " ".join(f"{k}={v}" for k, v in ratios.items()))
+        # whole GOPs of unchanged runs are copied; partial GOPs at the cuts are encoded
+        pieces = [p for p in chunk_pieces_all() if p.end_ms - p.start_ms > MIN_PIECE_MS]
+        parts = split_stream_copy(pieces, index) if index is not None else [pieces]
+        copied = sum(p.end_ms - p.start_ms for p in parts if isinstance(p, StreamCopy))
+        encoded = [v for p in parts if not isinstance(p, StreamCopy) for v in p]
+        encoded_ms = sum(v.end_ms - v.start_ms for v in encoded)
+        clip_frames = int(sum(v.out_ms for v in encoded) / 1000 * fps) if fps else 0
+        # intermediates are encoded again, as one timeline, at final quality
+        final_frames = int(cost.total_ms / 1000 * fps) if fps and intermediate else 0
+        cpu_s = estimate_encode_cpu_s(clip_frames, resolution, clip_args)
+        if cpu_s is not None and final_frames:
+            cpu_s += estimate_encode_cpu_s(final_frames, resolution, encoder_args or DEFAULT_ENCODER_ARGS) or 0.0
+        g = current_governor()
+        cores = g.slots("video_encode") * g.threads("video_encode")
+        print(
+            f"[MODE_B_PLAN] estimated encode: {encoded_ms / 1000:.1f}s of source "
+            f"(~{clip_frames} frames{f' + {final_frames} final' if final_frames else ''}), stream copy: {copied / 1000:.1f}s, "
+            + (f"~{cpu_s:.0f} CPU-s (~{cpu_s / cores:.0f}s on {cores} cores)" if cpu_s is not None else "CPU-s unknown")
+        )
+        plan_summary.update(
+            cost=asdict(cost), ratios=ratios, encoded_source_ms=encoded_ms, stream_copy_ms=copied,
+            clip_frames=clip_frames, final_frames=final_frames,
+            cpu_seconds=None if cpu_s is None else round(cpu_s, 1), fps=round(fps, 3) if fps else None, resolution=resolution,
+        )
+    
+    def chunk_pieces_all() -> List[VideoPiece]:
+        return [p for c in range(len(chunks)) for _, p in chunk_pieces(c)]
+    
+    async def segment_known(idx: int) -> List[int]:
+        """Record a segment's duration (blank or TTS); returns the chunks that can be rendered now."""
+        await source_ready()
+        for cue in planner.set_audio(idx, None if idx in blank_segments else tts_durations[idx]):
+            if cue.tempo != 1.0 and not plan_only:
+                fitted_paths[cue.index] = tempfile.mktemp(suffix=".wav")
+                fit_tasks[cue.index] = asyncio.create_task(run_blocking(
+                    _fit_speech, temp_audio_paths[cue.index], fitted_paths[cue.index], cue.audio_ms
+                ))
+            c = chunk_of[cue.index]
+            unknown[c] -= 1
+            if unknown[c] == 0:
+                held.append(c)
+        if planner.done:
+            report_plan()
+        elif hold:
+            return []
+        released = list(held)
+        held.clear()
+        return released
+    
+    encoder_tasks = [asyncio.create_task(encoder()) for _ in range(workers)]
+    # fully planned chunks not queued yet; gap-only chunks need no TTS
+    hold = plan_first or plan_only
+    held: List[int] = [c for c in range(len(chunks)) if unknown[c] == 0]
+    ready_jobs: List[int] = [] if hold else held[:]
+    if not hold:
+        held.clear()
+    
     # ========== Step 1: Generate TTS audio (with caching and retry) ==========
-    async def generate_audio(idx: int, it: SRTItem) -> Tuple[int, Optional[str], int, bool]:
+    def prepare_segment(idx: int, it: SRTItem) -> Tuple[Optional[str], str]:
         """
-        Generate TTS audio for a segment with retry logic.
-        
+        Resolve the text and voice to synthesize for a segment.
+
         Returns:
-            Tuple of (idx, audio_path, duration_ms, is_blank)
-            - is_blank: True if segment text is empty/whitespace-only
+            Tuple of (text_to_speak, voice); text_to_speak is None for blank segments
         """
         speaker, clean_text = extract_speaker(it.text)
         chosen_voice = voice
@@ -257,89 +499,158 @@ async def build_elastic_video_from_srt(
         
         # Check if text is blank (empty or whitespace-only) after filtering
         if not text_to_speak or not text_to_speak.strip():
+            return None, chosen_voice
+        return text_to_speak, chosen_voice
+    
+    # Temporary storage for async results
+    temp_audio_paths: List[Optional[str]] = [None] * total
+    
+    if progress:
+        bar = tqdm(total=total, desc="TTS Generation", unit="seg")
+    
+    # Blank segments and cache hits are resolved up front (and planned by the
+    # feeder once the source probes are in); the rest is
+    # submitted to the backend as one work list. Request keys are
+    # (segment index, part index); oversized segments contribute several parts.
+    pending: List[SynthesisRequest] = []
+    cache_paths: Dict[int, str] = {}
+    part_paths: Dict[int, List[Optional[str]]] = {}
+    known_early: List[int] = []
+    for idx, it in enumerate(items):
+        text_to_speak, chosen_voice = prepare_segment(idx, it)
+        if text_to_speak is None:
             # Blank segment: skip TTS, use original video duration
             original_duration_ms = it.end_ms - it.start_ms
             if progress:
                 print(f"[ELASTIC_VIDEO] Segment {idx+1} is blank, skipping TTS (using original duration: {original_duration_ms}ms)")
-            return idx, None, original_duration_ms, True
+            tts_durations[idx] = original_duration_ms
+            blank_segments.add(idx)
+            known_early.append(idx)
+            if progress:
+                bar.update(1)
+            continue
         
         # Check cache first
-        cache_path = _get_tts_cache_path(cache_dir, text_to_speak, chosen_voice, idx)
-        
+        cache_path = _get_tts_cache_path(cache_dir, text_to_speak, chosen_voice, idx, ar)
         if os.path.exists(cache_path) and os.path.getsize(cache_path) > 0:
             # Use cached audio
             if progress:
                 print(f"[ELASTIC_VIDEO] Using cached TTS for segment {idx+1}")
-            duration = audio_duration_ms(cache_path)
-            return idx, cache_path, duration, False
+            temp_audio_paths[idx] = cache_path
+            tts_durations[idx] = await run_blocking(audio_duration_ms, cache_path)
+            known_early.append(idx)
+            if progress:
+                bar.update(1)
+            continue
         
-        # Generate new TTS with retry
-        last_error = None
-        for attempt in range(max_retries):
-            try:
-                async with sem:
-                    audio_path = await _synthesize_natural_speed(
-                        text_to_speak,
-                        chosen_voice,
-                        backend,
-                        ar
-                    )
-                
+        cache_paths[idx] = cache_path
+        pieces = [text_to_speak]
+        if char_limit and len(text_to_speak.strip()) > char_limit:
+            pieces = [p for p in split_text_by_sentences(text_to_speak.strip(), char_limit) if p.strip()] or [text_to_speak]
+            if progress and len(pieces) > 1:
+                print(f"[ELASTIC_VIDEO] Segment {idx+1} split into {len(pieces)} parts: {[len(p) for p in pieces]} chars")
+        part_paths[idx] = [None] * len(pieces)
+        for part, piece in enumerate(pieces):
+            pending.append(SynthesisRequest(key=(idx, part), text=piece, voice=chosen_voice, ar=ar))
+    
+    async def feed_ready() -> None:
+        for idx in known_early:
+            ready_jobs.extend(await segment_known(idx))
+        for job in ready_jobs:
+            await encode_queue.put(job)
+    
+    feeder_task = asyncio.create_task(feed_ready())
+    # a failed TTS or render must not leave the render stage or speech fits running
+    try:
+    
+        async def finish_segment(idx: int) -> None:
+            parts = part_paths[idx]
+            if len(parts) == 1:
                 # Copy to cache
-                import shutil
-                shutil.copy2(audio_path, cache_path)
-                
-                duration = audio_duration_ms(cache_path)
-                return idx, cache_path, duration, False
-            except Exception as e:
-                last_error = e
-                if progress:
-                    print(f"[ELASTIC_VIDEO] Segment {idx+1} TTS failed (attempt {attempt+1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-        
-        # All retries failed
-        raise last_error
-    
-    # Temporary storage for async results
-    temp_audio_paths: List[Optional[str]] = [None] * total
-    
-    tasks = [asyncio.create_task(generate_audio(i, it)) for i, it in enumerate(items)]
-    
-    if progress:
-        bar = tqdm(total=total, desc="TTS Generation", unit="seg")
+                await run_blocking(shutil.copy2, parts[0], cache_paths[idx])
+            else:
+                await run_blocking(crossfade_concat_wavs, parts, cache_paths[idx], fade_ms=SPLIT_CROSSFADE_MS)
+            temp_audio_paths[idx] = cache_paths[idx]
+            tts_durations[idx] = await run_blocking(audio_duration_ms, cache_paths[idx])
+            if progress:
+                bar.update(1)
+            for c in await segment_known(idx):
+                await encode_queue.put(c)
+    
+        # Generate new TTS with retry: failed requests are resubmitted as a batch,
+        # longest text first so a long segment late in the timeline is not the tail
+        pending = lpt_order(pending, lambda r: len(r.text))
+        tts_backend = create_backend(backend)
+        for attempt in range(max_retries):
+            if not pending:
+                break
+            if attempt > 0:
+                await asyncio.sleep(retry_delay)
+            failed: List[Tuple[SynthesisRequest, Exception]] = []
+            by_key = {req.key: req for req in pending}
+            # closed on any exit, so a failed render or cancellation stops the backend's workers
+            async with aclosing(tts_backend.synthesize_many(pending, jobs=resolve_jobs(backend, jobs))) as results:
+                async for res in results:
+                    idx, part = res.key
+                    if res.error is not None:
+                        if progress:
+                            print(f"[ELASTIC_VIDEO] Segment {idx+1} TTS failed (attempt {attempt+1}/{max_retries}): {res.error}")
+                        failed.append((by_key[res.key], res.error))
+                        continue
+                    part_paths[idx][part] = res.path
+                    if all(p is not None for p in part_paths[idx]):
+                        await finish_segment(idx)
+            pending = [req for req, _ in failed]
+            if pending and attempt == max_retries - 1:
+                # All retries failed: the render stage is stopped below
+                raise failed[0][1]
     
-    for fut in asyncio.as_completed(tasks):
-        idx, path, duration, is_blank = await fut
-        temp_audio_paths[idx] = path
-        tts_durations[idx] = duration
-        if is_blank:
-            blank_segments.add(idx)
         if progress:
-            bar.update(1)
+            bar.close()
+            if blank_segments:
+                print(f"[ELASTIC_VIDEO] {len(blank_segments)} blank segments will use original video duration")
+    
+        # ========== Step 2: Wait for the video render stage to drain ==========
+        await feeder_task
+        for _ in encoder_tasks:
+            await encode_queue.put(None)
+        await asyncio.gather(*encoder_tasks)
+        if progress:
+            bar2.close()
+        if fit_tasks:
+            await asyncio.gather(*fit_tasks.values())
+    finally:
+        # on failure or cancellation nothing may keep probing, feeding, rendering or fitting
+        for t in [probe_task, resolution_task, feeder_task, *encoder_tasks, *fit_tasks.values()]:
+            t.cancel()
+    if clip_cache.root:
+        kept, size = await run_blocking(clip_cache.evict)
+        print(
+            f"[VIDEO_CACHE] hits={clip_cache.hits} misses={clip_cache.misses} "
+            f"cached={kept} clips ({size / 2**20:.1f} MiB)"
+        )
     
+    # ========== Step 3: Assemble the new timeline in order ==========
+    # Video: the rendered clips (none in a dry run). Audio: each segment's speech placed at its
+    # slot start plus the planned lag, with silence in between and at the end.
     if progress:
-        bar.close()
-        if blank_segments:
-            print(f"[ELASTIC_VIDEO] {len(blank_segments)} blank segments will use original video duration")
+        print("[ELASTIC_VIDEO] Assembling video segments...")
     
-    # ========== Step 2: Detect gaps between segments ==========
-    gaps = detect_gaps(items, min_gap_ms=100)
-    gap_map: Dict[int, Gap] = {g.prev_index: g for g in gaps}  # Map: prev_index -> gap
+    plan_rows: List[Dict[str, object]] = []
+    current_time_ms = 0  # New timeline position (video)
+    video_pos_ms = 0.0   # Exact position: frame-snapped clips are not whole milliseconds
+    audio_time_ms = 0    # End of the audio laid out so far
     
-    if progress and gaps:
-        print(f"[ELASTIC_VIDEO] Detected {len(gaps)} gaps (> 100ms)")
-        for g in gaps:
-            print(f"[ELASTIC_VIDEO]   gap after seg {g.prev_index+1}: {g.duration_ms}ms")
-    
-    # ========== Step 3: Process video segments with gap handling ==========
-    if progress:
-        print("[ELASTIC_VIDEO] Processing video segments...")
-        bar2 = tqdm(total=total, desc="Video Segments", unit="seg")
-    
-    current_time_ms = 0  # New timeline position
+    async def add_silence(until_ms: int) -> None:
+        nonlocal audio_time_ms
+        if until_ms > audio_time_ms:
+            silence_audio = tempfile.mktemp(suffix=".wav")
+            await run_blocking(make_silence, silence_audio, until_ms - audio_time_ms, sr=ar)
+            tts_audio_paths.append(silence_audio)
+            audio_time_ms = until_ms
     
     for idx, it in enumerate(items):
+        cue: CuePlan = planner.plans[idx]
         # Original segment duration from subtitle
         original_duration_ms = it.end_ms - it.start_ms
         
@@ -348,67 +659,61 @@ async def build_elastic_video_from_srt(
         
         # TTS audio duration (for blank segments, this equals original duration)
         tts_duration_ms = tts_durations[idx]
+        # Speech as laid out: the audio-stretched duration in hybrid mode
+        speech_ms = cue.audio_ms if cue.tempo != 1.0 else tts_duration_ms
         
-        # Calculate stretch ratio
-        # ratio = TTS时长 / 原始时长
-        # 如果 TTS 比原始长，ratio > 1，视频需要拉伸（慢放）
-        # 如果 TTS 比原始短，ratio < 1，视频需要压缩（快放）
-        # 空白片段不拉伸，ratio = 1.0
+        # ratio = 新时长 / 原始时长（由规划器决定）
+        # ratio > 1：视频拉伸（慢放）；ratio < 1：视频压缩（快放）
+        # 容差内的超时顺延进间隙、不足补静音，ratio = 1.0；空白片段不拉伸
+        ratio = cue.ratio
         if is_blank:
-            ratio = 1.0
             if progress:
                 print(f"[ELASTIC_VIDEO] seg={idx+1} BLANK orig={original_duration_ms}ms (no stretch, silence audio)")
         else:
-            ratio = tts_duration_ms / max(1, original_duration_ms)
             if progress:
-                print(f"[ELASTIC_VIDEO] seg={idx+1} orig={original_duration_ms}ms tts={tts_duration_ms}ms ratio={ratio:.3f}")
-        
-        # Extract original video segment
-        tmp_segment = tempfile.mktemp(suffix=".mp4")
-        extract_ok = _extract_video_segment(video_path, it.start_ms, it.end_ms, tmp_segment)
-        
-        if not extract_ok:
-            # If extraction failed, skip this segment
+                note = f" lag={cue.lag_ms}ms" if cue.lag_ms else ""
+                if cue.ratio == 1.0 and cue.overrun_ms:
+                    note += f" overrun={cue.overrun_ms}ms (absorbed)"
+                elif cue.ratio == 1.0 and cue.padding_ms:
+                    note += f" pad={cue.padding_ms}ms"
+                if cue.tempo != 1.0:
+                    note += f" audio_tempo={cue.tempo:.3f}"
+                print(f"[ELASTIC_VIDEO] seg={idx+1} orig={original_duration_ms}ms tts={tts_duration_ms}ms ratio={ratio:.3f}{note}")
+        
+        # Rendered by the video stage ([] = covered by an earlier piece's clips)
+        segment_video = rendered.get(("seg", idx))
+        
+        if segment_video is None:
+            # If rendering failed, skip this segment
             if progress:
                 print(f"[ELASTIC_VIDEO] WARNING: Failed to extract segment {idx+1}")
-            bar2.update(1)
             continue
+        video_segments.extend(segment_video)
         
-        # For blank segments: no stretching, keep original video
         if is_blank:
-            video_segments.append(tmp_segment)
-            # Generate silence audio for blank segment
-            silence_audio = tempfile.mktemp(suffix=".wav")
-            make_silence(silence_audio, original_duration_ms, sr=ar)
-            tts_audio_paths.append(silence_audio)
+            # Blank segment: no speech, the subtitle covers the original duration
+            new_start_ms, new_end_ms = current_time_ms, current_time_ms + original_duration_ms
         else:
-            # Stretch/compress video if needed
-            if abs(ratio - 1.0) > 0.01:  # Only stretch if difference > 1%
-                stretched_segment = tempfile.mktemp(suffix=".mp4")
-                stretch_ok = _stretch_video_segment(tmp_segment, stretched_segment, ratio)
-                
-                if stretch_ok:
-                    video_segments.append(stretched_segment)
-                    try:
-                        os.unlink(tmp_segment)
-                    except:
-                        pass
-                else:
-                    # Fallback to original if stretch failed
-                    video_segments.append(tmp_segment)
-            else:
-                video_segments.append(tmp_segment)
-            
-            # Add TTS audio (in order)
-            tts_audio_paths.append(temp_audio_paths[idx])
+            # Speech starts at the slot start plus the lag left by earlier overruns
+            new_start_ms = max(current_time_ms + cue.lag_ms, audio_time_ms)
+            new_end_ms = new_start_ms + speech_ms
+            await add_silence(new_start_ms)
+            tts_audio_paths.append(fitted_paths.get(idx, temp_audio_paths[idx]))
+            audio_time_ms = new_end_ms
         
         # Create new subtitle item with updated timeline
         new_item = SRTItem(
-            start_ms=current_time_ms,
-            end_ms=current_time_ms + tts_duration_ms,
+            start_ms=new_start_ms,
+            end_ms=new_end_ms,
             text=it.text
         )
         new_items.append(new_item)
+        plan_rows.append({
+            "index": idx, "source_start_ms": it.start_ms, "source_end_ms": it.end_ms,
+            "slot_start_ms": current_time_ms, "slot_ms": cue.slot_ms, "speech_start_ms": new_start_ms, "speech_end_ms": new_end_ms,
+            "tts_ms": 0 if is_blank else tts_duration_ms, "ratio": round(cue.ratio, 6), "tempo": round(cue.tempo, 6),
+            "lag_ms": cue.lag_ms, "blank": is_blank,
+        })
         
         # Collect diagnostics for this segment
         if debug_sync:
@@ -418,8 +723,8 @@ async def build_elastic_video_from_srt(
                 original_end_ms=it.end_ms,
                 original_duration_ms=original_duration_ms,
                 tts_duration_ms=tts_duration_ms,
-                new_start_ms=current_time_ms,
-                new_end_ms=current_time_ms + tts_duration_ms,
+                new_start_ms=new_start_ms,
+                new_end_ms=new_end_ms,
                 stretch_ratio=ratio,
                 is_gap=False,
                 is_blank=is_blank,
@@ -434,8 +739,9 @@ async def build_elastic_video_from_srt(
                 if progress:
                     print(f"[ELASTIC_VIDEO] WARNING: {warn_msg}")
         
-        # Move timeline forward
-        current_time_ms += tts_duration_ms
+        # Move timeline forward by the segment's slot
+        video_pos_ms += cue.advance_ms
+        current_time_ms = int(round(video_pos_ms))
         
         # ========== Handle gap after this segment ==========
         if idx in gap_map:
@@ -445,17 +751,11 @@ async def build_elastic_video_from_srt(
             if progress:
                 print(f"[ELASTIC_VIDEO] Processing gap after seg {idx+1}: {gap_duration_ms}ms (no stretch)")
             
-            # Extract gap video segment (no stretching - keep original duration)
-            gap_video = tempfile.mktemp(suffix=".mp4")
-            gap_extract_ok = _extract_video_segment(video_path, gap.start_ms, gap.end_ms, gap_video)
+            # Gap video segment (no stretching - keep original duration)
+            gap_video = rendered.get(("gap", idx))
             
-            if gap_extract_ok:
-                video_segments.append(gap_video)
-                
-                # Generate silence audio for the gap
-                gap_audio = tempfile.mktemp(suffix=".wav")
-                make_silence(gap_audio, gap_duration_ms, sr=ar)
-                tts_audio_paths.append(gap_audio)
+            if gap_video is not None:
+                video_segments.extend(gap_video)
                 
                 # Collect diagnostics for gap
                 if debug_sync:
@@ -475,17 +775,24 @@ async def build_elastic_video_from_srt(
                     segment_infos.append(gap_info)
                 
                 # Move timeline forward by gap duration
-                current_time_ms += gap_duration_ms
+                video_pos_ms += gap_duration_ms
+                current_time_ms = int(round(video_pos_ms))
             else:
                 if progress:
                     print(f"[ELASTIC_VIDEO] WARNING: Failed to extract gap video after seg {idx+1}")
-        
-        if progress:
-            bar2.update(1)
+    
+    # Silence up to the end of the video (speech may already run past it)
+    await add_silence(current_time_ms)
     
     if progress:
-        bar2.close()
         print(f"[ELASTIC_VIDEO] Total new duration: {current_time_ms}ms ({current_time_ms/1000:.2f}s)")
+    if plan_path:
+        with open(plan_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "video": os.path.abspath(video_path), "duration_ms": current_time_ms,
+                **plan_summary, "segments": plan_rows,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"[MODE_B_PLAN] plan written: {plan_path}")
     
     # Build diagnostics if requested
     diagnostics: Optional[SyncDiagnostics] = None
@@ -510,27 +817,94 @@ async def build_elastic_video_from_srt(
     return tts_audio_paths, new_items, video_segments, diagnostics
 
 
-def concatenate_video_segments(segments: List[str], output_path: str) -> None:
-    """Concatenate video segments using ffmpeg concat demuxer."""
-    if not segments:
-        raise ValueError("No video segments to concatenate")
-    
-    # Create concat file list
+def _write_concat_list(segments: List[str]) -> str:
     concat_file = tempfile.mktemp(suffix=".txt")
     with open(concat_file, "w") as f:
         for seg in segments:
             escaped = seg.replace("'", "'\\''")
             f.write(f"file '{escaped}'\n")
+    return concat_file
+
+
+def _encode_chunk(segments: List[str], output_path: str, encoder_args: List[str], threads: int) -> None:
+    """Encode consecutive clips into one closed-GOP chunk, frame for frame."""
+    concat_file = _write_concat_list(segments)
+    try:
+        run_media([
+            "ffmpeg", "-y",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", concat_file,
+            *encoder_args,
+            # every chunk starts on an IDR frame and keeps exactly its input frames
+            "-flags", "+cgop",
+            *passthrough_args(),
+            "-an",
+            output_path,
+        ], threads=threads, stage="video_encode")
+    finally:
+        os.unlink(concat_file)
+
+
+def concatenate_video_segments(
+    segments: List[str],
+    output_path: str,
+    encoder_args: Optional[List[str]] = None,
+    chunk_clips: int = FINAL_CHUNK_CLIPS,
+    workers: Optional[int] = None,
+) -> None:
+    """
+    Concatenate video segments using ffmpeg concat demuxer.
+
+    Segments are stream-copied, or encoded once with `encoder_args` (the final
+    encode over intermediate clips). A long final encode is split at clip
+    boundaries into chunks of `chunk_clips` clips, encoded by `workers`
+    parallel processes (default: the governor's video_encode slots) and
+    joined by stream copy; the frame count of the result must equal the sum
+    of the input clips.
+    """
+    if not segments:
+        raise ValueError("No video segments to concatenate")
     
+    g = current_governor()
+    chunks = [segments[i:i + max(1, chunk_clips)] for i in range(0, len(segments), max(1, chunk_clips))]
+    workers = max(1, workers or g.slots("video_encode"))
+    if encoder_args is not None and len(chunks) > 1 and workers > 1:
+        threads = max(1, g.slots("video_encode") * g.threads("video_encode") // workers)
+        print(f"[FINAL_ENCODE] {len(segments)} clips -> {len(chunks)} chunks on {workers} workers x {threads} threads")
+        chunk_paths = [tempfile.mktemp(suffix=".mp4") for _ in chunks]
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # clip frame counts are read from the containers, alongside the encodes
+                expected_f = pool.submit(lambda: [count_video_frames(s) for s in segments])
+                list(pool.map(lambda c: _encode_chunk(c[0], c[1], encoder_args, threads), zip(chunks, chunk_paths)))
+                expected = expected_f.result()
+            concatenate_video_segments(chunk_paths, output_path)
+            actual = count_video_frames(output_path)
+            if actual is not None and None not in expected and actual != sum(expected):
+                raise RuntimeError(f"chunked final encode: {actual} frames in output, input clips have {sum(expected)}")
+            print(f"[FINAL_ENCODE] frames={actual if actual is not None else 'unknown'}")
+        finally:
+            for c in chunk_paths:
+                if os.path.exists(c):
+                    os.unlink(c)
+        return
+    
+    concat_file = _write_concat_list(segments)
     cmd = [
         "ffmpeg", "-y",
         "-f", "concat",
         "-safe", "0",
         "-i", concat_file,
-        "-c", "copy",
+        # clips are already timed: the final encode keeps their frames 1:1
+        *(["-c", "copy"] if encoder_args is None else [*encoder_args, *passthrough_args(), "-an"]),
         output_path
     ]
-    subprocess.run(cmd, check=True, capture_output=True)
+    if encoder_args is None:
+        run_media(cmd, stage="video_encode")
+    else:
+        # a single process: give it the whole video encode budget
+        run_media(cmd, threads=g.slots("video_encode") * g.threads("video_encode"), stage="video_encode")
     
     os.unlink(concat_file)
 
@@ -540,57 +914,38 @@ def generate_mode_b_subtitle(
     tts_durations: List[int],
     gaps: List[Gap],
     output_path: str,
-    keep_speaker_tags: bool = True
+    keep_speaker_tags: bool = True,
+    sync_tolerance_ms: int = 0,
 ) -> str:
     """
-    生成 Mode B 新时间轴字幕
-    
+    生成 Mode B 新时间轴字幕（不渲染视频时使用）
+
+    按 TimelinePlanner 规划新时间轴并写出规划后的字幕；传入与
+    build_elastic_video_from_srt 相同的 sync_tolerance_ms 时两者的时间轴一致。
+
     Args:
         items: 原始字幕片段列表
         tts_durations: 每个片段的 TTS 时长列表（毫秒）
         gaps: 间隙列表
         output_path: 输出路径
         keep_speaker_tags: 是否保留说话人标签
-        
+        sync_tolerance_ms: 同步容差（毫秒），默认 0 即每条字幕的时长跟随 TTS
+
     Returns:
         生成的字幕文件路径
     """
     from flexdub.core.subtitle import write_srt
-    import re
-    
-    # Build gap map for quick lookup
-    gap_map: Dict[int, Gap] = {g.prev_index: g for g in gaps}
-    
+
+    planner = TimelinePlanner(items, gaps, tolerance_ms=sync_tolerance_ms)
+    for idx, it in enumerate(items):
+        planner.set_audio(idx, tts_durations[idx] if idx < len(tts_durations) else it.end_ms - it.start_ms)
     new_items: List[SRTItem] = []
-    current_time_ms = 0
-    
+    slot_start = 0.0
     for idx, it in enumerate(items):
-        tts_duration_ms = tts_durations[idx] if idx < len(tts_durations) else (it.end_ms - it.start_ms)
-        
-        # Process text based on keep_speaker_tags setting
-        text = it.text
-        if not keep_speaker_tags:
-            # Remove [Speaker:Name] or 【Speaker:Name】 tags
-            text = re.sub(r'\[Speaker:[^\]]*\]\s*', '', text)
-            text = re.sub(r'【Speaker:[^】]*】\s*', '', text)
-            text = text.strip()
-        
-        # Create new subtitle item with updated timeline
-        new_item = SRTItem(
-            start_ms=current_time_ms,
-            end_ms=current_time_ms + tts_duration_ms,
-            text=text
-        )
-        new_items.append(new_item)
-        
-        # Move timeline forward
-        current_time_ms += tts_duration_ms
-        
-        # Add gap duration if there's a gap after this segment
-        if idx in gap_map:
-            current_time_ms += gap_map[idx].duration_ms
-    
-    # Write the new subtitle file
+        cue = planner.plans[idx]
+        start = int(round(slot_start)) + cue.lag_ms
+        text = it.text if keep_speaker_tags else extract_speaker(it.text)[1].strip()
+        new_items.append(SRTItem(start_ms=start, end_ms=start + cue.audio_ms, text=text))
+        slot_start += cue.advance_ms + planner.gap_after.get(idx, 0)
     write_srt(output_path, new_items)
-    
     return output_path
@@ -0,0 +1,194 @@
+"""
+Stage DAG engine
+
+流水线由若干阶段组成，每个阶段声明上游输入与参数。阶段输出按
+（阶段名、参数、上游键）的哈希缓存在 cache_dir 下；重跑时只执行
+缓存缺失或上游发生变化的阶段。互不依赖的阶段并发执行。
+"""
+
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from flexdub.core.aio import run_blocking
+
+# bump when a stage's cached value layout changes, so old caches are ignored
+ENGINE_VERSION = 1
+VALUE_NAME = "value.pkl"
+# files hashed by content up to this size; larger ones (videos) by path, size and mtime
+CONTENT_HASH_LIMIT = 64 * 1024 * 1024
+
+
+def file_fingerprint(path: Optional[str]) -> Optional[str]:
+    """Hashable identity of an input file (None if there is no file)."""
+    if not path or not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    if st.st_size > CONTENT_HASH_LIMIT:
+        return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class StageContext:
+    """What a stage function gets besides its inputs."""
+    name: str
+    workdir: str                 # stage-private directory for output files
+    log: Callable[[str], None]
+
+
+@dataclass
+class Stage:
+    """
+    One pipeline step.
+
+    `fn(ctx, **inputs)` (sync or async) gets the values of the stages named in
+    `inputs` as keyword arguments. `params` must be JSON-serializable and hold
+    everything besides the inputs that the result depends on. `files(value)`
+    lists output files that must still exist for a cached value to be reused.
+    Stages with cache=False always run (side effects such as QA reports).
+    Only the latest result of a stage is kept, one per value of the params
+    named in `generations` (e.g. proxy and final renders do not evict each other).
+    """
+    name: str
+    fn: Callable[..., Any]
+    inputs: Sequence[str] = ()
+    params: Dict[str, Any] = field(default_factory=dict)
+    files: Optional[Callable[[Any], List[str]]] = None
+    cache: bool = True
+    generations: Sequence[str] = ()
+
+
+class StageFailed(RuntimeError):
+    """A stage raised; the original exception is the __cause__."""
+
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"stage {stage} failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class Pipeline:
+    """A DAG of stages run with output caching."""
+
+    def __init__(self, cache_dir: str, log: Callable[[str], None] = print, use_cache: bool = True):
+        self.cache_dir = cache_dir
+        self.log = log
+        self.use_cache = use_cache
+        self.stages: Dict[str, Stage] = {}
+        self.keys: Dict[str, str] = {}
+        self.executed: List[str] = []
+
+    def add(self, stage: Stage) -> None:
+        for dep in stage.inputs:
+            if dep not in self.stages:
+                raise ValueError(f"stage {stage.name} depends on unknown stage {dep}")
+        if stage.name in self.stages:
+            raise ValueError(f"duplicate stage {stage.name}")
+        self.stages[stage.name] = stage
+        payload = json.dumps(
+            [ENGINE_VERSION, stage.name, stage.params, [self.keys[d] for d in stage.inputs]],
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        self.keys[stage.name] = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _prefix(self, name: str) -> str:
+        """Workdir prefix shared by the results of a stage that evict each other."""
+        stage = self.stages[name]
+        if not stage.generations:
+            return name + "-"
+        gen = json.dumps([stage.params.get(k) for k in stage.generations], sort_keys=True, default=str)
+        return f"{name}-{hashlib.sha1(gen.encode('utf-8')).hexdigest()[:8]}-"
+
+    def _workdir(self, name: str) -> str:
+        return os.path.join(self.cache_dir, self._prefix(name) + self.keys[name])
+
+    def _load(self, stage: Stage) -> Any:
+        """Cached value of a stage, or raises KeyError when there is none usable."""
+        if not (self.use_cache and stage.cache):
+            raise KeyError(stage.name)
+        path = os.path.join(self._workdir(stage.name), VALUE_NAME)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            raise KeyError(stage.name)
+        if stage.files is not None and not all(os.path.exists(p) for p in stage.files(value)):
+            raise KeyError(stage.name)
+        return value
+
+    def _store(self, stage: Stage, value: Any) -> None:
+        workdir = self._workdir(stage.name)
+        path = os.path.join(workdir, VALUE_NAME)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(value, f)
+        os.replace(path + ".tmp", path)
+        # one generation per stage (and generations value): older results are dropped
+        prefix = self._prefix(stage.name)
+        for entry in os.listdir(self.cache_dir):
+            full = os.path.join(self.cache_dir, entry)
+            if entry.startswith(prefix) and full != workdir and os.path.isdir(full):
+                rest = entry[len(prefix):]
+                if len(rest) == 16 and "-" not in rest:
+                    shutil.rmtree(full, ignore_errors=True)
+
+    async def run(self, targets: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Run the stages needed for `targets` (default: all); returns every computed value by name."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tasks: Dict[str, "asyncio.Task"] = {}
+
+        def task_for(name: str) -> "asyncio.Task":
+            if name not in tasks:
+                tasks[name] = asyncio.ensure_future(self._run_stage(self.stages[name], {d: task_for(d) for d in self.stages[name].inputs}))
+            return tasks[name]
+
+        wanted = list(targets) if targets is not None else list(self.stages)
+        for name in wanted:
+            task_for(name)
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for t in tasks.values():
+                if not t.done():
+                    t.cancel()
+        return {name: t.result() for name, t in tasks.items()}
+
+    async def _run_stage(self, stage: Stage, deps: Dict[str, "asyncio.Task"]) -> Any:
+        inputs = {}
+        for name, t in deps.items():
+            inputs[name] = await t
+        try:
+            value = await run_blocking(self._load, stage)
+            self.log(f"[STAGE] {stage.name} key={self.keys[stage.name]} cached")
+            return value
+        except KeyError:
+            pass
+        workdir = self._workdir(stage.name)
+        os.makedirs(workdir, exist_ok=True)
+        ctx = StageContext(name=stage.name, workdir=workdir, log=self.log)
+        t0 = time.monotonic()
+        try:
+            if inspect.iscoroutinefunction(stage.fn):
+                value = await stage.fn(ctx, **inputs)
+            else:
+                value = await run_blocking(stage.fn, ctx, **inputs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            raise StageFailed(stage.name, e) from e
+        self.executed.append(stage.name)
+        self.log(f"[STAGE] {stage.name} key={self.keys[stage.name]} ran {time.monotonic() - t0:.1f}s")
+        if stage.cache:
+            await run_blocking(self._store, stage, value)
+        return value
@@ -0,0 +1,182 @@
+"""
+Incremental re-dub
+
+在输出旁保存运行清单（run manifest）：每条字幕的内容哈希、拟合后的音频产物、
+拟合参数与其在混音中的采样区间。再次运行时按哈希对比新 SRT（支持插入/删除），
+只重新合成、拟合变化的字幕，并只改写混音中受影响的采样区间。
+"""
+
+import difflib
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from flexdub.core.subtitle import SRTItem
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+MIX_NAME = "mix.wav"
+CUE_DIR = "cues"
+
+# build options that change scheduling only, not the audio
+_NON_AUDIO_OPTIONS = {"jobs", "progress", "fit_jobs", "on_fitted"}
+
+
+def run_dir_for(output_path: str) -> str:
+    """Directory holding the manifest and cached artifacts for an output file."""
+    return os.path.splitext(output_path)[0] + ".flexdub"
+
+
+def build_tag(build_name: str, build_kwargs: Dict[str, Any]) -> str:
+    """Stable description of the build settings that affect rendered audio."""
+    opts = {k: v for k, v in sorted(build_kwargs.items()) if k not in _NON_AUDIO_OPTIONS}
+    return json.dumps([build_name, opts], sort_keys=True, ensure_ascii=False, default=str)
+
+
+def cue_key(item: SRTItem, voice: str, backend: str, ar: int, tag: str) -> str:
+    """Content hash of everything that determines a cue's fitted audio."""
+    payload = json.dumps([backend, voice, ar, tag, item.text, item.end_ms - item.start_ms], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CueRecord:
+    """One cue of a previous run."""
+    key: str
+    start_ms: int
+    end_ms: int
+    text: str
+    artifact: str            # fitted WAV, relative to the run dir
+    target_ms: int           # fit target (slot length)
+    frames: int              # fitted length in samples at the working rate
+    range: Tuple[int, int]   # [start, end) samples in the mix
+
+
+@dataclass
+class RunManifest:
+    """Per-output record of the last Mode A render."""
+    ar: int
+    video_ms: int
+    mix: str = MIX_NAME
+    mix_frames: int = 0
+    cues: List[CueRecord] = field(default_factory=list)
+    version: int = MANIFEST_VERSION
+
+    @classmethod
+    def load(cls, run_dir: str) -> Optional["RunManifest"]:
+        try:
+            with open(os.path.join(run_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            if raw.get("version") != MANIFEST_VERSION:
+                return None
+            cues = [CueRecord(**{**c, "range": tuple(c["range"])}) for c in raw.get("cues", [])]
+            return cls(ar=raw["ar"], video_ms=raw["video_ms"], mix=raw.get("mix", MIX_NAME), mix_frames=raw.get("mix_frames", 0), cues=cues)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, run_dir: str) -> None:
+        os.makedirs(run_dir, exist_ok=True)
+        path = os.path.join(run_dir, MANIFEST_NAME)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    def artifacts(self, run_dir: str) -> Dict[str, CueRecord]:
+        """Cached cues by key, for those whose fitted WAV still exists."""
+        return {c.key: c for c in self.cues if os.path.exists(os.path.join(run_dir, c.artifact))}
+
+
+def diff_counts(old_keys: Sequence[str], new_keys: Sequence[str]) -> Dict[str, int]:
+    """Counts of kept / inserted / deleted / replaced cues between two runs."""
+    counts = {"kept": 0, "inserted": 0, "deleted": 0, "replaced": 0}
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, list(old_keys), list(new_keys), autojunk=False).get_opcodes():
+        if op == "equal":
+            counts["kept"] += i2 - i1
+        elif op == "insert":
+            counts["inserted"] += j2 - j1
+        elif op == "delete":
+            counts["deleted"] += i2 - i1
+        else:
+            counts["replaced"] += max(i2 - i1, j2 - j1)
+    return counts
+
+
+def timeline_layout(items: List[SRTItem], frames: List[int], sr: int, video_ms: int) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    Sample ranges of each cue and total length, exactly as TimelineWavWriter lays them out
+    (leading silence, cue, positive gap, ..., tail).
+    """
+    def ms_frames(ms: int) -> int:
+        return int(round(max(0, ms) / 1000.0 * sr))
+
+    ranges: List[Tuple[int, int]] = []
+    pos = ms_frames(items[0].start_ms) if items else 0
+    for i, it in enumerate(items):
+        ranges.append((pos, pos + frames[i]))
+        pos += frames[i]
+        if i + 1 < len(items):
+            pos += ms_frames(items[i + 1].start_ms - it.end_ms)
+    tail = max(0, video_ms - items[-1].end_ms) if items else video_ms
+    return ranges, pos + ms_frames(tail)
+
+
+def patch_mix(mix_path: str, clear: List[Tuple[int, int]], writes: List[Tuple[int, str]]) -> int:
+    """Zero the `clear` ranges, then write each (start, wav) clip in place; returns samples touched."""
+    touched = 0
+    with sf.SoundFile(mix_path, "r+") as f:
+        for s, e in clear:
+            if e > s:
+                f.seek(s)
+                f.write(np.zeros(e - s, dtype=np.float32))
+                touched += e - s
+        for start, wav in writes:
+            data, _ = sf.read(wav, dtype="float32", always_2d=True)
+            mono = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+            f.seek(start)
+            f.write(mono)
+            touched += len(mono)
+    return touched
+
+
+# fitted cues are padded up to their slot, and trimmed to it when at most this much longer,
+# so a re-fitted cue lands on exactly the old sample range and the mix can be patched in place
+SNAP_TOLERANCE_MS = 20
+
+
+def store_artifact(run_dir: str, key: str, fitted_wav: str, target_ms: Optional[int] = None) -> str:
+    """Copy a fitted cue into the run dir (snapped to `target_ms` when close); returns its relative path."""
+    rel = os.path.join(CUE_DIR, key + ".wav")
+    dst = os.path.join(run_dir, rel)
+    if os.path.exists(dst):
+        return rel
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = dst + ".tmp.wav"
+    data, sr = sf.read(fitted_wav, dtype="float32", always_2d=True)
+    mono = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+    if target_ms is not None:
+        want = int(round(max(0, target_ms) / 1000.0 * sr))
+        if len(mono) - want <= SNAP_TOLERANCE_MS * sr // 1000:
+            mono = np.pad(mono, (0, max(0, want - len(mono))))[:want]
+    sf.write(tmp, mono, sr)
+    os.replace(tmp, dst)
+    return rel
+
+
+def prune_artifacts(run_dir: str, keep: Sequence[str]) -> None:
+    """Delete cached cues that the current manifest no longer references."""
+    cue_dir = os.path.join(run_dir, CUE_DIR)
+    wanted = {os.path.basename(p) for p in keep}
+    if not os.path.isdir(cue_dir):
+        return
+    for name in os.listdir(cue_dir):
+        if name not in wanted:
+            try:
+                os.remove(os.path.join(cue_dir, name))
+            except OSError:
+                pass
@@ -0,0 +1,366 @@
+"""
+Merge pipeline as a stage DAG
+
+merge / json_merge / project_merge 共用同一条流水线：
+parse → audit / rebalance → dual-SRT / voice → dub（Mode A）或 elastic（Mode B）
+→ mode_b_srt → mux ∥ qa。各命令只是 MergeConfig 的取值不同。
+阶段输出缓存在 <输出名>.flexdub/stages/ 下，重跑只执行变化的阶段及其下游。
+"""
+
+import os
+import shutil
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flexdub.core.audio import concat_wavs, detect_negative_ts, media_duration_ms, mux_audio_video
+from flexdub.core.governor import VIDEO_MODES
+from flexdub.core.rebalance import rebalance_intervals
+from flexdub.core.timeline_plan import AUDIO_STRETCH_RANGE, SYNC_TOLERANCE_MS
+from flexdub.core.video import CLIP_CACHE_MAX_BYTES, DEFAULT_ENCODER_ARGS, PROXY_ENCODER_ARGS, proxy_scale
+from flexdub.core.subtitle import SRTItem, SyncDiagnostics, from_segments, read_srt, to_segments, write_srt
+from flexdub.pipelines.engine import Pipeline, Stage, StageContext, file_fingerprint
+from flexdub.pipelines.incremental import run_dir_for
+from flexdub.pipelines.streaming import ModeARender
+
+STAGE_DIR = "stages"
+
+
+@dataclass
+class MergeConfig:
+    """Everything that distinguishes merge, json_merge and project_merge runs."""
+    source_path: str
+    video_path: str
+    output_path: str
+    backend: str
+    voice: Optional[str]
+    ar: int                                   # working (TTS) sample rate
+    out_ar: int                               # sample rate of the muxed audio
+    source_kind: str = "srt"                  # "srt" or "json"
+    json_source: str = "auto"
+    mode: str = "elastic-audio"
+    jobs: Optional[int] = None
+    progress: bool = True
+    # script stage
+    rebalance: bool = True
+    target_cpm: int = 180
+    max_shift: int = 1000
+    panic_cpm: int = 300
+    rebalance_srt: Optional[str] = None       # also write the rebalanced SRT here
+    cpm_csv: Optional[str] = None             # write a per-cue CPM audit here
+    dual_srt: Optional[str] = None            # None, "semantic" or "llm"
+    dual_from: str = "rebalance"              # "parse" or "rebalance"
+    display_srt: Optional[str] = None
+    audio_srt: Optional[str] = None
+    detect_voice: bool = False                # pick the voice from the detected language
+    target_lang: Optional[str] = None
+    # synthesis
+    clustered: bool = False
+    smart_split: bool = False
+    voice_map: Optional[Dict[str, str]] = None
+    cluster_min_chars: Optional[int] = None
+    cluster_max_chars: Optional[int] = None
+    cluster_plan: bool = True                 # False: keep the semantic clusters as they are
+    latency_model: Optional[str] = None       # latency model file; None = FLEXDUB_LATENCY_MODEL or ~/.cache
+    coalesce: bool = False
+    incremental: bool = False
+    skip_length_check: bool = False
+    # Mode B video
+    intermediate_codec: Optional[str] = None  # INTERMEDIATE_PROFILES name; None renders final clips directly
+    video_encoder_args: Optional[List[str]] = None
+    stream_copy: bool = True                  # copy whole unstretched GOPs instead of re-encoding
+    sync_tolerance_ms: int = SYNC_TOLERANCE_MS
+    video_cache_bytes: int = CLIP_CACHE_MAX_BYTES  # rendered clip cache next to the video; 0 disables
+    audio_stretch_range: Tuple[float, float] = AUDIO_STRETCH_RANGE  # elastic-hybrid speech tempo range
+    final_chunk_clips: Optional[int] = None   # clips per parallel final-encode chunk (intermediates only)
+    final_workers: Optional[int] = None       # final-encode processes; None = governor video_encode slots
+    plan_only: bool = False                   # Mode B dry run: TTS + timeline plan, no video / mux
+    plan_first: bool = False                  # Mode B: report the full plan before encoding starts
+    proxy: bool = False                       # low-res ultrafast review render, written to <output>.proxy.mp4
+    # output
+    subtitle_path: Optional[str] = None       # explicit subtitle file to embed
+    subtitle_source: Optional[str] = None     # or a generated one: "display", "rebalance", "mode_b"
+    subtitle_lang: str = "zh"
+    mode_b_srt: Optional[str] = None
+    mode_b_plan: Optional[str] = None         # JSON with the planned timeline and encode estimates
+    robust_ts: bool = False
+    debug_sync: bool = False
+    debug_log_path: Optional[str] = None
+    diag_log_path: Optional[str] = None
+    use_cache: bool = True
+
+
+@dataclass
+class ElasticRender:
+    """Output of the Mode B stage: stretched video, natural-speed audio and the new timeline."""
+    items: List[SRTItem]
+    video_path: str
+    mix_path: str
+    diagnostics: Optional[SyncDiagnostics] = None
+
+
+@dataclass
+class MergeResult:
+    output_path: str
+    render: Any                               # ModeARender or ElasticRender
+    executed: List[str] = field(default_factory=list)
+
+
+def _parse(cfg: MergeConfig) -> Callable[[StageContext], List[SRTItem]]:
+    def parse(ctx: StageContext) -> List[SRTItem]:
+        if cfg.source_kind == "json":
+            from flexdub.core.io import read_segments_json
+            return from_segments(read_segments_json(cfg.source_path, source=cfg.json_source))
+        return [SRTItem(i.start_ms, i.end_ms, i.text) for i in read_srt(cfg.source_path)]
+    return parse
+
+
+def _audit(cfg: MergeConfig):
+    def audit(ctx: StageContext, parse: List[SRTItem]) -> str:
+        import csv
+        with open(cfg.cpm_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["index", "cpm", "duration_ms", "chars", "start_ms", "end_ms"])
+            for idx, it in enumerate(parse, start=1):
+                dur = max(1, it.end_ms - it.start_ms)
+                chars = len(it.text.strip())
+                w.writerow([idx, chars / (dur / 60000.0), dur, chars, it.start_ms, it.end_ms])
+        ctx.log("[AUDIT] cpm.csv written")
+        return cfg.cpm_csv
+    return audit
+
+
+def _rebalance(cfg: MergeConfig):
+    def rebalance(ctx: StageContext, parse: List[SRTItem]) -> List[SRTItem]:
+        if not cfg.rebalance:
+            return parse
+        segs = rebalance_intervals(to_segments(parse), target_cpm=cfg.target_cpm, max_shift_ms=cfg.max_shift, panic_cpm=cfg.panic_cpm)
+        items = from_segments(segs)
+        if [i.text for i in items] != [i.text for i in parse]:
+            raise RuntimeError("text mutated in script stage")
+        if cfg.rebalance_srt:
+            write_srt(cfg.rebalance_srt, items)
+            ctx.log("[REBALANCE] rebalance.srt written")
+        return items
+    return rebalance
+
+
+def _dual(cfg: MergeConfig):
+    def dual(ctx: StageContext, **inputs: List[SRTItem]) -> List[str]:
+        items = inputs[cfg.dual_from]
+        os.makedirs(os.path.dirname(cfg.display_srt) or ".", exist_ok=True)
+        if cfg.dual_srt == "llm":
+            from flexdub.core.subtitle import llm_generate_dual_srt
+            d_items, a_items = llm_generate_dual_srt(items)
+        else:
+            from flexdub.core.subtitle import semantic_restructure
+            d_items, a_items = items, semantic_restructure(items)
+        write_srt(cfg.display_srt, d_items)
+        write_srt(cfg.audio_srt, a_items)
+        ctx.log("[DUAL] display.srt & audio.srt written")
+        return [cfg.display_srt, cfg.audio_srt]
+    return dual
+
+
+def _voice(cfg: MergeConfig):
+    def voice(ctx: StageContext, rebalance: List[SRTItem]) -> str:
+        if not cfg.detect_voice:
+            return cfg.voice
+        from flexdub.core.lang import detect_language, recommended_voice
+        tl = cfg.target_lang or detect_language([i.text for i in rebalance])
+        chosen = cfg.voice or recommended_voice(tl)
+        ctx.log(f"[LANG] {tl}")
+        ctx.log(f"[VOICE] {chosen}")
+        return chosen
+    return voice
+
+
+def _mode_a_build(cfg: MergeConfig):
+    if cfg.clustered:
+        from flexdub.pipelines.dubbing import build_audio_from_srt_clustered as build
+        kwargs = dict(smart_split=cfg.smart_split, voice_map=cfg.voice_map, min_chars=cfg.cluster_min_chars, max_chars=cfg.cluster_max_chars,
+                      plan_clusters=cfg.cluster_plan, latency_model=cfg.latency_model)
+    else:
+        from flexdub.pipelines.dubbing import build_audio_from_srt as build
+        kwargs = dict(coalesce=cfg.coalesce)
+    return build, kwargs
+
+
+def _dub(cfg: MergeConfig):
+    async def dub(ctx: StageContext, parse: List[SRTItem], rebalance: List[SRTItem], voice: str) -> ModeARender:
+        from flexdub.pipelines.streaming import dub_mode_a
+        build, kwargs = _mode_a_build(cfg)
+        run_dir = run_dir_for(cfg.output_path) if cfg.incremental else None
+        # synthesis, fitting and timeline rendering run as one streaming stage
+        rendered = await dub_mode_a(
+            build, rebalance, voice, cfg.backend, cfg.ar, cfg.out_ar, cfg.video_path,
+            orig_texts=[i.text for i in parse], probe_negative_ts=detect_negative_ts, run_dir=run_dir,
+            jobs=cfg.jobs, progress=cfg.progress, **kwargs,
+        )
+        mix = os.path.join(ctx.workdir, "mix.wav")
+        if run_dir is not None and rendered.mix_path.startswith(run_dir):
+            shutil.copyfile(rendered.mix_path, mix)
+        else:
+            shutil.move(rendered.mix_path, mix)
+        return replace(rendered, mix_path=mix)
+    return dub
+
+
+def _elastic(cfg: MergeConfig):
+    async def elastic(ctx: StageContext, rebalance: List[SRTItem], voice: str) -> ElasticRender:
+        from flexdub.core.aio import run_blocking
+        from flexdub.pipelines.elastic_video import build_elastic_video_from_srt, concatenate_video_segments
+        wavs, new_items, video_segments, diagnostics = await build_elastic_video_from_srt(
+            rebalance, cfg.video_path, voice, cfg.backend, cfg.ar,
+            jobs=cfg.jobs, progress=cfg.progress, voice_map=cfg.voice_map,
+            debug_sync=cfg.debug_sync, skip_length_check=cfg.skip_length_check, sync_tolerance_ms=cfg.sync_tolerance_ms,
+            intermediate=cfg.intermediate_codec, encoder_args=cfg.video_encoder_args, stream_copy=cfg.stream_copy,
+            clip_cache_max_bytes=cfg.video_cache_bytes,
+            audio_stretch_range=cfg.audio_stretch_range if cfg.mode == "elastic-hybrid" else None,
+            plan_only=cfg.plan_only, plan_path=cfg.mode_b_plan, proxy=cfg.proxy, plan_first=cfg.plan_first,
+        )
+        if cfg.plan_only:
+            return ElasticRender(items=new_items, video_path="", mix_path="", diagnostics=diagnostics)
+        video = os.path.join(ctx.workdir, "video.mp4")
+        mix = os.path.join(ctx.workdir, "mix.wav")
+        # intermediates get one final-quality encode over the whole timeline
+        final_args = (cfg.video_encoder_args or DEFAULT_ENCODER_ARGS) if cfg.intermediate_codec and not cfg.proxy else None
+        chunking = {"chunk_clips": cfg.final_chunk_clips} if cfg.final_chunk_clips else {}
+        await run_blocking(concatenate_video_segments, video_segments, video, final_args, workers=cfg.final_workers, **chunking)
+        await run_blocking(concat_wavs, wavs, mix, cfg.out_ar)
+        return ElasticRender(items=new_items, video_path=video, mix_path=mix, diagnostics=diagnostics)
+    return elastic
+
+
+def _mode_b_srt(cfg: MergeConfig):
+    def mode_b_srt(ctx: StageContext, elastic: ElasticRender, **dual: Any) -> str:
+        # the planned timeline places each cue where its speech is
+        write_srt(cfg.mode_b_srt, elastic.items)
+        ctx.log(f"[MODE_B] Generated subtitle: {cfg.mode_b_srt}")
+        # display subtitle follows the new timeline
+        if cfg.display_srt and "dual" in dual:
+            write_srt(cfg.display_srt, elastic.items)
+        return cfg.mode_b_srt
+    return mode_b_srt
+
+
+def proxy_output_path(output_path: str) -> str:
+    """Where --proxy writes its render; stage caches stay keyed by the final output."""
+    base, ext = os.path.splitext(output_path)
+    return base + ".proxy" + (ext or ".mp4")
+
+
+def _mux(cfg: MergeConfig):
+    def mux(ctx: StageContext, render: Any, **subs: Any) -> str:
+        sub_path = cfg.subtitle_path
+        if cfg.subtitle_source == "display" and "dual" in subs:
+            sub_path = subs["dual"][0]
+        elif cfg.subtitle_source == "rebalance":
+            sub_path = cfg.rebalance_srt if cfg.rebalance else None
+        elif cfg.subtitle_source == "mode_b":
+            sub_path = subs.get("mode_b_srt")
+        video_args = None
+        if isinstance(render, ElasticRender):
+            # Merge stretched video with natural-speed audio (already proxy-sized in proxy mode)
+            video, negative_ts = render.video_path, detect_negative_ts(render.video_path)
+        else:
+            video, negative_ts = cfg.video_path, render.negative_ts
+            if cfg.proxy:
+                video_args = ["-vf", proxy_scale(), *PROXY_ENCODER_ARGS]
+        out = proxy_output_path(cfg.output_path) if cfg.proxy else cfg.output_path
+        mux_audio_video(video, render.mix_path, out, subtitle_path=sub_path, subtitle_lang=cfg.subtitle_lang,
+                        robust_ts=(cfg.robust_ts or negative_ts), video_args=video_args)
+        ctx.log("[MERGE] output mp4 written" + (" (proxy)" if cfg.proxy else ""))
+        return out
+    return mux
+
+
+def _qa(cfg: MergeConfig):
+    def qa(ctx: StageContext, render: Any, parse: List[SRTItem]) -> None:
+        if isinstance(render, ModeARender):
+            if cfg.debug_sync and cfg.debug_log_path:
+                with open(cfg.debug_log_path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(render.debug_lines))
+                ctx.log(cfg.debug_log_path)
+            return
+        diag = render.diagnostics
+        if cfg.debug_sync and diag and cfg.diag_log_path:
+            with open(cfg.diag_log_path, "w", encoding="utf-8") as df:
+                df.write(f"[MODE_B_SYNC_DIAGNOSTICS]\n")
+                df.write(f"total_original_ms={diag.total_original_ms}\n")
+                df.write(f"total_new_ms={diag.total_new_ms}\n")
+                df.write(f"overall_ratio={diag.overall_ratio:.4f}\n")
+                df.write(f"\n[SEGMENTS]\n")
+                for seg in diag.segments:
+                    seg_type = "GAP" if seg.is_gap else ("BLANK" if seg.is_blank else "NORMAL")
+                    df.write(f"idx={seg.index} type={seg_type} orig={seg.original_duration_ms}ms tts={seg.tts_duration_ms}ms ratio={seg.stretch_ratio:.3f} new_start={seg.new_start_ms}ms new_end={seg.new_end_ms}ms text={seg.text}\n")
+                if diag.warnings:
+                    df.write(f"\n[WARNINGS]\n")
+                    for w in diag.warnings:
+                        df.write(f"{w}\n")
+            ctx.log(f"[MODE_B] Sync diagnostics written to: {cfg.diag_log_path}")
+        # Verify total duration consistency: the audio must cover the planned video
+        expected_ms = media_duration_ms(render.video_path)
+        actual_ms = media_duration_ms(render.mix_path)
+        diff_ms = abs(expected_ms - actual_ms)
+        ctx.log("[MODE_B] Duration verification:")
+        ctx.log(f"[MODE_B]   Expected (video): {expected_ms}ms")
+        ctx.log(f"[MODE_B]   Actual audio: {actual_ms}ms")
+        ctx.log(f"[MODE_B]   Difference: {diff_ms}ms")
+        if diff_ms > 100:  # More than 100ms difference
+            ctx.log("[MODE_B] WARNING: Duration mismatch exceeds 100ms!")
+    return qa
+
+
+def build_merge_pipeline(cfg: MergeConfig, log: Callable[[str], None] = print) -> Pipeline:
+    """Assemble the stage DAG for one merge run."""
+    p = Pipeline(os.path.join(run_dir_for(cfg.output_path), STAGE_DIR), log=log, use_cache=cfg.use_cache)
+    p.add(Stage("parse", _parse(cfg), params={"kind": cfg.source_kind, "source": file_fingerprint(cfg.source_path), "json_source": cfg.json_source}))
+    if cfg.cpm_csv:
+        p.add(Stage("audit", _audit(cfg), inputs=["parse"], params={"path": cfg.cpm_csv}, files=lambda v: [v]))
+    p.add(Stage(
+        "rebalance", _rebalance(cfg), inputs=["parse"],
+        params={"enabled": cfg.rebalance, "target_cpm": cfg.target_cpm, "max_shift": cfg.max_shift, "panic_cpm": cfg.panic_cpm, "srt": cfg.rebalance_srt},
+        files=lambda v: [cfg.rebalance_srt] if cfg.rebalance and cfg.rebalance_srt else [],
+    ))
+    if cfg.dual_srt:
+        p.add(Stage("dual", _dual(cfg), inputs=[cfg.dual_from], params={"method": cfg.dual_srt, "display": cfg.display_srt, "audio": cfg.audio_srt}, files=lambda v: v))
+    p.add(Stage("voice", _voice(cfg), inputs=["rebalance"], params={"voice": cfg.voice, "detect": cfg.detect_voice, "lang": cfg.target_lang}, cache=False))
+    synth = {"backend": cfg.backend, "ar": cfg.ar, "out_ar": cfg.out_ar, "video": file_fingerprint(cfg.video_path), "voice_map": cfg.voice_map}
+    if cfg.mode in VIDEO_MODES:
+        render = "elastic"
+        p.add(Stage("elastic", _elastic(cfg), inputs=["rebalance", "voice"],
+                    params={**synth, "skip_length_check": cfg.skip_length_check, "debug_sync": cfg.debug_sync,
+                            "intermediate": cfg.intermediate_codec, "encoder_args": cfg.video_encoder_args,
+                            "stream_copy": cfg.stream_copy, "sync_tolerance_ms": cfg.sync_tolerance_ms,
+                            "audio_stretch": list(cfg.audio_stretch_range) if cfg.mode == "elastic-hybrid" else None,
+                            "plan_only": cfg.plan_only, "plan": cfg.mode_b_plan, "proxy": cfg.proxy},
+                    files=lambda v: [p for p in (v.video_path, v.mix_path, cfg.mode_b_plan) if p], generations=["proxy"]))
+        p.add(Stage("mode_b_srt", _mode_b_srt(cfg), inputs=["elastic"] + (["dual"] if cfg.dual_srt else []),
+                    params={"path": cfg.mode_b_srt}, files=lambda v: [v]))
+        if cfg.plan_only:
+            return p
+    else:
+        render = "dub"
+        p.add(Stage("dub", _dub(cfg), inputs=["parse", "rebalance", "voice"],
+                    params={**synth, "clustered": cfg.clustered, "smart_split": cfg.smart_split, "coalesce": cfg.coalesce,
+                            "cluster_chars": [cfg.cluster_min_chars, cfg.cluster_max_chars], "cluster_plan": cfg.cluster_plan, "incremental": cfg.incremental},
+                    files=lambda v: [v.mix_path]))
+    sub_inputs = [s for s in ("dual", "mode_b_srt") if s in p.stages]
+    p.add(Stage(
+        "mux", lambda ctx, **kw: _mux(cfg)(ctx, kw.pop(render), **kw), inputs=[render] + sub_inputs,
+        params={"output": cfg.output_path, "subtitle": file_fingerprint(cfg.subtitle_path), "subtitle_path": cfg.subtitle_path,
+                "subtitle_source": cfg.subtitle_source, "lang": cfg.subtitle_lang, "robust_ts": cfg.robust_ts, "proxy": cfg.proxy},
+        files=lambda v: [v], generations=["proxy"],
+    ))
+    p.add(Stage("qa", lambda ctx, parse, **kw: _qa(cfg)(ctx, kw[render], parse), inputs=[render, "parse"], cache=False))
+    return p
+
+
+async def run_merge(cfg: MergeConfig, log: Callable[[str], None] = print) -> MergeResult:
+    """Run (or resume) a merge; stages whose inputs and parameters are unchanged come from the cache."""
+    p = build_merge_pipeline(cfg, log)
+    values = await p.run()
+    render = values["elastic"] if "elastic" in values else values["dub"]
+    # a dry run stops at the plan and the Mode B subtitle
+    output = values["mux"] if "mux" in values else (cfg.mode_b_plan or values["mode_b_srt"])
+    return MergeResult(output_path=output, render=render, executed=list(p.executed))
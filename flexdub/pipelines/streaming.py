@@ -0,0 +1,230 @@
+"""
+Streaming Mode A pipeline
+
+合成 → 拟合 → 渲染 三个阶段并发运行：每条字幕拟合完成后按时间轴顺序
+立即写入混音；视频时长探测与 negative-ts 检测与合成同时进行，
+不再等待全部 TTS 结束后才开始拼接。
+"""
+
+import asyncio
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import soundfile as sf
+
+from flexdub.core.audio import TimelineWavWriter, concat_wavs, detect_negative_ts, media_duration_ms
+from flexdub.core.subtitle import SRTItem
+from flexdub.core.aio import run_blocking
+from flexdub.pipelines.incremental import (
+    MIX_NAME, CueRecord, RunManifest, build_tag, cue_key, diff_counts,
+    patch_mix, prune_artifacts, store_artifact, timeline_layout,
+)
+
+
+class OrderedSlots:
+    """Per-index results, filled in any order and consumed in timeline order."""
+
+    def __init__(self, n: int):
+        loop = asyncio.get_running_loop()
+        self._futs: List["asyncio.Future"] = [loop.create_future() for _ in range(n)]
+
+    def set(self, i: int, value: Any) -> None:
+        if not self._futs[i].done():
+            self._futs[i].set_result(value)
+
+    def fail(self, exc: BaseException) -> None:
+        for f in self._futs:
+            if not f.done():
+                f.set_exception(exc)
+
+    async def get(self, i: int) -> Any:
+        return await self._futs[i]
+
+    def discard(self) -> None:
+        # mark failures as retrieved so asyncio does not warn about them
+        for f in self._futs:
+            if f.done() and not f.cancelled():
+                f.exception()
+
+
+def _debug_lines(items: List[SRTItem], video_ms: int, orig_texts: Optional[List[str]]) -> List[str]:
+    """[VIDEO]/[PRE]/[QA]/[SEG]/[TAIL] lines describing the rendered timeline."""
+    if not items:
+        return []
+    lines = [f"[VIDEO] duration_ms={video_ms}", f"[PRE] ms={max(0, items[0].start_ms)}"]
+    if orig_texts is not None:
+        for si in range(0, min(len(items), 20)):
+            lines.append(f"[QA] idx={si} same_text={orig_texts[si] == items[si].text}")
+    for i, it in enumerate(items[:-1]):
+        lines.append(f"[SEG] idx={i} start={it.start_ms} end={it.end_ms} gap_to_next={items[i + 1].start_ms - it.end_ms}")
+    lines.append(f"[TAIL] ms={max(0, video_ms - items[-1].end_ms)}")
+    return lines
+
+
+@dataclass
+class ModeARender:
+    """Output of the Mode A render stage."""
+    mix_path: str
+    video_ms: int
+    negative_ts: bool
+    debug_lines: List[str] = field(default_factory=list)
+
+
+async def dub_mode_a(
+    build: Callable[..., Awaitable[List[str]]],
+    items: List[SRTItem],
+    voice: str,
+    backend: str,
+    ar: int,
+    out_ar: int,
+    video_path: str,
+    orig_texts: Optional[List[str]] = None,
+    probe_negative_ts: Callable[[str], bool] = detect_negative_ts,
+    run_dir: Optional[str] = None,
+    **build_kwargs: Any,
+) -> ModeARender:
+    """
+    Synthesize, fit and render the Mode A timeline as concurrent stages.
+
+    `build` is build_audio_from_srt or build_audio_from_srt_clustered; fitted cues
+    arrive through its on_fitted callback and are appended to the timeline WAV
+    (at the working rate `ar`) as soon as every earlier cue is in. The mix is
+    resampled to `out_ar` once at the end.
+
+    With `run_dir`, the render is incremental: see _dub_incremental.
+    """
+    if run_dir is not None:
+        return await _dub_incremental(build, items, voice, backend, ar, out_ar, video_path, run_dir, orig_texts, probe_negative_ts, build_kwargs)
+    duration_task = asyncio.ensure_future(run_blocking(media_duration_ms, video_path))
+    negative_task = asyncio.ensure_future(run_blocking(probe_negative_ts, video_path))
+    slots = OrderedSlots(len(items))
+
+    async def synthesize() -> None:
+        try:
+            wavs = await build(items, voice, backend, ar, on_fitted=slots.set, **build_kwargs)
+            for i, p in enumerate(wavs):
+                slots.set(i, p)
+        except BaseException as e:
+            slots.fail(e)
+            raise
+
+    synth_task = asyncio.create_task(synthesize())
+    mix = tempfile.mktemp(suffix=".wav")
+    writer = await run_blocking(TimelineWavWriter, mix, ar)
+    try:
+        if items:
+            await run_blocking(writer.silence, max(0, items[0].start_ms))
+            for i, it in enumerate(items):
+                path = await slots.get(i)
+                await run_blocking(writer.append, path)
+                if i + 1 < len(items):
+                    gap = items[i + 1].start_ms - it.end_ms
+                    if gap > 0:
+                        await run_blocking(writer.silence, gap)
+        video_ms = await duration_task
+        tail = max(0, video_ms - items[-1].end_ms) if items else video_ms
+        await run_blocking(writer.silence, tail)
+        dbg_lines = _debug_lines(items, video_ms, orig_texts)
+        await synth_task
+    finally:
+        writer.close()
+        if not synth_task.done():
+            synth_task.cancel()
+        elif not synth_task.cancelled():
+            synth_task.exception()
+        slots.discard()
+    negative_ts = await negative_task
+    if out_ar != ar:
+        resampled = tempfile.mktemp(suffix=".wav")
+        await run_blocking(concat_wavs, [mix], resampled, out_ar)
+        mix = resampled
+    return ModeARender(mix_path=mix, video_ms=video_ms, negative_ts=negative_ts, debug_lines=dbg_lines)
+
+
+async def _dub_incremental(
+    build: Callable[..., Awaitable[List[str]]],
+    items: List[SRTItem],
+    voice: str,
+    backend: str,
+    ar: int,
+    out_ar: int,
+    video_path: str,
+    run_dir: str,
+    orig_texts: Optional[List[str]],
+    probe_negative_ts: Callable[[str], bool],
+    build_kwargs: Dict[str, Any],
+) -> ModeARender:
+    """
+    Mode A render against the run manifest in `run_dir`.
+
+    Cues whose content hash has a cached fitted WAV are reused; only the rest go
+    through `build`. When the timeline keeps its length and every reused cue its
+    sample range, the previous mix is patched in place (old ranges of dropped cues
+    zeroed, new cues written); otherwise the mix is rendered again from the cache.
+    """
+    duration_task = asyncio.ensure_future(run_blocking(media_duration_ms, video_path))
+    negative_task = asyncio.ensure_future(run_blocking(probe_negative_ts, video_path))
+    keys = [cue_key(it, voice, backend, ar, build_tag(build.__name__, build_kwargs)) for it in items]
+    old = await run_blocking(RunManifest.load, run_dir)
+    if old is not None and old.ar != ar:
+        old = None
+    cached = old.artifacts(run_dir) if old is not None else {}
+    changed = [i for i, k in enumerate(keys) if k not in cached]
+    counts = diff_counts([c.key for c in old.cues] if old is not None else [], keys)
+    print(
+        f"[INCREMENTAL] cues={len(items)} reused={len(items) - len(changed)} resynth={len(changed)} "
+        f"inserted={counts['inserted']} deleted={counts['deleted']} replaced={counts['replaced']}"
+    )
+    artifacts: List[Optional[str]] = [cached[k].artifact if k in cached else None for k in keys]
+    frames: List[int] = [cached[k].frames if k in cached else 0 for k in keys]
+    if changed:
+        wavs = await build([items[i] for i in changed], voice, backend, ar, **build_kwargs)
+        for i, wav in zip(changed, wavs):
+            artifacts[i] = await run_blocking(store_artifact, run_dir, keys[i], wav, items[i].end_ms - items[i].start_ms)
+            frames[i] = (await run_blocking(sf.info, os.path.join(run_dir, artifacts[i]))).frames
+    video_ms = await duration_task
+    ranges, total = timeline_layout(items, frames, ar, video_ms)
+    mix = os.path.join(run_dir, MIX_NAME)
+    old_ranges = {(c.key, c.range) for c in old.cues} if old is not None else set()
+    patchable = (
+        old is not None
+        and old.mix_frames == total
+        and os.path.exists(mix)
+        and (await run_blocking(sf.info, mix)).frames == total
+    )
+    if patchable:
+        kept = {(k, r) for k, r in zip(keys, ranges)} & old_ranges
+        clear = [c.range for c in old.cues if (c.key, c.range) not in kept]
+        writes = [(r[0], os.path.join(run_dir, a)) for k, r, a in zip(keys, ranges, artifacts) if (k, r) not in kept]
+        touched = await run_blocking(patch_mix, mix, clear, writes)
+        print(f"[INCREMENTAL] patched {len(writes)} cue ranges, {touched}/{total} samples")
+    else:
+        tmp = mix + ".tmp.wav"
+        writer = await run_blocking(TimelineWavWriter, tmp, ar)
+        try:
+            if items:
+                await run_blocking(writer.silence, max(0, items[0].start_ms))
+            for i, it in enumerate(items):
+                await run_blocking(writer.append, os.path.join(run_dir, artifacts[i]))
+                if i + 1 < len(items) and items[i + 1].start_ms > it.end_ms:
+                    await run_blocking(writer.silence, items[i + 1].start_ms - it.end_ms)
+            await run_blocking(writer.silence, max(0, video_ms - items[-1].end_ms) if items else video_ms)
+        finally:
+            writer.close()
+        os.replace(tmp, mix)
+        print(f"[INCREMENTAL] rendered full timeline, {total} samples")
+    manifest = RunManifest(ar=ar, video_ms=video_ms, mix_frames=total, cues=[
+        CueRecord(key=k, start_ms=it.start_ms, end_ms=it.end_ms, text=it.text, artifact=a,
+                  target_ms=max(0, it.end_ms - it.start_ms), frames=n, range=r)
+        for k, it, a, n, r in zip(keys, items, artifacts, frames, ranges)
+    ])
+    await run_blocking(manifest.save, run_dir)
+    await run_blocking(prune_artifacts, run_dir, artifacts)
+    negative_ts = await negative_task
+    out = mix
+    if out_ar != ar:
+        out = tempfile.mktemp(suffix=".wav")
+        await run_blocking(concat_wavs, [mix], out, out_ar)
+    return ModeARender(mix_path=out, video_ms=video_ms, negative_ts=negative_ts, debug_lines=_debug_lines(items, video_ms, orig_texts))
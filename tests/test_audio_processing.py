@@ -7,6 +7,9 @@ import pytest
 import soundfile as sf
 
 from flexdub.core.audio import remove_silence as _remove_silence, time_stretch_rubberband as _time_stretch_rubberband, audio_duration_ms as _audio_duration_ms
+from flexdub.core.audio import split_wav_by_boundaries as _split_wav_by_boundaries, crossfade_concat_wavs as _crossfade_concat_wavs
+from flexdub.core.audio import TimelineWavWriter
+from flexdub.backends.tts.interfaces import WordBoundary
 
 
 def _write_wav(path: str, seconds: float, sr: int = 16000, tone: float = 440.0, leading_silence: float = 0.5):
@@ -32,4 +35,70 @@ def test_time_stretch_targets_duration():
     tmp_out = tempfile.mktemp(suffix=".wav")
     _time_stretch_rubberband(tmp_in, tmp_out, target_ms=1000)
     dur = _audio_duration_ms(tmp_out)
-    assert abs(dur - 1000) <= 200
\ No newline at end of file
+    assert abs(dur - 1000) <= 200
+
+
+def test_audio_duration_probes_other_containers(monkeypatch):
+    from flexdub.core import audio
+    monkeypatch.setattr(audio, "media_duration_ms", lambda path: 1234)
+    tmp = tempfile.mktemp(suffix=".wav")
+    _write_wav(tmp, seconds=1.0, leading_silence=0.0)
+    assert _audio_duration_ms(tmp) == 1000
+    # compressed containers and unreadable headers go through ffprobe
+    assert _audio_duration_ms(tmp[:-4] + ".m4a") == 1234
+    with open(tmp, "wb") as f:
+        f.write(b"not a wav")
+    assert _audio_duration_ms(tmp) == 1234
+    os.remove(tmp)
+
+
+def test_fit_length_pads_and_trims_to_exact_samples():
+    from flexdub.core.audio import fit_length
+    src = tempfile.mktemp(suffix=".wav")
+    _write_wav(src, seconds=1.0, sr=16000, leading_silence=0.0)
+    for target_ms in (937, 1063):
+        dst = tempfile.mktemp(suffix=".wav")
+        fit_length(src, dst, target_ms)
+        assert sf.info(dst).frames == target_ms * 16
+
+
+def test_split_by_boundaries_follows_word_offsets():
+    tmp = tempfile.mktemp(suffix=".wav")
+    _write_wav(tmp, seconds=3.0, sr=16000, leading_silence=0.0)
+    texts = ["hello world", "second cue"]
+    boundaries = [
+        WordBoundary(0, 400, "hello"),
+        WordBoundary(500, 400, "world"),
+        WordBoundary(1900, 400, "second"),
+        WordBoundary(2400, 400, "cue"),
+    ]
+    parts = _split_wav_by_boundaries(tmp, texts, [1500, 1500], boundaries)
+    # cut lands midway between "world" (ends 900ms) and "second" (starts 1900ms)
+    assert abs(_audio_duration_ms(parts[0]) - 1400) <= 1
+    assert abs(_audio_duration_ms(parts[1]) - 1600) <= 1
+    scaled = _split_wav_by_boundaries(tmp, texts, [1500, 1500], boundaries, scale=0.5)
+    assert abs(_audio_duration_ms(scaled[0]) - 700) <= 1
+
+
+def test_crossfade_concat_overlaps_seams():
+    a = tempfile.mktemp(suffix=".wav")
+    b = tempfile.mktemp(suffix=".wav")
+    _write_wav(a, seconds=1.0, sr=16000, leading_silence=0.0)
+    _write_wav(b, seconds=0.5, sr=16000, leading_silence=0.0)
+    out = tempfile.mktemp(suffix=".wav")
+    _crossfade_concat_wavs([a, b], out, fade_ms=50)
+    assert _audio_duration_ms(out) == 1450
+
+
+def test_timeline_writer_appends_clips_and_silence():
+    a = tempfile.mktemp(suffix=".wav")
+    _write_wav(a, seconds=0.5, sr=16000, leading_silence=0.0)
+    out = tempfile.mktemp(suffix=".wav")
+    w = TimelineWavWriter(out, 16000)
+    w.silence(250)
+    w.append(a)
+    w.silence(2500)
+    w.close()
+    assert _audio_duration_ms(out) == 3250
+    data, _ = sf.read(out)
+    assert np.abs(data[:4000]).max() == 0 and np.abs(data[4000:12000]).max() > 0
@@ -2,7 +2,7 @@ import os
 import numpy as np
 import soundfile as sf
 
-from flexdub.cli import __main__ as cli_main
+from flexdub.pipelines import merge as merge_pipeline
 from flexdub.cli.__main__ import main
 
 
@@ -24,7 +24,7 @@ async def _fake_build(items, voice, backend, ar, jobs=1, progress=True):
 def test_auto_robust_ts_injection(monkeypatch, tmp_path):
     srt_path = os.path.join(tmp_path, "b.srt")
     _write_srt(srt_path)
-    monkeypatch.setattr(cli_main, "detect_negative_ts", lambda _: True)
+    monkeypatch.setattr(merge_pipeline, "detect_negative_ts", lambda _: True)
     captured = {"robust": None}
 
     def _fake_mux(video_path, audio_path, out_path, subtitle_path=None, subtitle_lang="zh", robust_ts=False):
@@ -32,7 +32,7 @@ def test_auto_robust_ts_injection(monkeypatch, tmp_path):
         with open(out_path, "w", encoding="utf-8") as f:
             f.write("ok")
 
-    monkeypatch.setattr(cli_main, "mux_audio_video", _fake_mux)
+    monkeypatch.setattr(merge_pipeline, "mux_audio_video", _fake_mux)
     import flexdub.pipelines.dubbing as dubbing
     monkeypatch.setattr(dubbing, "build_audio_from_srt", _fake_build)
 
@@ -23,3 +23,11 @@ def test_defaults_project_merge():
     assert args.target_cpm == 180
     assert args.panic_cpm == 300
     assert args.ar == 48000
+
+def test_jobs_default_follows_backend():
+    from flexdub.backends.tts import resolve_jobs, working_sample_rate, get_capabilities
+    args = _parse_args(["merge", "dummy.srt", "dummy.mp4", "--backend", "doubao"])
+    assert args.jobs is None
+    assert resolve_jobs("doubao", args.jobs) == get_capabilities("doubao").recommended_jobs
+    assert resolve_jobs("doubao", 6) == 6
+    assert working_sample_rate("edge_tts", 48000) == 24000
@@ -0,0 +1,48 @@
+from flexdub.backends.tts.latency import LatencyModel
+from flexdub.core.subtitle import SRTItem
+from flexdub.pipelines.dubbing import _cluster_chars, _plan_clusters
+
+
+def _items(texts):
+    return [SRTItem(start_ms=i * 1000, end_ms=i * 1000 + 900, text=t) for i, t in enumerate(texts)]
+
+
+def test_latency_model_learns_and_persists(tmp_path):
+    path = str(tmp_path / "lat.json")
+    m = LatencyModel("synthetic", path=path)
+    for chars in (10, 20, 40, 80, 160, 320):
+        m.observe(chars, 300.0 + 5.0 * chars)
+    m.save()
+    base, per_char = LatencyModel("synthetic", path=path).coefficients()
+    assert abs(base - 300.0) < 1.0 and abs(per_char - 5.0) < 0.01
+    assert LatencyModel("doubao", path=path).coefficients() == LatencyModel("x", path=str(tmp_path / "none.json")).coefficients()
+
+
+def test_run_on_transcript_is_split_to_keep_workers_busy(tmp_path):
+    # no terminal punctuation at all: the semantic pass yields one huge cluster
+    items = _items([f"word{i} and more filler text" for i in range(60)])
+    model = LatencyModel("synthetic", path=str(tmp_path / "lat.json"))
+    clusters = _plan_clusters(items, jobs=4, min_chars=20, max_chars=300, model=model)
+    assert len(clusters) >= 4
+    assert all(_cluster_chars(c) <= 300 for c in clusters)
+    assert [i for c in clusters for i, _ in c] == list(range(60))
+
+
+def test_fragments_are_merged_within_speaker(tmp_path):
+    items = _items(["[Speaker:A] Yes.", "[Speaker:A] No.", "[Speaker:A] Maybe.", "[Speaker:B] Sure.", "[Speaker:B] Fine."])
+    model = LatencyModel("synthetic", path=str(tmp_path / "lat.json"))
+    clusters = _plan_clusters(items, jobs=1, min_chars=20, max_chars=300, model=model)
+    assert [[i for i, _ in c] for c in clusters] == [[0, 1, 2], [3, 4]]
+
+
+def test_latency_model_is_saved_only_when_it_plans(tmp_path):
+    import asyncio
+    from flexdub.pipelines.dubbing import build_audio_from_srt_clustered
+    items = _items(["Hello there.", "This is a test.", "Bye."])
+    path = tmp_path / "lat.json"
+    for plan in (False, True):
+        out = asyncio.run(build_audio_from_srt_clustered(
+            items, "v", "synthetic", 16000, jobs=2, progress=False, plan_clusters=plan, latency_model=str(path),
+        ))
+        assert len(out) == 3 and all(out)
+        assert path.exists() == plan
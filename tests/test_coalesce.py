@@ -0,0 +1,45 @@
+import asyncio
+
+from flexdub.backends.tts.synthetic import SyntheticTTSBackend
+from flexdub.core.audio import audio_duration_ms, split_wav_at_pauses
+from flexdub.core.subtitle import SRTItem
+from flexdub.pipelines.dubbing import _coalesce_plan, _pause_marker
+
+
+def _items(texts):
+    return [SRTItem(start_ms=i * 1000, end_ms=i * 1000 + 900, text=t) for i, t in enumerate(texts)]
+
+
+def test_plan_packs_adjacent_short_cues_of_same_speaker():
+    items = _items([
+        "[Speaker:A] yes",
+        "[Speaker:A] right",
+        "[Speaker:A] this one is a much longer line that stands alone",
+        "[Speaker:A] ok",
+        "[Speaker:B] sure",
+        "[Speaker:B] fine",
+    ])
+    assert _coalesce_plan(items, max_chars=120) == [[0, 1], [2], [3], [4, 5]]
+    assert _coalesce_plan(items, max_chars=10) == [[0], [1], [2], [3], [4], [5]]
+
+
+def test_pause_split_recovers_each_cue():
+    texts = ["hello", "thanks", "goodbye"]
+    b = SyntheticTTSBackend(cpm=600, seed=1)
+    path = asyncio.run(b.synthesize(_pause_marker(texts).join(texts), "v1", 16000))
+    parts = split_wav_at_pauses(path, len(texts))
+    assert parts is not None and len(parts) == 3
+    for text, part in zip(texts, parts):
+        # each part is the cue's own speech, without the marker pause
+        assert 0.7 * len(text) * 100 <= audio_duration_ms(part) <= len(text) * 100
+    assert split_wav_at_pauses(path, 6) is None
+    # cuts that disagree with the text lengths are rejected
+    assert split_wav_at_pauses(path, 3, weights=[len(t) for t in texts]) is not None
+    assert split_wav_at_pauses(path, 3, weights=[20, 1, 1]) is None
+
+
+def test_single_and_coalesced_requests_drop_speaker_tags():
+    from flexdub.pipelines.dubbing import _coalesced_texts, _spoken_text
+    items = _items(["[Speaker:A] yes", "[Speaker:A] right", "[Speaker:B] a line of its own"])
+    assert _coalesced_texts(items, [0, 1]) == ["yes", "right"]
+    assert _spoken_text(items[2]) == "a line of its own"
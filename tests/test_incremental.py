@@ -0,0 +1,45 @@
+import asyncio
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+from flexdub.core.subtitle import SRTItem
+from flexdub.pipelines import streaming
+from flexdub.pipelines.incremental import diff_counts
+
+
+def _run(items, run_dir, built):
+    async def build(sub, voice, backend, ar, **kw):
+        out = []
+        for it in sub:
+            built.append(it.text)
+            n = int((it.end_ms - it.start_ms) * ar / 1000) - 7  # fits come back a little short
+            path = tempfile.mktemp(suffix=".wav")
+            sf.write(path, np.full(n, 0.01 * len(it.text), dtype=np.float32), ar)
+            out.append(path)
+        return out
+
+    return asyncio.run(streaming.dub_mode_a(build, items, "v", "synthetic", 8000, 8000, "video.mp4",
+                                            probe_negative_ts=lambda p: False, run_dir=run_dir))
+
+
+def test_rerun_resynthesizes_only_changed_cues_and_matches_full_render(monkeypatch):
+    monkeypatch.setattr(streaming, "media_duration_ms", lambda p: 6000)
+    items = [SRTItem(500, 1500, "one"), SRTItem(2000, 3000, "two"), SRTItem(3500, 4500, "three")]
+    run_dir, fresh_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    built = []
+    _run(items, run_dir, built)
+    edited = [items[0], SRTItem(2000, 3000, "two!!"), SRTItem(3200, 3400, "new"), items[2]]
+    built.clear()
+    patched = _run(edited, run_dir, built)
+    assert built == ["two!!", "new"]
+    full = _run(edited, fresh_dir, [])
+    a, _ = sf.read(patched.mix_path)
+    b, _ = sf.read(full.mix_path)
+    assert len(a) == len(b) == 6 * 8000 and np.abs(a - b).max() == 0
+
+
+def test_diff_counts_handles_insertions_and_deletions():
+    assert diff_counts(["a", "b", "c"], ["a", "x", "c", "d"]) == {"kept": 2, "inserted": 1, "deleted": 0, "replaced": 1}
+    assert diff_counts(["a", "b"], ["b"])["deleted"] == 1
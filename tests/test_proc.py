@@ -0,0 +1,77 @@
+import asyncio
+import sys
+
+import pytest
+
+from flexdub.core import proc
+
+
+def test_ffmpeg_commands_get_threads_before_output():
+    cmd = proc._prepare(["ffmpeg", "-y", "-i", "in.wav", "out.wav"], threads=2, piped_input=False)
+    assert cmd == ["ffmpeg", "-hide_banner", "-nostdin", "-y", "-i", "in.wav", "-threads", "2", "out.wav"]
+    assert proc._prepare(["ffprobe", "x.mp4"], threads=2, piped_input=False) == ["ffprobe", "x.mp4"]
+    assert proc._prepare(["ffmpeg", "-version"], threads=2, piped_input=False) == ["ffmpeg", "-hide_banner", "-nostdin", "-version"]
+    with pytest.raises(ValueError):
+        proc._prepare(["ffmpeg", "-y", "-i", "in.wav"], threads=2, piped_input=False)
+
+
+def test_failures_carry_stderr_tail_and_are_timed():
+    proc.reset_stats()
+    bad = [sys.executable, "-c", "import sys; sys.stderr.write('line1\\nboom\\n'); sys.exit(3)"]
+    with pytest.raises(proc.MediaProcessError) as ei:
+        proc.run_media(bad)
+    assert ei.value.returncode == 3 and "boom" in str(ei.value)
+    res = asyncio.run(proc.run_media_async(bad, check=False))
+    assert res.returncode == 3 and res.stderr_tail.endswith("boom")
+    tool = list(proc.stats())[0]
+    assert proc.stats()[tool]["calls"] == 2 and proc.stats()[tool]["failures"] == 2
+
+
+@pytest.fixture
+def restore_limits(monkeypatch):
+    """configure() installs process-wide state; put it back after the test."""
+    from flexdub.core import governor
+    monkeypatch.setattr(governor, "_current", governor._current)
+    for name in ("_limit", "_slots", "_default_threads", "_stage_slots"):
+        monkeypatch.setattr(proc, name, getattr(proc, name))
+
+
+def test_governor_splits_cpu_budget_between_stages(restore_limits):
+    from flexdub.core.governor import ResourceGovernor, configure, current
+    g = ResourceGovernor(cpus=16, mode="elastic-video")
+    fit, enc = g.allocation("fit"), g.allocation("video_encode")
+    assert fit.slots + enc.slots * enc.threads <= 16
+    assert enc.threads > 1 and enc.slots > 1
+    assert ResourceGovernor(cpus=1, mode="elastic-video").allocation("video_encode").slots == 1
+    configure(cpus=6, mode="elastic-audio")
+    assert current().cpus == 6
+    assert proc.process_limit() == 6 and proc.default_threads() == 1
+    # one CPU: the fit and encode stages take turns instead of running two processes
+    configure(cpus=1, mode="elastic-video")
+    assert proc.process_limit() == 1
+
+
+def test_stage_limit_caps_concurrent_processes(restore_limits, monkeypatch):
+    import threading
+    proc.set_process_limit(4)
+    proc.set_stage_limits({"video_encode": 1})
+    running, peak, lock = [0], [0], threading.Lock()
+    real_run = proc.subprocess.run
+
+    def fake_run(*args, **kwargs):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        try:
+            return real_run([sys.executable, "-c", "import time; time.sleep(0.05)"], **kwargs)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    monkeypatch.setattr(proc.subprocess, "run", fake_run)
+    threads = [threading.Thread(target=proc.run_media, args=(["ffprobe", "x"],), kwargs={"stage": "video_encode"}) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 1
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+from flexdub.core.scheduling import LPTWorkPool, fit_cost, lpt_order
+
+
+def test_lpt_order_is_stable_and_descending():
+    assert lpt_order(["bb", "a", "ccc", "dd"], len) == ["ccc", "bb", "dd", "a"]
+    assert fit_cost(2000, 1000) == 2000.0
+    assert fit_cost(500, 1000) == 0.0
+
+
+def test_pool_runs_most_expensive_first_and_keeps_keys():
+    ran = []
+
+    def job(name):
+        time.sleep(0.01)
+        ran.append(name)
+        return name.upper()
+
+    async def main():
+        pool = LPTWorkPool(1)
+        futures = {name: pool.submit(cost, job, name) for name, cost in [("a", 1), ("b", 5), ("c", 3), ("d", 4)]}
+        await pool.close()
+        return {k: f.result() for k, f in futures.items()}
+
+    results = asyncio.run(main())
+    assert results == {"a": "A", "b": "B", "c": "C", "d": "D"}
+    assert ran == ["b", "d", "c", "a"]
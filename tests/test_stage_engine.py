@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from flexdub.pipelines.engine import Pipeline, Stage, StageFailed
+
+
+def _pipeline(cache_dir, lang, calls):
+    def stage(name, result):
+        def fn(ctx, **inputs):
+            calls.append(name)
+            return result(inputs)
+        return fn
+
+    p = Pipeline(cache_dir, log=lambda line: None)
+    p.add(Stage("parse", stage("parse", lambda i: [1, 2, 3]), params={"src": "a"}))
+    p.add(Stage("dub", stage("dub", lambda i: sum(i["parse"])), inputs=["parse"], params={"voice": "v"}))
+    p.add(Stage("audit", stage("audit", lambda i: len(i["parse"])), inputs=["parse"]))
+    p.add(Stage("mux", stage("mux", lambda i: f"{i['dub']}:{lang}"), inputs=["dub"], params={"lang": lang}))
+    return p
+
+
+def test_rerun_executes_only_stages_downstream_of_a_change(tmp_path):
+    cache_dir, calls = str(tmp_path), []
+    assert asyncio.run(_pipeline(cache_dir, "zh", calls).run())["mux"] == "6:zh"
+    assert sorted(calls) == ["audit", "dub", "mux", "parse"]
+    calls.clear()
+    assert asyncio.run(_pipeline(cache_dir, "zh", calls).run())["mux"] == "6:zh"
+    assert calls == []
+    assert asyncio.run(_pipeline(cache_dir, "en", calls).run())["mux"] == "6:en"
+    assert calls == ["mux"]
+
+
+def test_failures_name_the_stage_and_are_not_cached(tmp_path):
+    cache_dir = str(tmp_path)
+
+    def boom(ctx, parse):
+        raise ValueError("bad")
+
+    p = Pipeline(cache_dir, log=lambda line: None)
+    p.add(Stage("parse", lambda ctx: 1))
+    p.add(Stage("dub", boom, inputs=["parse"]))
+    with pytest.raises(StageFailed) as ei:
+        asyncio.run(p.run())
+    assert ei.value.stage == "dub" and isinstance(ei.value.error, ValueError)
+
+
+def test_generations_keep_one_cached_result_per_value(tmp_path):
+    calls = []
+
+    def pipeline(proxy, lang="zh"):
+        p = Pipeline(str(tmp_path), log=lambda line: None)
+        p.add(Stage("render", lambda ctx: calls.append(proxy) or proxy, params={"proxy": proxy, "lang": lang}, generations=["proxy"]))
+        return p
+
+    asyncio.run(pipeline(False).run())
+    asyncio.run(pipeline(True).run())
+    # the final render survived the proxy run
+    asyncio.run(pipeline(False).run())
+    assert calls == [False, True]
+    # a changed final render still replaces the old one
+    asyncio.run(pipeline(False, "en").run())
+    assert len(list(tmp_path.iterdir())) == 2
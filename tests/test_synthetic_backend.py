@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from flexdub.backends.tts import create_backend
+from flexdub.backends.tts.synthetic import SyntheticTTSBackend, parse_latency_spec, synthetic_duration_ms
+from flexdub.core.audio import audio_duration_ms
+
+
+def test_duration_follows_cpm_model():
+    b = SyntheticTTSBackend(cpm=240, seed=1)
+    path = asyncio.run(b.synthesize("你好世界，这是一个测试。", "v1", 16000))
+    assert abs(audio_duration_ms(path) - synthetic_duration_ms("你好世界，这是一个测试。", 240)) <= 1
+    assert audio_duration_ms(path) == 3000
+
+
+def test_audio_is_deterministic_and_has_boundaries():
+    b = SyntheticTTSBackend(cpm=600, seed=1)
+    p1, wb1 = asyncio.run(b.synthesize_with_boundaries("hello brave new world", "v1", 16000))
+    p2, wb2 = asyncio.run(b.synthesize_with_boundaries("hello brave new world", "v1", 16000))
+    d1, _ = sf.read(p1)
+    d2, _ = sf.read(p2)
+    assert np.array_equal(d1, d2)
+    assert [w.text for w in wb1] == ["hello", "brave", "new", "world"]
+    assert wb1 == wb2
+
+
+def test_injected_failures():
+    b = SyntheticTTSBackend(failure_rate=1.0, seed=2)
+    with pytest.raises(RuntimeError):
+        asyncio.run(b.synthesize("text", "v1", 16000))
+
+
+def test_draws_do_not_depend_on_request_order():
+    def run(texts):
+        draws = {}
+
+        def latency(text, rng):
+            draws.setdefault(text, []).append(rng.random())
+            return 0.0
+
+        b = SyntheticTTSBackend(seed=5, latency_fn=latency)
+
+        async def main():
+            for t in texts:
+                await b.synthesize(t, "v1", 16000)
+
+        asyncio.run(main())
+        return draws
+
+    first, second = run(["a", "b", "a"]), run(["b", "a", "a"])
+    assert first == second
+    # a retry of the same request draws again
+    assert first["a"][0] != first["a"][1]
+
+
+def test_latency_spec_and_registry():
+    rng = np.random.default_rng(0)
+    assert parse_latency_spec("fixed:25")(rng) == 25
+    assert 10 <= parse_latency_spec("uniform:10,20")(rng) <= 20
+    with pytest.raises(ValueError):
+        parse_latency_spec("gamma:1")
+    assert isinstance(create_backend("synthetic"), SyntheticTTSBackend)
+
+
+def test_synthesize_many_streams_out_of_order():
+    from flexdub.backends.tts.interfaces import SynthesisRequest
+
+    # latency grows with text length, so the short request finishes first
+    b = SyntheticTTSBackend(latency="fixed:0", latency_per_char_ms=5, seed=3)
+    reqs = [
+        SynthesisRequest(key=0, text="a much longer request text", voice="v", ar=16000),
+        SynthesisRequest(key=1, text="short", voice="v", ar=16000, want_boundaries=True),
+    ]
+
+    async def collect():
+        return [r async for r in b.synthesize_many(reqs, jobs=2)]
+
+    results = asyncio.run(collect())
+    assert [r.key for r in results] == [1, 0]
+    assert all(r.error is None and r.path for r in results)
+    assert results[0].boundaries and not results[1].boundaries
+
+
+def test_synthesize_many_stops_workers_when_closed():
+    from flexdub.backends.tts.interfaces import SynthesisRequest
+    from flexdub.core.aio import aclosing
+
+    b = SyntheticTTSBackend(latency="fixed:20", seed=3)
+    reqs = [SynthesisRequest(key=i, text=f"request {i}", voice="v", ar=16000) for i in range(8)]
+
+    async def first_then_fail():
+        with pytest.raises(RuntimeError):
+            async with aclosing(b.synthesize_many(reqs, jobs=2)) as results:
+                async for _ in results:
+                    raise RuntimeError("render failed")
+        await asyncio.sleep(0)
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(first_then_fail()) == []
+
+
+def test_watchdog_reports_blocking_call_with_stack():
+    from flexdub.core.aio import LoopWatchdog, run_blocking
+
+    logs = []
+
+    def blocking_helper():
+        time.sleep(0.3)
+
+    async def main():
+        async with LoopWatchdog(100, log=logs.append) as wd:
+            await run_blocking(blocking_helper)  # off the loop: no stall
+            await asyncio.sleep(0.05)
+            blocking_helper()  # on the loop: stall
+            await asyncio.sleep(0.05)
+        return wd
+
+    wd = asyncio.run(main())
+    assert len(wd.stalls) == 1
+    assert "blocking_helper" in wd.stalls[0]
+
+
+def test_edge_backend_buffers_audio_off_the_loop(monkeypatch):
+    from flexdub.backends.tts import edge
+    from flexdub.core.aio import LoopWatchdog
+
+    class FakeCommunicate:
+        async def stream(self):
+            for i in range(50):
+                await asyncio.sleep(0)
+                yield {"type": "audio", "data": bytes([i]) * 100}
+            yield {"type": "WordBoundary", "offset": 10000, "duration": 20000, "text": "hi"}
+
+    written = {}
+
+    def fake_decode(mp3_path, wav_path, ar):
+        with open(mp3_path, "rb") as f:
+            written["mp3"] = f.read()
+        return True
+
+    monkeypatch.setattr(edge, "edge_tts", object())
+    monkeypatch.setattr(edge, "_communicate", lambda text, voice: FakeCommunicate())
+    monkeypatch.setattr(edge, "_decode_mp3_in_process", fake_decode)
+
+    async def main():
+        async with LoopWatchdog(100) as wd:
+            _, boundaries = await edge.EdgeTTSBackend().synthesize_with_boundaries("hi", "v", 24000)
+        return wd, boundaries
+
+    wd, boundaries = asyncio.run(main())
+    assert written["mp3"] == b"".join(bytes([i]) * 100 for i in range(50))
+    assert boundaries[0].offset_ms == 1 and boundaries[0].duration_ms == 2
+    assert wd.stalls == []
@@ -0,0 +1,108 @@
+from flexdub.core.subtitle import SRTItem, detect_gaps
+from flexdub.core.timeline_plan import TimelinePlanner, plan_cost
+
+
+def _items():
+    return [
+        SRTItem(0, 2000, "a"),
+        SRTItem(2000, 4000, "b"),
+        SRTItem(5000, 7000, "c"),
+        SRTItem(7000, 9000, "d"),
+    ]
+
+
+def test_planner_absorbs_small_overruns_and_pads_small_undershoots():
+    items = _items()
+    gaps = detect_gaps(items, min_gap_ms=100)
+    planner = TimelinePlanner(items, gaps, tolerance_ms=300)
+    # durations arrive out of order; cue 2 only depends on the long gap before it
+    assert [p.index for p in planner.set_audio(2, 2500)] == [2]
+    assert planner.set_audio(1, 2200) == []
+    assert [p.index for p in planner.set_audio(0, 1800)] == [0, 1]
+    assert [p.index for p in planner.set_audio(3, 1900)] == [3]
+    plans = [planner.plans[i] for i in range(4)]
+    # undershoot within tolerance: padded, picture unchanged
+    assert plans[0].ratio == 1.0 and plans[0].padding_ms == 200
+    # overrun within tolerance: runs into the gap, picture unchanged
+    assert plans[1].ratio == 1.0 and plans[1].overrun_ms == 200
+    # overrun beyond tolerance: picture stretched to the speech
+    assert plans[2].ratio == 1.25 and plans[2].slot_ms == 2500
+    # the last cue keeps its picture when the speech fits
+    assert plans[3].ratio == 1.0 and plans[3].lag_ms == 0
+    cost = plan_cost(plans, gaps)
+    assert (cost.stretched, cost.absorbed, cost.padded) == (1, 1, 2)
+    assert cost.total_ms == 2000 + 2000 + 1000 + 2500 + 2000
+
+
+def test_lag_carries_into_back_to_back_cues():
+    items = _items()[:2]
+    planner = TimelinePlanner(items, [], tolerance_ms=300)
+    planner.set_audio(0, 2250)
+    planner.set_audio(1, 1700)
+    first, second = planner.plans[0], planner.plans[1]
+    assert first.ratio == 1.0 and first.overrun_ms == 250
+    # speech of the second cue starts 250ms late and still ends inside its slot
+    assert second.lag_ms == 250 and second.ratio == 1.0
+
+
+def test_hybrid_fits_mild_overruns_by_audio_stretch():
+    items = _items()
+    gaps = detect_gaps(items, min_gap_ms=100)
+    planner = TimelinePlanner(items, gaps, tolerance_ms=100, tempo_range=(0.9, 1.15))
+    for idx, audio in enumerate([2200, 2600, 1900, 2000]):
+        planner.set_audio(idx, audio)
+    first, second, third = planner.plans[0], planner.plans[1], planner.plans[2]
+    # 10% too long: speech sped up to end at the edge of the tolerance, picture unchanged
+    assert first.ratio == 1.0 and first.audio_ms == 2100 and first.overrun_ms == 100
+    assert abs(first.tempo - 2200 / 2100) < 1e-9
+    # out of range even after the lag: the picture is stretched
+    assert second.tempo == 1.0 and second.ratio > 1.0
+    assert third.tempo == 1.0 and third.ratio == 1.0
+    assert plan_cost([planner.plans[i] for i in range(4)], gaps).audio_stretched == 1
+
+
+def test_ratio_histogram_counts_spoken_cues():
+    from flexdub.core.timeline_plan import CuePlan, ratio_histogram
+    plans = [
+        CuePlan(0, 1000, 900, 1.0, 1000, 0),
+        CuePlan(1, 1000, 1300, 1.3, 1300, 0),
+        CuePlan(2, 1000, 0, 1.0, 1000, 0, blank=True),
+        CuePlan(3, 1000, 700, 0.7, 700, 0),
+    ]
+    assert ratio_histogram(plans) == {"<0.8": 1, "0.8-0.95": 0, "~1": 1, "1.05-1.25": 0, "1.25-1.5": 1, ">=1.5": 0}
+
+
+def test_stretched_slots_match_rendered_frames():
+    from flexdub.core.video import VideoPiece, piece_frames
+    items = [SRTItem(i * 1000, i * 1000 + 1000, "x") for i in range(200)]
+    for fps in (25.0, 30000 / 1001):
+        planner = TimelinePlanner(items, [], tolerance_ms=0, fps=fps)
+        for i in range(200):
+            planner.set_audio(i, 1203 + i % 37)
+        plans = [planner.plans[i] for i in range(200)]
+        assert all(p.ratio != 1.0 for p in plans)
+        # the assembly advances by advance_ms; the renderer cuts each clip to piece_frames
+        current_time_ms = 0.0
+        for p in plans:
+            current_time_ms += p.advance_ms
+            assert p.lag_ms + p.audio_ms <= p.slot_ms  # the picture covers the speech
+        video_ms = sum(
+            piece_frames(VideoPiece(items[p.index].start_ms, items[p.index].end_ms, p.ratio), fps) * 1000.0 / fps
+            for p in plans
+        )
+        assert abs(video_ms - current_time_ms) < 1e-6
+        # TTS lengths a few ms apart give the same clip
+        assert planner._snap(1231) == planner._snap(1234)
+
+
+def test_mode_b_subtitle_follows_the_plan(tmp_path):
+    from flexdub.core.subtitle import read_srt
+    from flexdub.pipelines.elastic_video import generate_mode_b_subtitle
+
+    items = _items()
+    items[0] = SRTItem(0, 2000, "[Speaker:A] a")
+    gaps = detect_gaps(items, min_gap_ms=100)
+    out = generate_mode_b_subtitle(items, [1500, 2200, 2500, 1900], gaps, str(tmp_path / "b.srt"), keep_speaker_tags=False)
+    got = [(i.start_ms, i.end_ms, i.text) for i in read_srt(out)]
+    # tolerance 0: every slot follows its speech, gaps are kept
+    assert got == [(0, 1500, "a"), (1500, 3700, "b"), (4700, 7200, "c"), (7200, 9100, "d")]
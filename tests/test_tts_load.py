@@ -0,0 +1,40 @@
+import asyncio
+import os
+
+from flexdub.bench.doubao_standin import StandinConfig
+from flexdub.bench.tts_load import percentile, load_srt_workload, run_tts_load_sweep
+
+
+def _write_srt(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("""1
+00:00:00,000 --> 00:00:02,000
+[Speaker:A] 第一句话。
+
+2
+00:00:02,000 --> 00:00:04,000
+[Music]
+
+3
+00:00:04,000 --> 00:00:06,000
+第二句话，稍微长一点。
+
+""")
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) == 0.0
+    assert percentile([10, 20, 30, 40], 50) == 25
+    assert percentile([5], 99) == 5
+
+
+def test_load_sweep_against_standin(tmp_path):
+    srt_path = os.path.join(tmp_path, "w.srt")
+    _write_srt(srt_path)
+    texts = load_srt_workload([srt_path])
+    assert texts == ["第一句话。", "第二句话，稍微长一点。"]
+    cfg = StandinConfig(base_latency_ms=5, latency_per_char_ms=0, max_concurrency=1, error_rate=0.0)
+    results = asyncio.run(run_tts_load_sweep(texts, [1, 2], standin_config=cfg, progress=False, retry_delay=0.01))
+    assert [r.jobs for r in results] == [1, 2]
+    assert all(r.succeeded == 2 and r.failed == 0 for r in results)
+    assert all(r.p50_ms > 0 for r in results)
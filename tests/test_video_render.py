@@ -0,0 +1,195 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+import pytest
+
+from flexdub.core.video import VideoPiece, filter_graph, render_pieces
+
+
+def test_filter_graph_trims_stretches_and_concats():
+    graph = filter_graph([VideoPiece(1500, 3000, 1.5), VideoPiece(3000, 4000)], offset_ms=1500)
+    assert graph == (
+        "[0:v]split=2[s0][s1];"
+        "[s0]trim=start=0.000:end=1.500,setpts=(PTS-STARTPTS)*1.500000[p0];"
+        "[s1]trim=start=1.500:end=2.500,setpts=PTS-STARTPTS[p1];"
+        "[p0][p1]concat=n=2:v=1:a=0[v]"
+    )
+    assert filter_graph([VideoPiece(0, 500)]) == "[0:v]trim=start=0.000:end=0.500,setpts=PTS-STARTPTS[v]"
+    # proxy renders downscale every piece in the same graph
+    from flexdub.core.video import proxy_scale
+    assert filter_graph([VideoPiece(0, 500)], post=proxy_scale()) == (
+        "[0:v]trim=start=0.000:end=0.500,setpts=PTS-STARTPTS,scale=-2:min(360\\,ih)[v]"
+    )
+
+
+def test_separate_clips_each_get_the_thread_budget(monkeypatch):
+    import types
+    from flexdub.core import video
+    seen = []
+    monkeypatch.setattr(video, "run_media", lambda cmd, **kw: seen.append(cmd) or types.SimpleNamespace(returncode=0))
+    pieces = [VideoPiece(0, 1000, 1.5), VideoPiece(1000, 2000), VideoPiece(2000, 3000, 0.8)]
+    assert video.render_pieces_separately("src.mp4", pieces, ["a.mp4", "b.mp4", "c.mp4"], threads=4, fps=25.0)
+    cmd = seen[0]
+    # one option block per output, from its -map to its path
+    maps = [i for i, a in enumerate(cmd) if a == "-map"] + [len(cmd)]
+    blocks = [cmd[maps[k]:maps[k + 1]] for k in range(3)]
+    assert [blk[-1] for blk in blocks] == ["a.mp4", "b.mp4", "c.mp4"]
+    for blk in blocks:
+        assert blk.count("-threads") == 1 and blk[blk.index("-threads") + 1] == "4"
+
+
+def test_render_pieces_single_process():
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg not available")
+    with tempfile.TemporaryDirectory() as d:
+        src = os.path.join(d, "src.mp4")
+        subprocess.run(
+            ["ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc=size=64x48:rate=25:duration=3", "-c:v", "libx264", src],
+            capture_output=True, check=True,
+        )
+        out = os.path.join(d, "out.mp4")
+        assert render_pieces(src, [VideoPiece(0, 1000, 2.0), VideoPiece(2000, 3000)], out)
+        assert os.path.getsize(out) > 0
+
+
+def test_intermediate_clips_get_one_final_encode():
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg not available")
+    from flexdub.core.video import INTERMEDIATE_PROFILES
+    from flexdub.pipelines.elastic_video import concatenate_video_segments
+    profile = INTERMEDIATE_PROFILES["ffv1"]
+    with tempfile.TemporaryDirectory() as d:
+        src = os.path.join(d, "src.mp4")
+        subprocess.run(
+            ["ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc=size=64x48:rate=25:duration=2", "-c:v", "libx264", src],
+            capture_output=True, check=True,
+        )
+        clips = []
+        for n, piece in enumerate([VideoPiece(0, 1000, 1.5), VideoPiece(1000, 2000)]):
+            clip = os.path.join(d, f"c{n}{profile.suffix}")
+            assert render_pieces(src, [piece], clip, encoder_args=list(profile.args))
+            clips.append(clip)
+        out = os.path.join(d, "out.mp4")
+        concatenate_video_segments(clips, out, ["-c:v", "libx264", "-preset", "ultrafast"])
+        assert os.path.getsize(out) > 0
+        # chunked across workers and joined by stream copy: no frame lost or duplicated
+        from flexdub.core.video import count_video_frames
+        chunked = os.path.join(d, "chunked.mp4")
+        concatenate_video_segments(clips, chunked, ["-c:v", "libx264", "-preset", "ultrafast"], chunk_clips=1, workers=2)
+        assert count_video_frames(chunked) == count_video_frames(out)
+
+
+def test_passthrough_args_follow_ffmpeg_version(monkeypatch):
+    import types
+    from flexdub.core import video
+    for banner, expected in [
+        ("ffmpeg version 4.4.2-0ubuntu0.22.04.1 Copyright", ("-vsync", "passthrough")),
+        ("ffmpeg version n5.1.4 Copyright", ("-fps_mode", "passthrough")),
+        ("ffmpeg version N-112345-g0123456789 Copyright", ("-fps_mode", "passthrough")),
+    ]:
+        monkeypatch.setattr(video, "run_media", lambda cmd, b=banner: types.SimpleNamespace(stdout=b.encode()))
+        video.passthrough_args.cache_clear()
+        assert video.passthrough_args() == expected
+    video.passthrough_args.cache_clear()
+
+
+def test_split_stream_copy_copies_whole_unstretched_gops():
+    from flexdub.core.video import KeyframeIndex, StreamCopy, split_stream_copy
+    index = KeyframeIndex(codec="h264", times=[0.0, 1.0, 2.0, 3.0, 4.0, 5.0], frames=[0, 25, 50, 75, 100, 125])
+    parts = split_stream_copy(
+        [VideoPiece(500, 2000, 1.5), VideoPiece(2000, 2500), VideoPiece(2500, 4200), VideoPiece(4200, 4800, 0.8)],
+        index,
+    )
+    assert parts == [
+        [VideoPiece(500, 2000, 1.5)],
+        StreamCopy(2000, 4000, 2.0, 50),
+        [VideoPiece(4000, 4200), VideoPiece(4200, 4800, 0.8)],
+    ]
+    # an unstretched run shorter than one GOP is re-encoded
+    assert split_stream_copy([VideoPiece(1200, 1900)], index) == [[VideoPiece(1200, 1900)]]
+    # keyframes between whole milliseconds stay on the copied side of the encode cuts
+    index = KeyframeIndex(codec="h264", times=[0.0, 1.0343667, 2.0687333], frames=[0, 31, 62])
+    assert split_stream_copy([VideoPiece(500, 2500)], index) == [
+        [VideoPiece(500, 1034)], StreamCopy(1034, 2068, 1.0343667, 31), [VideoPiece(2068, 2500)],
+    ]
+
+
+
+def test_stream_copy_joins_reencoded_pieces_with_start_time_offset():
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        pytest.skip("ffmpeg not available")
+    from flexdub.core.video import (
+        StreamCopy, copy_range, count_video_frames, load_keyframe_index, split_stream_copy,
+    )
+    from flexdub.pipelines.elastic_video import concatenate_video_segments
+    with tempfile.TemporaryDirectory() as d:
+        src = os.path.join(d, "src.mp4")
+        subprocess.run(
+            ["ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc=size=64x48:rate=25:duration=4",
+             "-c:v", "libx264", "-g", "25", "-output_ts_offset", "3", src],
+            capture_output=True, check=True,
+        )
+        index = load_keyframe_index(src, cache_dir=d)
+        assert index is not None and index.times[0] == pytest.approx(0.0) and index.closed_gop
+        parts = split_stream_copy([VideoPiece(500, 3500)], index)
+        assert [type(p) for p in parts] == [list, StreamCopy, list]
+        clips = []
+        for n, part in enumerate(parts):
+            clip = os.path.join(d, f"c{n}.mp4")
+            if isinstance(part, StreamCopy):
+                assert copy_range(src, part, clip)
+            else:
+                assert render_pieces(src, part, clip, encoder_args=["-c:v", "libx264", "-g", "25"])
+            clips.append(clip)
+        out = os.path.join(d, "out.mp4")
+        concatenate_video_segments(clips, out, ["-c:v", "libx264", "-preset", "ultrafast"])
+        # 3s at 25fps: the copied GOPs are the ones the plan asked for, not 3s later
+        assert count_video_frames(out) == 75
+
+
+def test_open_gop_source_is_reencoded():
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        pytest.skip("ffmpeg not available")
+    from flexdub.core.video import count_video_frames, load_keyframe_index, split_stream_copy
+    with tempfile.TemporaryDirectory() as d:
+        src = os.path.join(d, "src.mp4")
+        # B-frames after each keyframe are shown before it and refer to the previous GOP
+        subprocess.run(
+            ["ffmpeg", "-y", "-f", "lavfi", "-i", "mandelbrot=size=64x48:rate=25,trim=duration=4",
+             "-c:v", "libx264", "-g", "24", "-bf", "2",
+             "-x264-params", "open-gop=1:scenecut=0:bluray-compat=1", "-pix_fmt", "yuv420p", src],
+            capture_output=True, check=True,
+        )
+        index = load_keyframe_index(src, cache_dir=d)
+        assert index is not None and len(index.times) > 2 and not index.closed_gop
+        parts = split_stream_copy([VideoPiece(500, 3500)], index)
+        assert parts == [[VideoPiece(500, 3500)]]
+        out = os.path.join(d, "out.mp4")
+        assert render_pieces(src, parts[0], out, encoder_args=["-c:v", "libx264", "-preset", "ultrafast"])
+        assert count_video_frames(out) == 75
+
+
+def test_clip_cache_hits_and_evicts_least_recently_used():
+    from flexdub.core.video import ClipCache
+    with tempfile.TemporaryDirectory() as d:
+        cache = ClipCache(d, max_bytes=150)
+        paths = [cache.path(ClipCache.key("src", n), ".mp4") for n in range(3)]
+        for n, path in enumerate(paths):
+            assert not cache.lookup(path)
+            staged = ClipCache.staging(path)
+            with open(staged, "wb") as f:
+                f.write(b"x" * 100)
+            ClipCache.commit(staged, path)
+            os.utime(path, (n, n))
+        assert cache.evict() == (3, 300)  # everything was used in this run
+        rerun = ClipCache(d, max_bytes=150)
+        assert rerun.lookup(paths[0]) and (rerun.hits, rerun.misses) == (1, 0)
+        assert rerun.evict() == (1, 100)
+        assert os.path.exists(paths[0]) and not os.path.exists(paths[1])
+
+
+def test_tts_cache_key_includes_sample_rate():
+    from flexdub.pipelines.elastic_video import _get_tts_cache_path
+    assert _get_tts_cache_path("c", "hi", "v", 0, 16000) != _get_tts_cache_path("c", "hi", "v", 0, 48000)